@@ -0,0 +1,69 @@
+# benchmarks/compare.py
+"""Compare two benchmark result files.
+
+Usage:
+    python -m benchmarks.compare BASE.json HEAD.json [--threshold 10]
+
+Prints p50, p95, throughput and SQL-per-operation for each scenario in
+both runs with the relative change. Exits with status 1 when any
+scenario's p50 got slower by more than --threshold percent, so it can gate
+a CI job.
+"""
+
+import argparse
+import json
+import sys
+
+METRICS = [("p50_ms", "p50 ms"), ("p95_ms", "p95 ms"),
+           ("ops_per_sec", "ops/s"), ("sql_per_op", "sql/op")]
+
+def _change(base, head):
+    if not base:
+        return None
+    return (head - base) / base * 100
+
+def compare(base, head, threshold):
+    """Return (table rows, names of regressed scenarios)."""
+    rows, regressed = [], []
+    for name, new in head["results"].items():
+        old = base["results"].get(name)
+        if old is None:
+            continue
+        row = [name]
+        for key, _ in METRICS:
+            change = _change(old[key], new[key])
+            row.append(f"{old[key]:>10} -> {new[key]:<10}" +
+                       (f" {change:+6.1f}%" if change is not None else "        "))
+        rows.append(row)
+        change = _change(old["p50_ms"], new["p50_ms"])
+        if change is not None and change > threshold:
+            regressed.append(name)
+    return rows, regressed
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("base")
+    parser.add_argument("head")
+    parser.add_argument("--threshold", type=float, default=10.0,
+                        help="Allowed p50 slowdown in percent.")
+    args = parser.parse_args(argv)
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.head) as f:
+        head = json.load(f)
+
+    print(f"base {base.get('commit')} ({base.get('database')})  ->  "
+          f"head {head.get('commit')} ({head.get('database')})")
+    if base.get("corpus") != head.get("corpus"):
+        print("warning: the runs used different corpora")
+    rows, regressed = compare(base, head, args.threshold)
+    print("scenario".ljust(14) + "".join(label.ljust(32) for _, label in METRICS))
+    for row in rows:
+        print(row[0].ljust(14) + "".join(cell.ljust(32) for cell in row[1:]))
+    if regressed:
+        print(f"p50 regressed by more than {args.threshold}%: {', '.join(regressed)}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
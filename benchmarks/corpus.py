@@ -0,0 +1,133 @@
+# benchmarks/corpus.py
+"""Seeded generator for benchmark data.
+
+The same seed always yields the same users, notes and tags, so results from
+different commits are measured against identical data. Note bodies follow a
+log-normal size distribution (most notes are a few KB, a few are very large),
+and tags are drawn from a Zipf-like distribution so a handful of tags sit on
+many notes while most are rare.
+"""
+
+import math
+import random
+from datetime import datetime, timedelta
+
+WORDS = """
+able about account action add after again against algorithm allow already also
+always answer api append array async await backend batch before begin between
+branch buffer build bytes cache call case change check class client close code
+column commit config connection context copy count create cursor data database
+debug default delete deploy design dict diff docker draft edit error event
+example export feature fetch field file filter first fix flask function git
+global graph handler hash header idea import index input insert issue item
+job join json key lambda layout limit line list load lock log loop merge
+message method migration model module network node note number object offset
+option order output package page parse patch path plan pool post query queue
+react read record refactor release remove render request response result
+retry return review route row schema search select server session set sort
+source split sql stack state status step store stream string sync table task
+test thread token trace type update user value version view worker write
+""".split()
+
+# Weighted to resemble a developer's notebook: mostly prose, some code
+LANGUAGES = [("markdown", 60), ("python", 15), ("javascript", 15), ("plaintext", 10)]
+
+# How many tags a note carries, and how likely each count is
+TAG_COUNTS = [(0, 20), (1, 35), (2, 25), (3, 12), (5, 8)]
+
+def _weighted(rng, choices):
+    values, weights = zip(*choices)
+    return rng.choices(values, weights)[0]
+
+def _sentence(rng, words=None):
+    words = words or rng.randint(6, 18)
+    text = " ".join(rng.choice(WORDS) for _ in range(words))
+    return text[0].upper() + text[1:] + "."
+
+def _body(rng, language, size):
+    lines = []
+    length = 0
+    while length < size:
+        if language == "markdown":
+            line = (f"## {_sentence(rng, 3)[:-1]}" if rng.random() < 0.1 else
+                    f"- {_sentence(rng)}" if rng.random() < 0.3 else
+                    " ".join(_sentence(rng) for _ in range(rng.randint(1, 4))))
+        elif language == "python":
+            name = "_".join(rng.sample(WORDS, 2))
+            line = rng.choice([f"def {name}({rng.choice(WORDS)}):",
+                               f"    return {rng.choice(WORDS)}.{name}()",
+                               f"    # {_sentence(rng)}",
+                               f"{name} = {rng.randint(0, 999)}"])
+        elif language == "javascript":
+            name = rng.choice(WORDS) + rng.choice(WORDS).title()
+            line = rng.choice([f"function {name}({rng.choice(WORDS)}) {{",
+                               f"  return {rng.choice(WORDS)}.{name}();",
+                               f"// {_sentence(rng)}",
+                               f"const {name} = {rng.randint(0, 999)};", "}"])
+        else:
+            line = _sentence(rng)
+        lines.append(line)
+        length += len(line) + 1
+    return "\n".join(lines)[:size]
+
+class Corpus:
+    """Deterministic benchmark data for ``users`` users with ``notes_per_user`` notes each."""
+
+    def __init__(self, seed=42, users=5, notes_per_user=200, tag_vocabulary=300,
+                 median_bytes=1500, max_bytes=256 * 1024):
+        self.seed = seed
+        self.users = users
+        self.notes_per_user = notes_per_user
+        self.tags = [f"{word}-{i}" for i, word in
+                     enumerate(random.Random(seed).choices(WORDS, k=tag_vocabulary))]
+        self.median_bytes = median_bytes
+        self.max_bytes = max_bytes
+
+    def describe(self):
+        return {
+            "seed": self.seed,
+            "users": self.users,
+            "notes_per_user": self.notes_per_user,
+            "tag_vocabulary": len(self.tags),
+            "median_bytes": self.median_bytes,
+            "max_bytes": self.max_bytes
+        }
+
+    def rng(self, *stream):
+        """A generator for one named stream, independent of the others."""
+        return random.Random(f"{self.seed}:{':'.join(map(str, stream))}")
+
+    def credentials(self):
+        return [(f"bench{i}@example.com", f"BenchPassword{i}!") for i in range(self.users)]
+
+    def size(self, rng):
+        size = int(rng.lognormvariate(math.log(self.median_bytes), 1.1))
+        return max(20, min(size, self.max_bytes))
+
+    def tag_names(self, rng):
+        picked = []
+        for _ in range(_weighted(rng, TAG_COUNTS)):
+            # Zipf-like: low indexes are far more popular than high ones
+            index = int(rng.paretovariate(1.1)) - 1
+            picked.append(self.tags[index % len(self.tags)])
+        return list(dict.fromkeys(picked))
+
+    def note(self, rng, created_at=None):
+        language = _weighted(rng, LANGUAGES)
+        return {
+            "title": _sentence(rng, rng.randint(2, 7))[:-1],
+            "content_md": _body(rng, language, self.size(rng)),
+            "language": language,
+            "favorite": rng.random() < 0.1,
+            "tags": self.tag_names(rng),
+            "created_at": (created_at or datetime(2024, 1, 1)).isoformat()
+        }
+
+    def notes(self, user_index):
+        rng = self.rng("notes", user_index)
+        start = datetime(2024, 1, 1)
+        for i in range(self.notes_per_user):
+            yield self.note(rng, start + timedelta(minutes=37 * i))
+
+    def search_terms(self, rng, count):
+        return [rng.choice(WORDS[:80]) for _ in range(count)]
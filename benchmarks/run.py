@@ -0,0 +1,246 @@
+# benchmarks/run.py
+"""Scenario benchmarks for the DevPad API.
+
+Seeds a database from a deterministic corpus (see benchmarks/corpus.py), then
+drives the app in-process through Flask's test client, so results reflect
+the server code and database rather than network or WSGI server overhead.
+
+Usage:
+    python -m benchmarks.run [--database-url URL --reset] [--scenarios list,search]
+                             [--users 5] [--notes 200] [--iterations 200]
+                             [--seed 42] [--output results.json]
+
+Without --database-url a throwaway SQLite file is used. Pointing at Postgres
+(e.g. postgresql://localhost/devpad_bench) requires --reset, since the
+tables are dropped and recreated before seeding.
+
+Results are JSON: one entry per scenario with latency percentiles, throughput
+and SQL statements per operation. Compare two runs with benchmarks.compare.
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from benchmarks.corpus import Corpus
+
+class Context:
+    """State shared by the scenarios: the client, users and their note ids."""
+
+    def __init__(self, app, corpus):
+        self.app = app
+        self.corpus = corpus
+        self.client = app.test_client()
+        self.headers = []
+        self.note_ids = []
+        self.rng = corpus.rng("scenarios")
+
+    def user(self):
+        index = self.rng.randrange(len(self.headers))
+        return index, self.headers[index]
+
+    def note(self):
+        index, headers = self.user()
+        return self.rng.choice(self.note_ids[index]), headers
+
+def _check(response, *ok):
+    if response.status_code not in ok:
+        raise RuntimeError(f"{response.request.method} {response.request.path} -> {response.status_code}")
+    return response
+
+def scenario_list(ctx):
+    _, headers = ctx.user()
+    _check(ctx.client.get("/api/notes", headers=headers), 200)
+
+def scenario_list_summary(ctx):
+    _, headers = ctx.user()
+    _check(ctx.client.get("/api/notes?fields=summary", headers=headers), 200)
+
+def scenario_get(ctx):
+    note_id, headers = ctx.note()
+    _check(ctx.client.get(f"/api/notes/{note_id}", headers=headers), 200)
+
+def scenario_create(ctx):
+    index, headers = ctx.user()
+    response = _check(ctx.client.post("/api/notes", json=ctx.corpus.note(ctx.rng), headers=headers), 201)
+    ctx.note_ids[index].append(response.get_json()["id"])
+
+def scenario_update(ctx):
+    note_id, headers = ctx.note()
+    body = {"content_md": ctx.corpus.note(ctx.rng)["content_md"], "tags": ctx.corpus.tag_names(ctx.rng)}
+    _check(ctx.client.put(f"/api/notes/{note_id}", json=body, headers=headers), 200)
+
+def scenario_search(ctx):
+    _, headers = ctx.user()
+    term = ctx.corpus.search_terms(ctx.rng, 1)[0]
+    _check(ctx.client.get(f"/api/notes/search?q={term}", headers=headers), 200)
+
+def scenario_login(ctx):
+    email, password = ctx.rng.choice(ctx.corpus.credentials())
+    _check(ctx.client.post("/api/auth/login", json={"email": email, "password": password}), 200)
+
+def scenario_export(ctx):
+    _, headers = ctx.user()
+    response = _check(ctx.client.get("/api/notes/export", headers=headers), 200)
+    for _ in response.response:
+        pass
+    response.close()
+
+# name: (function, iterations relative to --iterations)
+SCENARIOS = {
+    "list": (scenario_list, 1),
+    "list_summary": (scenario_list_summary, 1),
+    "get": (scenario_get, 1),
+    "create": (scenario_create, 1),
+    "update": (scenario_update, 1),
+    "search": (scenario_search, 1),
+    "login": (scenario_login, 0.1),
+    "export": (scenario_export, 0.05)
+}
+
+def seed(ctx):
+    """Register the corpus users and import their notes through the API."""
+    for index, (email, password) in enumerate(ctx.corpus.credentials()):
+        response = _check(ctx.client.post("/api/auth/register",
+                                          json={"email": email, "password": password}), 201)
+        headers = {"Authorization": f"Bearer {response.get_json()['access_token']}"}
+        body = "".join(json.dumps(n) + "\n" for n in ctx.corpus.notes(index))
+        _check(ctx.client.post("/api/notes/import", data=body.encode("utf-8"),
+                               headers={**headers, "Content-Type": "application/x-ndjson"}), 200)
+        ids, path = [], "/api/notes?limit=500&fields=summary"
+        while path:
+            page = _check(ctx.client.get(path, headers=headers), 200)
+            ids.extend(n["id"] for n in page.get_json())
+            cursor = page.headers.get("X-Next-Cursor")
+            path = cursor and f"/api/notes?limit=500&fields=summary&cursor={cursor}"
+        ctx.headers.append(headers)
+        ctx.note_ids.append(ids)
+
+def _percentile(ordered, pct):
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+def measure(ctx, fn, iterations, warmup):
+    for _ in range(warmup):
+        fn(ctx)
+    statements = [0]
+    def count(*args):
+        statements[0] += 1
+    event.listen(Engine, "before_cursor_execute", count)
+    timings = []
+    try:
+        started = time.perf_counter()
+        for _ in range(iterations):
+            t0 = time.perf_counter()
+            fn(ctx)
+            timings.append(time.perf_counter() - t0)
+        wall = time.perf_counter() - started
+    finally:
+        event.remove(Engine, "before_cursor_execute", count)
+    ordered = sorted(t * 1000 for t in timings)
+    return {
+        "iterations": iterations,
+        "mean_ms": round(statistics.fmean(ordered), 3),
+        "p50_ms": round(_percentile(ordered, 50), 3),
+        "p95_ms": round(_percentile(ordered, 95), 3),
+        "p99_ms": round(_percentile(ordered, 99), 3),
+        "max_ms": round(ordered[-1], 3),
+        "ops_per_sec": round(iterations / wall, 2),
+        "sql_per_op": round(statements[0] / iterations, 2)
+    }
+
+def _commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], check=True,
+                              capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run(database_url, corpus, scenarios, iterations, warmup=5, response_cache=False,
+        bcrypt_rounds=12):
+    from server.app import create_app
+    from server.extensions import db
+
+    app = create_app({
+        "SQLALCHEMY_DATABASE_URI": database_url,
+        "BCRYPT_LOG_ROUNDS": bcrypt_rounds,
+        # With the cache on, repeat reads measure the cache instead of the database
+        "RESPONSE_CACHE_TTL": 300 if response_cache else 0,
+        "NOTE_VERSION_COALESCE_SECONDS": 0
+    })
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        ctx = Context(app, corpus)
+        seed_started = time.perf_counter()
+        seed(ctx)
+        seed_seconds = time.perf_counter() - seed_started
+
+        results = {}
+        for name in scenarios:
+            fn, share = SCENARIOS[name]
+            count = max(1, int(iterations * share))
+            results[name] = measure(ctx, fn, count, min(warmup, count))
+        backend = db.engine.dialect.name
+
+    return {
+        "benchmark": "scenarios",
+        "commit": _commit(),
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "database": backend,
+        "response_cache": response_cache,
+        "bcrypt_rounds": bcrypt_rounds,
+        "corpus": corpus.describe(),
+        "seed_seconds": round(seed_seconds, 3),
+        "results": results
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", default=None)
+    parser.add_argument("--reset", action="store_true",
+                        help="Allow dropping and recreating tables in --database-url.")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                        help=f"Comma-separated, from: {', '.join(SCENARIOS)}")
+    parser.add_argument("--users", type=int, default=5)
+    parser.add_argument("--notes", type=int, default=200, help="Notes per user.")
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--bcrypt-rounds", type=int, default=12)
+    parser.add_argument("--response-cache", action="store_true")
+    parser.add_argument("--output", default=None, help="Write JSON here instead of stdout.")
+    args = parser.parse_args(argv)
+
+    scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = [s for s in scenarios if s not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(unknown)}")
+    if args.database_url and not args.reset:
+        parser.error("--database-url drops and recreates every table; pass --reset to confirm")
+
+    corpus = Corpus(seed=args.seed, users=args.users, notes_per_user=args.notes)
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = args.database_url or f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        report = run(database_url, corpus, scenarios, args.iterations, args.warmup,
+                     args.response_cache, args.bcrypt_rounds)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+if __name__ == "__main__":
+    sys.exit(main())
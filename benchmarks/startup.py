@@ -0,0 +1,79 @@
+# benchmarks/startup.py
+"""Cold-start benchmark for the DevPad API.
+
+Each run happens in a fresh interpreter so nothing is already imported or
+connected. For every run we record, in milliseconds:
+
+  import_ms         importing server.app
+  create_app_ms     building the app with create_app()
+  first_request_ms  serving GET /api/ping
+  first_query_ms    serving the first request that touches the database
+
+Usage:
+    python -m benchmarks.startup [--runs 10] [--database-url URL]
+
+Prints one JSON object with per-run samples plus min/median/max.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+PROBE = r"""
+import json, sys, time
+t0 = time.perf_counter()
+from server.app import create_app
+t1 = time.perf_counter()
+app = create_app({"SQLALCHEMY_DATABASE_URI": sys.argv[1], "BCRYPT_LOG_ROUNDS": 4})
+t2 = time.perf_counter()
+client = app.test_client()
+assert client.get("/api/ping").status_code == 200
+t3 = time.perf_counter()
+client.post("/api/auth/login", json={"email": "bench@example.com", "password": "x"})
+t4 = time.perf_counter()
+print(json.dumps({
+    "import_ms": (t1 - t0) * 1000,
+    "create_app_ms": (t2 - t1) * 1000,
+    "first_request_ms": (t3 - t2) * 1000,
+    "first_query_ms": (t4 - t3) * 1000,
+}))
+"""
+
+def _run(database_url, env):
+    out = subprocess.run([sys.executable, "-c", PROBE, database_url],
+                         check=True, capture_output=True, text=True, env=env)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--database-url", default=None,
+                        help="Defaults to a throwaway SQLite file.")
+    args = parser.parse_args(argv)
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = {**os.environ, "PYTHONPATH": root}
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = args.database_url or f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        # Tables are created once up front, as a deploy would with `flask init-db`
+        subprocess.run([sys.executable, "-m", "flask", "--app", "server.app", "init-db"],
+                       check=True, capture_output=True, env={**env, "DATABASE_URL": database_url})
+        samples = [_run(database_url, env) for _ in range(args.runs)]
+
+    summary = {}
+    for key in samples[0]:
+        values = [s[key] for s in samples]
+        summary[key] = {
+            "min": round(min(values), 2),
+            "median": round(statistics.median(values), 2),
+            "max": round(max(values), 2),
+        }
+    print(json.dumps({"benchmark": "startup", "runs": args.runs,
+                      "summary": summary, "samples": samples}, indent=2))
+
+if __name__ == "__main__":
+    main()
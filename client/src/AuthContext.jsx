@@ -1,4 +1,5 @@
 import { createContext, useEffect, useState } from "react";
+import { logoutSession } from "./api";
 
 const AuthContext = createContext();
 
@@ -12,7 +13,17 @@ export function AuthProvider({ children }) {
     else localStorage.removeItem("devpad_token");
   }, [token]);
 
-  const logout = () => setToken("");
+  // api.js announces tokens renewed through the refresh endpoint
+  useEffect(() => {
+    const onToken = (e) => setToken(e.detail || "");
+    window.addEventListener("devpad:token", onToken);
+    return () => window.removeEventListener("devpad:token", onToken);
+  }, []);
+
+  const logout = () => {
+    logoutSession();
+    setToken("");
+  };
 
   return (
     <AuthContext.Provider value={{ token, setToken, logout }}>
@@ -23,26 +23,112 @@ export async function login(email, password) {
   return res.json();
 }
 
-// ---- Helper for authenticated requests ----
-function authFetch(path, token, opts = {}) {
-  return fetch(`${BASE}${path}`, {
-    ...opts,
-    headers: {
-      "Content-Type": "application/json",
-      Authorization: `Bearer ${token}`,
-      ...(opts.headers || {}),
-    },
+// ---- Token refresh ----
+// Access tokens are short-lived. On a 401 we swap the stored refresh token for
+// a new pair once, shared by every request that failed at the same time, since
+// the server treats a refresh token used twice as stolen.
+let refreshing = null;
+
+export function saveSession({ access_token, refresh_token }) {
+  if (refresh_token) localStorage.setItem("devpad_refresh", refresh_token);
+  window.dispatchEvent(new CustomEvent("devpad:token", { detail: access_token }));
+}
+
+async function refreshSession() {
+  const refreshToken = localStorage.getItem("devpad_refresh");
+  if (!refreshToken) return null;
+  const res = await fetch(`${BASE}/api/auth/refresh`, {
+    method: "POST",
+    headers: { Authorization: `Bearer ${refreshToken}` },
   });
+  if (!res.ok) {
+    localStorage.removeItem("devpad_refresh");
+    return null;
+  }
+  const tokens = await res.json();
+  saveSession(tokens);
+  return tokens.access_token;
+}
+
+export async function logoutSession() {
+  const refreshToken = localStorage.getItem("devpad_refresh");
+  localStorage.removeItem("devpad_refresh");
+  if (refreshToken) {
+    await fetch(`${BASE}/api/auth/logout`, {
+      method: "POST",
+      headers: { Authorization: `Bearer ${refreshToken}` },
+    }).catch(() => {});
+  }
+}
+
+// ---- Helper for authenticated requests ----
+async function authFetch(path, token, opts = {}) {
+  const send = (t) =>
+    fetch(`${BASE}${path}`, {
+      ...opts,
+      headers: {
+        "Content-Type": "application/json",
+        Authorization: `Bearer ${t}`,
+        ...(opts.headers || {}),
+      },
+    });
+  const res = await send(token);
+  if (res.status !== 401) return res;
+  refreshing = refreshing || refreshSession().finally(() => (refreshing = null));
+  const fresh = await refreshing;
+  return fresh ? send(fresh) : res;
 }
 
 // ---- Notes ----
-export async function listNotes(token) {
-  const res = await authFetch(`/api/notes`, token);
+export async function listNotes(token, { fields, tags = [], match, language, favorite } = {}) {
+  // The server pages results; follow X-Next-Cursor until the last page
+  const notes = [];
+  let cursor = null;
+  do {
+    const params = new URLSearchParams();
+    if (fields) params.set("fields", fields);
+    for (const tag of tags) params.append("tag", tag);
+    if (match) params.set("match", match);
+    if (language) params.set("language", language);
+    if (favorite !== undefined) params.set("favorite", String(favorite));
+    if (cursor) params.set("cursor", cursor);
+    const qs = params.toString();
+    const res = await authFetch(`/api/notes${qs ? `?${qs}` : ""}`, token);
+    if (!res.ok) {
+      throw new Error(`Failed to fetch notes: ${res.status} ${res.statusText}`);
+    }
+    const data = await res.json();
+    if (Array.isArray(data)) notes.push(...data);
+    cursor = res.headers.get("X-Next-Cursor");
+  } while (cursor);
+  return notes;
+}
+
+export async function listTags(token) {
+  // [{ name, count }], most used first
+  const res = await authFetch(`/api/tags`, token);
   if (!res.ok) {
-    throw new Error(`Failed to fetch notes: ${res.status} ${res.statusText}`);
+    throw new Error(`Failed to fetch tags: ${res.status} ${res.statusText}`);
   }
-  const data = await res.json();
-  return Array.isArray(data) ? data : [];
+  return res.json();
+}
+
+export async function searchNotes(token, query, { limit = 50 } = {}) {
+  const params = new URLSearchParams({ q: query, limit: String(limit) });
+  const res = await authFetch(`/api/notes/search?${params}`, token);
+  if (!res.ok) {
+    throw new Error(`Failed to search notes: ${res.status} ${res.statusText}`);
+  }
+  return res.json();
+}
+
+// The note's ETag comes along as `etag`, for a later conditional update
+export async function getNote(token, id) {
+  const res = await authFetch(`/api/notes/${id}`, token);
+  if (!res.ok) {
+    throw new Error(`Failed to fetch note: ${res.status} ${res.statusText}`);
+  }
+  return { ...(await res.json()), etag: res.headers.get("ETag") };
 }
 
 export async function createNote(token, note) {
@@ -56,11 +142,38 @@ export async function createNote(token, note) {
   return res.json();
 }
 
-export async function updateNote(token, id, note) {
+// With an etag (from getNote), the update only applies if the note is still
+// that version; otherwise resolves to null (412) so nothing newer is overwritten.
+export async function updateNote(token, id, note, { etag } = {}) {
   const res = await authFetch(`/api/notes/${id}`, token, {
     method: "PUT",
+    headers: etag ? { "If-Match": etag } : {},
     body: JSON.stringify(note),
   });
+  if (res.status === 412) return null;
+  return res.json();
+}
+
+// Send only the edited span of content_md. Resolves to null when the server
+// rejects the base revision as stale (409) so the caller can fall back.
+export async function patchNote(token, id, baseRevision, ops, fields = {}) {
+  const res = await authFetch(`/api/notes/${id}`, token, {
+    method: "PATCH",
+    body: JSON.stringify({ base_revision: baseRevision, ops, ...fields }),
+  });
+  if (res.status === 409) return null;
+  if (!res.ok) {
+    throw new Error(`Failed to patch note: ${res.status} ${res.statusText}`);
+  }
+  return res.json();
+}
+
+// Run several create/update/delete operations in one request and transaction
+export async function batchNotes(token, ops, { atomic = false } = {}) {
+  const res = await authFetch(`/api/notes/batch`, token, {
+    method: "POST",
+    body: JSON.stringify({ ops, atomic }),
+  });
   return res.json();
 }
 
@@ -70,3 +183,80 @@ export async function deleteNote(token, id) {
   });
   return res.json();
 }
+
+// ---- Attachments ----
+// Files are uploaded as the raw request body and referenced from the note by
+// URL, so the note text never carries base64 data
+export async function uploadAttachment(token, noteId, file) {
+  const params = new URLSearchParams({ filename: file.name || "attachment" });
+  const res = await authFetch(`/api/notes/${noteId}/attachments?${params}`, token, {
+    method: "POST",
+    headers: { "Content-Type": file.type || "application/octet-stream" },
+    body: file,
+  });
+  if (!res.ok) {
+    throw new Error(`Failed to upload attachment: ${res.status} ${res.statusText}`);
+  }
+  return res.json();
+}
+
+export async function listAttachments(token, noteId) {
+  const res = await authFetch(`/api/notes/${noteId}/attachments`, token);
+  if (!res.ok) {
+    throw new Error(`Failed to fetch attachments: ${res.status} ${res.statusText}`);
+  }
+  return res.json();
+}
+
+// For <img src>, which cannot send an Authorization header
+export function attachmentUrl(attachment, token) {
+  return `${BASE}${attachment.url}?jwt=${encodeURIComponent(token)}`;
+}
+
+// ---- Rendering ----
+// Notes are rendered and sanitized on the server; code blocks need the
+// stylesheet at highlightCssUrl
+export async function getNoteHtml(token, id) {
+  const res = await authFetch(`/api/notes/${id}/html`, token);
+  if (!res.ok) {
+    throw new Error(`Failed to render note: ${res.status} ${res.statusText}`);
+  }
+  return res.json();
+}
+
+export const highlightCssUrl = `${BASE}/api/notes/highlight.css`;
+
+// ---- Thumbnails ----
+// Card images are stored per note and content hash, so any device can reuse
+// one drawn elsewhere. Ask which are current, then draw and upload the rest.
+export async function getThumbnailStatus(token, ids) {
+  const res = await authFetch("/api/notes/thumbnails", token, {
+    method: "POST",
+    body: JSON.stringify({ ids }),
+  });
+  if (!res.ok) {
+    throw new Error(`Failed to fetch thumbnails: ${res.status} ${res.statusText}`);
+  }
+  return res.json();
+}
+
+export async function uploadThumbnail(token, noteId, contentHash, blob) {
+  const res = await authFetch(`/api/notes/${noteId}/thumbnail/${contentHash}`, token, {
+    method: "PUT",
+    headers: { "Content-Type": blob.type || "image/png" },
+    body: blob,
+  });
+  if (res.status === 409) {
+    // The note changed since the image was drawn
+    return null;
+  }
+  if (!res.ok) {
+    throw new Error(`Failed to upload thumbnail: ${res.status} ${res.statusText}`);
+  }
+  return res.json();
+}
+
+// For <img src>, which cannot send an Authorization header
+export function thumbnailUrl(thumbnail, token) {
+  return `${BASE}${thumbnail.url}?jwt=${encodeURIComponent(token)}`;
+}
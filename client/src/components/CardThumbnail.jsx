@@ -7,7 +7,7 @@ import { useEffect, useRef } from "react";
  * - Memoizes by (note.id + note.updated_at) implicitly via React; parent re-renders update it.
  *
  * Props:
- *  - note: { id, title, content_md, updated_at }
+ *  - note: { id, title, preview or content_md, updated_at }
  *  - className: size wrapper (use aspect-[4/3] w-full)
  */
 export default function CardThumbnail({ note, className = "" }) {
@@ -84,14 +84,14 @@ export default function CardThumbnail({ note, className = "" }) {
     wrap(title, cssW - pad * 2, 22, "700 17px -apple-system, BlinkMacSystemFont, system-ui, sans-serif", "#1d1d1f", 2);
 
     // body (first lines of content)
-    const body = (note?.content_md || "")
+    const body = (note?.preview ?? note?.content_md ?? "")
       .replace(/^#+\s+/gm, "")      // strip markdown headers
       .replace(/`{1,3}/g, "")       // strip ticks
       .replace(/\*\*?|__|\*|_/g, "") // strip basic emphasis
       .trim();
 
     wrap(body || " ", cssW - pad * 2, 19, "400 14px ui-monospace, SFMono-Regular, Menlo, Consolas, monospace", "#424245", 7);
-  }, [note?.id, note?.title, note?.content_md, note?.updated_at]);
+  }, [note?.id, note?.title, note?.preview, note?.content_md, note?.updated_at]);
 
   // wrapper controls size & rounding; canvas fills it
   return (
@@ -12,7 +12,7 @@ export default function NoteGrid({ notes, onRename, onDelete }) {
             />
           </div>
           <h3 className="pr-10 text-lg font-semibold text-white">{n.title}</h3>
-          <p className="mt-1 line-clamp-4 whitespace-pre-wrap text-sm text-gray-300">{n.content_md}</p>
+          <p className="mt-1 line-clamp-4 whitespace-pre-wrap text-sm text-gray-300">{n.preview ?? n.content_md}</p>
           <p className="mt-2 text-xs text-gray-400">
             {n.language || "plaintext"} — {new Date(n.updated_at).toLocaleDateString()}
           </p>
@@ -62,9 +62,9 @@ export function NoteCard({ note, onSelect, onDelete, isSelected }) {
         </div>
         
         <div className="flex-1 mb-3 overflow-hidden">
-          {note.content_md ? (
+          {(note.preview ?? note.content_md) ? (
             <p className="text-sm text-gray-600 dark:text-gray-300 line-clamp-3">
-              {note.content_md.replace(/[#*`\[\]]/g, '')}
+              {(note.preview ?? note.content_md).replace(/[#*`\[\]]/g, '')}
             </p>
           ) : (
             <p className="text-gray-400 italic text-sm">No content</p>
@@ -55,7 +55,7 @@ export function NoteListItem({ note, onSelect, onDelete, isSelected }) {
         </div>
         
         <p className="mt-1 text-sm text-gray-600 dark:text-gray-300 truncate">
-          {note.content_md ? generateThumbnail(note.content_md) : 'No content'}
+          {(note.preview ?? note.content_md) ? generateThumbnail(note.preview ?? note.content_md) : 'No content'}
         </p>
         
         <div className="mt-1 flex items-center text-xs text-gray-500 dark:text-gray-400">
@@ -2,7 +2,7 @@
 import { useContext, useEffect, useState } from "react";
 import { useNavigate } from "react-router-dom";
 import AuthContext from "../AuthContext";
-import { listNotes, updateNote, deleteNote } from "../api";
+import { listNotes, searchNotes, updateNote, deleteNote } from "../api";
 import NoteListPane from "../components/NoteListPane";
 import ViewToggle from "../components/ViewToggle";
 import NoteList from "../components/NoteList";
@@ -91,6 +91,7 @@ export default function Dashboard() {
   const [notes, setNotes] = useState([]);
   const [loading, setLoading] = useState(true);
   const [searchQuery, setSearchQuery] = useState('');
+  const [searchResults, setSearchResults] = useState(null);
   const [viewMode, setViewMode] = useState('grid'); // 'grid' or 'list'
   const [selectedNote, setSelectedNote] = useState(null);
   const [isSidebarOpen, setIsSidebarOpen] = useState(true);
@@ -105,7 +106,8 @@ export default function Dashboard() {
 
     const fetchNotes = async () => {
       try {
-        const data = await listNotes(token);
+        // Cards only need the stored preview, not the note bodies
+        const data = await listNotes(token, { fields: "summary" });
         setNotes(data);
         setLoading(false);
       } catch (error) {
@@ -135,12 +137,24 @@ export default function Dashboard() {
     }
   };
 
-  // Filter notes based on search query
-  const filteredNotes = notes.filter(
-    (note) =>
-      note.title.toLowerCase().includes(searchQuery.toLowerCase()) ||
-      (note.content_md || '').toLowerCase().includes(searchQuery.toLowerCase())
-  );
+  // Search on the server, debounced so typing doesn't fire a request per key
+  useEffect(() => {
+    const query = searchQuery.trim();
+    if (!query) {
+      setSearchResults(null);
+      return;
+    }
+    const timer = setTimeout(async () => {
+      try {
+        setSearchResults(await searchNotes(token, query));
+      } catch (error) {
+        console.error('Failed to search notes:', error);
+      }
+    }, 250);
+    return () => clearTimeout(timer);
+  }, [searchQuery, token]);
+
+  const filteredNotes = searchResults ?? notes;
 
   // Group notes by date and pinned status
   const groupedNotes = groupNotesByDate(filteredNotes);
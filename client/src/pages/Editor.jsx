@@ -1,11 +1,26 @@
 import { useEffect, useMemo, useRef, useState, useContext } from "react";
 import { useNavigate, useParams } from "react-router-dom";
 import AuthContext from "../AuthContext";
-import { listNotes, createNote, updateNote } from "../api";
+import { getNote, createNote, updateNote, patchNote } from "../api";
 import CodeMirror from "@uiw/react-codemirror";
 import { markdown } from "@codemirror/lang-markdown";
 import { oneDark } from "@codemirror/theme-one-dark";
 
+// Single replace op covering the changed span between two strings.
+// Indices are UTF-16 code units, which is what the server expects.
+function diffOps(before, after) {
+  if (before === after) return [];
+  let start = 0;
+  const max = Math.min(before.length, after.length);
+  while (start < max && before[start] === after[start]) start++;
+  let end = 0;
+  while (
+    end < max - start &&
+    before[before.length - 1 - end] === after[after.length - 1 - end]
+  ) end++;
+  return [{ start, end: before.length - end, text: after.slice(start, after.length - end) }];
+}
+
 export default function Editor({ mode }) {
   const navigate = useNavigate();
   const { id } = useParams();               // undefined in "new" mode
@@ -15,6 +30,9 @@ export default function Editor({ mode }) {
   const [title, setTitle] = useState("Untitled");
   const [content, setContent] = useState("");
   const [saving, setSaving] = useState(false);
+  // Server copy that changed under us; autosave pauses until the user picks a side
+  const [conflict, setConflict] = useState(null);
+  const saved = useRef(null); // { title, content, revision } last acknowledged by the server
 
   const isNew = mode === "new" || !id;
   const cmExtensions = useMemo(() => [markdown()], []);
@@ -23,22 +41,57 @@ export default function Editor({ mode }) {
   useEffect(() => {
     if (isNew) return;
     (async () => {
-      const all = await listNotes(token);
-      const found = all.find((n) => String(n.id) === String(id));
+      const found = await getNote(token, id).catch(() => null);
       setNote(found || null);
       setTitle(found?.title || "Untitled");
       setContent(found?.content_md || "");
+      saved.current = found
+        ? { title: found.title, content: found.content_md, revision: found.revision }
+        : null;
     })();
   }, [id, isNew, token]);
 
   // Debounced autosave
   const saveTimer = useRef();
   const triggerSave = async () => {
-    if (isNew || !note) return; // for new note we save on first keystroke below
+    if (isNew || !note || conflict || !saved.current) return; // new notes are created below
+    if (saved.current.content === content && saved.current.title === title) return;
+    setSaving(true);
+    const ops = diffOps(saved.current.content, content);
+    const result = await patchNote(token, note.id, saved.current.revision, ops, { title });
+    if (result) {
+      saved.current = { title, content, revision: result.revision };
+    } else {
+      // Someone else saved since our base revision; show both instead of overwriting
+      setConflict(await getNote(token, note.id));
+    }
+    setSaving(false);
+  };
+
+  const keepMine = async () => {
     setSaving(true);
-    await updateNote(token, note.id, { title, content_md: content });
+    const result = await updateNote(
+      token, note.id,
+      { title, content_md: content, tags: conflict.tags || [] },
+      { etag: conflict.etag }
+    );
+    if (result) {
+      saved.current = { title, content, revision: result.revision };
+      setConflict(null);
+    } else {
+      // Changed yet again while deciding; show the newest copy
+      setConflict(await getNote(token, note.id));
+    }
     setSaving(false);
   };
+
+  const useTheirs = () => {
+    saved.current = { title: conflict.title, content: conflict.content_md, revision: conflict.revision };
+    setTitle(conflict.title);
+    setContent(conflict.content_md);
+    setNote(conflict);
+    setConflict(null);
+  };
   useEffect(() => {
     clearTimeout(saveTimer.current);
     // if new: create on first change to get an ID
@@ -50,13 +103,14 @@ export default function Editor({ mode }) {
         // navigate to real ID route so further saves update
         navigate(`/notes/${created.id}`, { replace: true });
         setNote({ id: created.id, title, content_md: content });
+        saved.current = { title, content, revision: 1 };
         return;
       }
       if (note) await triggerSave();
     }, 600);
     return () => clearTimeout(saveTimer.current);
     // eslint-disable-next-line react-hooks/exhaustive-deps
-  }, [title, content, note?.id, isNew]);
+  }, [title, content, note?.id, isNew, conflict]);
 
   // Cmd/Ctrl+S manual save
   useEffect(() => {
@@ -68,7 +122,7 @@ export default function Editor({ mode }) {
     };
     window.addEventListener("keydown", onKey);
     return () => window.removeEventListener("keydown", onKey);
-  }, [note, title, content]);
+  }, [note, title, content, conflict]);
 
   return (
     <div className="h-screen w-screen overflow-hidden bg-black text-gray-100">
@@ -89,12 +143,22 @@ export default function Editor({ mode }) {
           </div>
         </div>
         <div className="flex items-center gap-2">
-          <span className="text-xs text-gray-300">{saving ? "Saving…" : "Saved"}</span>
+          <span className="text-xs text-gray-300">{saving ? "Saving…" : conflict ? "Conflict" : "Saved"}</span>
           <button className="rounded bg-black/30 px-2 py-1 text-sm text-gray-200 hover:bg-black/40">🔗</button>
           <button className="rounded bg-black/30 px-2 py-1 text-sm text-gray-200 hover:bg-black/40">✏️</button>
         </div>
       </div>
 
+      {conflict && (
+        <div className="flex items-center justify-between gap-3 border-b border-amber-700 bg-amber-900/60 px-3 py-2 text-sm text-amber-100">
+          <span>This note was changed elsewhere (revision {conflict.revision}). Your edits are not saved yet.</span>
+          <div className="flex gap-2">
+            <button onClick={useTheirs} className="rounded bg-black/30 px-2 py-1 hover:bg-black/40">Load their version</button>
+            <button onClick={keepMine} className="rounded bg-black/30 px-2 py-1 hover:bg-black/40">Overwrite with mine</button>
+          </div>
+        </div>
+      )}
+
       {/* Notebook surface */}
       <div className="notebook-bg h-[calc(100vh-44px)] w-full overflow-auto">
         <div className="mx-auto h-full max-w-5xl p-6">
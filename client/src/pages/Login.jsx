@@ -2,7 +2,7 @@
 import { useState, useContext } from "react";
 import { Link, useNavigate } from "react-router-dom";
 import AuthContext from "../AuthContext";
-import { login } from "../api";
+import { login, saveSession } from "../api";
 
 export default function Login() {
   const [email, setEmail] = useState("");
@@ -19,8 +19,9 @@ export default function Login() {
     setError("");
 
     try {
-      const { access_token } = await login(email, password);
-      setToken(access_token);
+      const tokens = await login(email, password);
+      saveSession(tokens);
+      setToken(tokens.access_token);
       navigate("/dashboard");
     } catch (err) {
       setError(err.message || "Login failed");
@@ -2,7 +2,7 @@
 import { useState, useContext } from "react";
 import { Link, useNavigate } from "react-router-dom";
 import AuthContext from "../AuthContext";
-import { register } from "../api";
+import { register, saveSession } from "../api";
 
 export default function Register() {
   const [email, setEmail] = useState("");
@@ -26,8 +26,9 @@ export default function Register() {
     }
 
     try {
-      const { access_token } = await register(email, password);
-      setToken(access_token);
+      const tokens = await register(email, password);
+      saveSession(tokens);
+      setToken(tokens.access_token);
       navigate("/dashboard");
     } catch (err) {
       setError(err.message || "Registration failed");
@@ -6,7 +6,17 @@ CREATE TABLE users (
   email           TEXT    NOT NULL UNIQUE,
   password_hash   TEXT    NOT NULL,
   created_at      TIMESTAMP WITH TIME ZONE DEFAULT now() NOT NULL,
-  updated_at      TIMESTAMP WITH TIME ZONE DEFAULT now() NOT NULL
+  updated_at      TIMESTAMP WITH TIME ZONE DEFAULT now() NOT NULL,
+  change_seq      INTEGER DEFAULT 0 NOT NULL       -- last change sequence handed out to this user
+);
+
+-- 1b. Large note bodies, compressed and shared by every note with the same text
+CREATE TABLE note_bodies (
+  hash         VARCHAR(64) PRIMARY KEY,            -- SHA-256 of the UTF-8 text
+  codec        VARCHAR(10) DEFAULT 'zlib' NOT NULL,
+  size         INTEGER NOT NULL,                   -- uncompressed bytes
+  data         BYTEA   NOT NULL,
+  created_at   TIMESTAMP WITH TIME ZONE DEFAULT now() NOT NULL
 );
 
 -- 2. Notes
@@ -14,12 +24,23 @@ CREATE TABLE notes (
   id              SERIAL PRIMARY KEY,
   user_id         INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
   title           TEXT    NOT NULL,
-  content_md      TEXT    NOT NULL,               --markdown source
+  content_md      TEXT    NOT NULL,               --markdown source; only the head when body_hash is set
+  body_hash       VARCHAR(64) REFERENCES note_bodies(hash), -- full text lives in note_bodies
+  preview         VARCHAR(160) DEFAULT '' NOT NULL, -- derived from content_md on every write
+  word_count      INTEGER DEFAULT 0 NOT NULL,
+  byte_size       INTEGER DEFAULT 0 NOT NULL,      -- UTF-8 length of content_md
+  content_hash    VARCHAR(64),                     -- SHA-256 of content_md, hex
   language        VARCHAR(30) NOT NULL,           -- e.g. 'python', 'javascript'
   favorite        BOOLEAN DEFAULT FALSE NOT NULL, -- starred
   created_at      TIMESTAMP WITH TIME ZONE DEFAULT now() NOT NULL,
   updated_at      TIMESTAMP WITH TIME ZONE DEFAULT now() NOT NULL,
-  last_viewed_at  TIMESTAMP WITH TIME ZONE         -- can be NULL until first view
+  last_viewed_at  TIMESTAMP WITH TIME ZONE,        -- can be NULL until first view
+  revision        INTEGER DEFAULT 1 NOT NULL,      -- bumped on every update, used for ETags
+  change_seq      INTEGER DEFAULT 0 NOT NULL,      -- per-user sequence of the last change, for sync
+  search_vector   tsvector GENERATED ALWAYS AS (   -- full-text index, maintained by Postgres
+    setweight(to_tsvector('english', title), 'A') ||
+    setweight(to_tsvector('english', left(content_md, 1000000)), 'B')
+  ) STORED
 );
 
 -- 3. Tags
@@ -35,19 +56,90 @@ CREATE TABLE note_tags (
   PRIMARY KEY (note_id, tag_id)
 );
 
--- 5. (Optional) Version history
+-- 5. Version history
+-- The newest row per note holds the full text; older rows hold zlib-compressed
+-- reverse diffs against the next newer row, with periodic full keyframes.
 CREATE TABLE note_versions (
   id           SERIAL PRIMARY KEY,
   note_id      INTEGER NOT NULL REFERENCES notes(id) ON DELETE CASCADE,
-  version_no   INTEGER NOT NULL,                
+  version_no   INTEGER NOT NULL,                -- the note revision it captures
   title        TEXT    NOT NULL,
-  content_md   TEXT    NOT NULL,
   language     VARCHAR(30) NOT NULL,
+  is_keyframe  BOOLEAN DEFAULT TRUE NOT NULL,   -- payload is full text, not a diff
+  payload      BYTEA   NOT NULL,
+  created_at   TIMESTAMP WITH TIME ZONE DEFAULT now() NOT NULL
+);
+
+-- 6. Tombstones for deleted notes, read by incremental sync
+CREATE TABLE note_tombstones (
+  id           SERIAL PRIMARY KEY,
+  user_id      INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+  note_id      INTEGER NOT NULL,
+  change_seq   INTEGER NOT NULL,
+  deleted_at   TIMESTAMP WITH TIME ZONE DEFAULT now() NOT NULL
+);
+
+-- 7. Issued refresh tokens, for rotation and revocation
+CREATE TABLE refresh_tokens (
+  id           SERIAL PRIMARY KEY,
+  jti          VARCHAR(36) UNIQUE NOT NULL,
+  family       VARCHAR(36) NOT NULL,
+  user_id      INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+  expires_at   TIMESTAMP WITH TIME ZONE NOT NULL,
+  revoked_at   TIMESTAMP WITH TIME ZONE,
   created_at   TIMESTAMP WITH TIME ZONE DEFAULT now() NOT NULL
 );
 
--- Indexes to speed up common queries
-CREATE INDEX idx_notes_user       ON notes(user_id);
+-- 7b. Files attached to notes; the bytes live in the blob store under ATTACHMENT_DIR
+CREATE TABLE attachments (
+  id            SERIAL PRIMARY KEY,
+  note_id       INTEGER NOT NULL REFERENCES notes(id) ON DELETE CASCADE,
+  blob_hash     VARCHAR(64) NOT NULL,               -- SHA-256 of the file, its name in the store
+  filename      TEXT    NOT NULL,
+  content_type  VARCHAR(255) NOT NULL,
+  size          INTEGER NOT NULL,
+  created_at    TIMESTAMP WITH TIME ZONE DEFAULT now() NOT NULL
+);
+
+-- 7c. Card thumbnails, one per note; current while content_hash matches the note's
+CREATE TABLE note_thumbnails (
+  note_id       INTEGER PRIMARY KEY REFERENCES notes(id) ON DELETE CASCADE,
+  content_hash  VARCHAR(64) NOT NULL,               -- notes.content_hash it was drawn from
+  blob_hash     VARCHAR(64) NOT NULL,               -- SHA-256 of the image, its name in the store
+  content_type  VARCHAR(255) NOT NULL,
+  size          INTEGER NOT NULL,
+  created_at    TIMESTAMP WITH TIME ZONE DEFAULT now() NOT NULL
+);
+
+-- 8. Applied schema migrations (see server/migrations.py)
+CREATE TABLE schema_migrations (
+  version      VARCHAR(32) PRIMARY KEY,
+  description  TEXT NOT NULL,
+  applied_at   TIMESTAMP NOT NULL
+);
+
+-- Indexes to speed up common queries; keep in step with the models
+-- (tags.name is already indexed by its UNIQUE constraint)
+CREATE INDEX idx_notes_user_updated ON notes(user_id, updated_at DESC, id DESC);
+CREATE INDEX idx_note_tags_tag    ON note_tags(tag_id, note_id);
+CREATE INDEX ix_notes_body_hash   ON notes(body_hash);
+CREATE INDEX ix_attachments_note_id   ON attachments(note_id);
+CREATE INDEX ix_attachments_blob_hash ON attachments(blob_hash);
+CREATE INDEX ix_note_thumbnails_blob_hash ON note_thumbnails(blob_hash);
 CREATE INDEX idx_notes_language   ON notes(language);
-CREATE INDEX idx_note_versions_n  ON note_versions(note_id);
-CREATE INDEX idx_tags_name        ON tags(name);
+CREATE UNIQUE INDEX idx_note_versions_n ON note_versions(note_id, version_no);
+CREATE INDEX idx_notes_search     ON notes USING GIN (search_vector);
+CREATE INDEX idx_notes_user_seq   ON notes(user_id, change_seq);
+CREATE INDEX idx_note_tombstones_user_seq ON note_tombstones(user_id, change_seq);
+CREATE INDEX ix_refresh_tokens_family ON refresh_tokens(family);
+
+-- This file already includes every migration
+INSERT INTO schema_migrations (version, description, applied_at) VALUES
+  ('0001', 'Create any missing tables', now()),
+  ('0002', 'Index listing order and tag lookups; drop redundant indexes', now()),
+  ('0003', 'Cascade deletes from users to notes and from notes to tags and versions', now()),
+  ('0004', 'Add precomputed note summaries and backfill them', now()),
+  ('0005', 'Add out-of-row storage for large note bodies', now()),
+  ('0006', 'Add note attachments', now()),
+  ('0007', 'Add note card thumbnails', now()),
+  ('0008', 'Add note revisions and change sequences to databases that predate them', now());
@@ -1,53 +1,168 @@
 # server/app.py
 
 import os
-import sys
 from datetime import timedelta
 from flask import Flask
 from flask_cors import CORS
 from dotenv import load_dotenv
 
-# Add the parent directory to the Python path
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from server.extensions import db, bcrypt, jwt, hasher, cache, events, metrics, blobs, renderer
+from server.auth.auth_routes import auth_bp
+from server.routes.notes import notes_bp
+from server.routes.tags import tags_bp
+from server.routes.transfer import transfer_bp
+from server.routes.attachments import attachments_bp
+from server.routes.rendering import render_bp
+from server.routes.versions import versions_bp
+from server.routes.internal import internal_bp, metrics_bp
+from server.pool import engine_options
+from server.migrations import db_cli, init_schema
 
-from server.extensions import db, bcrypt, jwt
+def create_app(config=None):
+    """Build a configured DevPad app.
 
-load_dotenv()
+    Nothing here touches the database: engines are created but connect on
+    first use, and tables are created by ``flask init-db`` rather than on
+    import. ``config`` overrides the environment-derived settings.
+    """
+    load_dotenv()
 
-app = Flask(__name__)
-CORS(app)
+    app = Flask(__name__)
+    CORS(app, expose_headers=["ETag", "X-Next-Cursor", "Content-Range", "Accept-Ranges"])
 
-# ─── JWT Configuration ───────────────────────────────────────────────────────
-app.config["JWT_SECRET_KEY"] = os.getenv("JWT_SECRET_KEY", "devpad-secret-key")
-app.config["JWT_ACCESS_TOKEN_EXPIRES"] = timedelta(hours=1)
+    # ─── JWT Configuration ───────────────────────────────────────────────────
+    app.config["JWT_SECRET_KEY"] = os.getenv("JWT_SECRET_KEY", "devpad-secret-key")
+    # Access tokens are short-lived; clients renew them with a rotating refresh token
+    app.config["JWT_ACCESS_TOKEN_EXPIRES"] = timedelta(minutes=int(os.getenv("JWT_ACCESS_TOKEN_MINUTES", 15)))
+    app.config["JWT_REFRESH_TOKEN_EXPIRES"] = timedelta(days=int(os.getenv("JWT_REFRESH_TOKEN_DAYS", 30)))
 
-# ─── Database Configuration ─────────────────────────────────────────────────
-# Uses DATABASE_URL from .env, otherwise falls back to a local SQLite file
-app.config["SQLALCHEMY_DATABASE_URI"] = os.getenv(
-    "DATABASE_URL", "sqlite:///devpad.db"
-)
-app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    # ─── Password Hashing ────────────────────────────────────────────────────
+    # bcrypt runs on a bounded pool; sign-ins beyond the queue limit get a 503
+    app.config["BCRYPT_LOG_ROUNDS"] = int(os.getenv("BCRYPT_LOG_ROUNDS", 12))
+    app.config["PASSWORD_HASH_WORKERS"] = int(os.getenv("PASSWORD_HASH_WORKERS", 2))
+    app.config["PASSWORD_HASH_QUEUE_LIMIT"] = int(os.getenv("PASSWORD_HASH_QUEUE_LIMIT", 16))
 
-# ─── Initialize Extensions ──────────────────────────────────────────────────
-db.init_app(app)
-bcrypt.init_app(app)
-jwt.init_app(app)
+    # ─── Database Configuration ─────────────────────────────────────────────
+    # Uses DATABASE_URL from .env, otherwise falls back to a local SQLite file
+    app.config["SQLALCHEMY_DATABASE_URI"] = os.getenv(
+        "DATABASE_URL", "sqlite:///devpad.db"
+    )
+    app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
 
-# ─── Create Database Tables ──────────────────────────────────────────────────
-with app.app_context():
-    # Import models to ensure they are registered
-    from server.models.note_model import User, Note, Tag
-    db.create_all()
+    # ─── Connection Pool ─────────────────────────────────────────────────────
+    # Set DB_TRANSACTION_POOLER=1 when connecting through PgBouncer in
+    # transaction mode; pool health is reported at /api/internal/stats
+    app.config["DB_POOL_SIZE"] = int(os.getenv("DB_POOL_SIZE", 5))
+    app.config["DB_MAX_OVERFLOW"] = int(os.getenv("DB_MAX_OVERFLOW", 10))
+    app.config["DB_POOL_TIMEOUT"] = int(os.getenv("DB_POOL_TIMEOUT", 30))
+    app.config["DB_POOL_RECYCLE"] = int(os.getenv("DB_POOL_RECYCLE", 1800))
+    app.config["DB_POOL_PRE_PING"] = os.getenv("DB_POOL_PRE_PING", "1") == "1"
+    app.config["DB_TRANSACTION_POOLER"] = os.getenv("DB_TRANSACTION_POOLER", "0") == "1"
+    app.config["INTERNAL_STATS_TOKEN"] = os.getenv("INTERNAL_STATS_TOKEN")
+    # Without a token the internal endpoints are closed. Set this to 1 to
+    # serve loopback callers instead, only where no reverse proxy runs on the
+    # same host (behind one, every request arrives from 127.0.0.1)
+    app.config["INTERNAL_STATS_ALLOW_LOOPBACK"] = os.getenv("INTERNAL_STATS_ALLOW_LOOPBACK", "0") == "1"
 
-@app.route("/api/ping")
-def ping():
-    return {"message": "pong from DevPad!"}
+    # ─── Request Metrics ─────────────────────────────────────────────────────
+    # Prometheus text at /metrics (same access rule as /api/internal/stats).
+    # Requests slower than this are logged with their SQL; 0 turns it off
+    app.config["METRICS_SLOW_REQUEST_MS"] = int(os.getenv("METRICS_SLOW_REQUEST_MS", 0))
 
-# Import and register blueprints after extensions are initialized
-from server.auth.auth_routes import auth_bp
-from server.routes.notes import notes_bp
-app.register_blueprint(auth_bp)
-app.register_blueprint(notes_bp)
+    # ─── Version History ─────────────────────────────────────────────────────
+    # Every save snapshots the note; old versions are stored as compressed diffs
+    app.config["NOTE_VERSION_KEYFRAME_INTERVAL"] = int(os.getenv("NOTE_VERSION_KEYFRAME_INTERVAL", 20))
+    app.config["NOTE_VERSION_RETENTION"] = int(os.getenv("NOTE_VERSION_RETENTION", 500))
+    app.config["NOTE_VERSION_COALESCE_SECONDS"] = int(os.getenv("NOTE_VERSION_COALESCE_SECONDS", 60))
+    app.config["NOTE_VERSION_COMPACT_KEEP_RECENT"] = int(os.getenv("NOTE_VERSION_COMPACT_KEEP_RECENT", 50))
+    app.config["NOTE_VERSION_COMPACT_SPACING"] = int(os.getenv("NOTE_VERSION_COMPACT_SPACING", 3600))
+
+    # ─── Note Storage ────────────────────────────────────────────────────────
+    # Bodies over this many bytes are compressed into a shared, deduplicated
+    # table; ``flask db move-bodies`` converts notes written before that
+    app.config["NOTE_BODY_INLINE_BYTES"] = int(os.getenv("NOTE_BODY_INLINE_BYTES", 64 * 1024))
+
+    # ─── Attachments ─────────────────────────────────────────────────────────
+    # Uploaded files are stored once per distinct content under this directory
+    app.config["ATTACHMENT_DIR"] = os.getenv("ATTACHMENT_DIR", "devpad-attachments")
+    app.config["ATTACHMENT_MAX_BYTES"] = int(os.getenv("ATTACHMENT_MAX_BYTES", 25 * 1024 * 1024))
+    # Card thumbnails share the store; they are small, already-compressed images
+    app.config["THUMBNAIL_MAX_BYTES"] = int(os.getenv("THUMBNAIL_MAX_BYTES", 256 * 1024))
+
+    # ─── Note Rendering ──────────────────────────────────────────────────────
+    # Rendered HTML is kept in memory up to this size, and in RENDER_CACHE_DIR
+    # (if set) for sharing between workers and restarts
+    app.config["RENDER_CACHE_MAX_BYTES"] = int(os.getenv("RENDER_CACHE_MAX_BYTES", 32 * 1024 * 1024))
+    app.config["RENDER_CACHE_DIR"] = os.getenv("RENDER_CACHE_DIR") or None
+
+    # ─── Response Cache ──────────────────────────────────────────────────────
+    # "memory" keeps entries per worker; "sqlite" shares one cache file between
+    # local workers. Either way a write invalidates entries on every worker.
+    app.config["RESPONSE_CACHE_BACKEND"] = os.getenv("RESPONSE_CACHE_BACKEND", "memory")
+    app.config["RESPONSE_CACHE_MAX_ENTRIES"] = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", 1024))
+    app.config["RESPONSE_CACHE_TTL"] = int(os.getenv("RESPONSE_CACHE_TTL", 300))
+    app.config["RESPONSE_CACHE_PATH"] = os.getenv("RESPONSE_CACHE_PATH", "devpad-cache.sqlite3")
+
+    # ─── Live Change Events ──────────────────────────────────────────────────
+    # "local" fans out within one worker; "postgres" relays via LISTEN/NOTIFY
+    app.config["NOTE_EVENTS_BACKEND"] = os.getenv("NOTE_EVENTS_BACKEND", "local")
+    app.config["NOTE_EVENTS_QUEUE_SIZE"] = int(os.getenv("NOTE_EVENTS_QUEUE_SIZE", 100))
+    app.config["NOTE_EVENTS_HEARTBEAT"] = int(os.getenv("NOTE_EVENTS_HEARTBEAT", 15))
+
+    if config:
+        app.config.update(config)
+
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options(app.config)
+
+    # ─── Initialize Extensions ──────────────────────────────────────────────
+    db.init_app(app)
+    bcrypt.init_app(app)
+    jwt.init_app(app)
+    hasher.init_app(app)
+    cache.init_app(app)
+    events.init_app(app)
+    metrics.init_app(app)
+    blobs.init_app(app)
+    renderer.init_app(app)
+
+    @app.route("/api/ping")
+    def ping():
+        return {"message": "pong from DevPad!"}
+
+    app.register_blueprint(auth_bp)
+    app.register_blueprint(notes_bp)
+    app.register_blueprint(tags_bp)
+    app.register_blueprint(transfer_bp)
+    app.register_blueprint(attachments_bp)
+    app.register_blueprint(render_bp)
+    app.register_blueprint(versions_bp)
+    app.register_blueprint(internal_bp)
+    app.register_blueprint(metrics_bp)
+
+    @app.cli.command("init-db")
+    def init_db():
+        """Create the tables in a new database, or migrate an existing one."""
+        applied = init_schema(db.engine)
+        print(f"Applied migrations {', '.join(applied)}" if applied else "Database tables created")
+
+    app.cli.add_command(db_cli)
+
+    _dispose_engines_after_fork(app)
+    return app
+
+def _dispose_engines_after_fork(app):
+    # A preforking server may load the app once and fork workers from it. Any
+    # pooled connection opened in the parent would then be shared by every
+    # child, so each child drops the inherited pool and opens its own.
+    with app.app_context():
+        engines = list(db.engines.values())
+    if hasattr(os, "register_at_fork"):
+        os.register_at_fork(after_in_child=lambda: [e.dispose(close=False) for e in engines])
 
 if __name__ == "__main__":
+    # Run from the repository root as `python -m server.app`; imports are
+    # package-absolute, so `python server/app.py` cannot find `server`
+    app = create_app()
+    with app.app_context():
+        init_schema(db.engine)
     app.run(host="0.0.0.0", port=int(os.getenv("PORT", 5000)), debug=True)
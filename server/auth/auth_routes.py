@@ -1,15 +1,23 @@
 # server/auth/auth_routes.py
 
-from flask import Blueprint, request, jsonify
-from flask_jwt_extended import create_access_token
+from datetime import datetime
+from flask import Blueprint, g, request, jsonify
+from flask_jwt_extended import get_jwt, get_jwt_identity, jwt_required
+from server.auth.hashing import HasherBusy
 
 auth_bp = Blueprint("auth", __name__, url_prefix="/api/auth")
 
+def _busy():
+    response = jsonify({"msg": "Too many sign-ins, try again shortly"})
+    response.headers["Retry-After"] = "1"
+    return response, 503
+
 @auth_bp.route("/register", methods=["POST"])
 def register():
     # Import extensions and models
-    from server.extensions import db, bcrypt
+    from server.extensions import db, hasher
     from server.models.note_model import User
+    from server.auth.tokens import issue_tokens
 
     data = request.get_json() or {}
     email = data.get("email")
@@ -20,26 +28,63 @@ def register():
     if User.query.filter_by(email=email).first():
         return jsonify({"msg": "User already exists"}), 409
 
-    pw_hash = bcrypt.generate_password_hash(password).decode("utf-8")
+    try:
+        pw_hash = hasher.hash(password)
+    except HasherBusy:
+        return _busy()
     user = User(email=email, password_hash=pw_hash)
     db.session.add(user)
-    db.session.commit()
+    db.session.flush()
 
-    token = create_access_token(identity=str(user.id))
-    return jsonify({"access_token": token}), 201
+    tokens = issue_tokens(user.id)
+    db.session.commit()
+    return jsonify(tokens), 201
 
 @auth_bp.route("/login", methods=["POST"])
 def login():
     # Delay these imports to avoid circular dependencies
-    from server.app import bcrypt
+    from server.extensions import db, hasher
     from server.models.note_model import User
+    from server.auth.tokens import issue_tokens
 
     data = request.get_json() or {}
     email = data.get("email")
     password = data.get("password")
     user = User.query.filter_by(email=email).first()
-    if not user or not bcrypt.check_password_hash(user.password_hash, password):
+    if not user or not password:
         return jsonify({"msg": "Bad credentials"}), 401
+    try:
+        if not hasher.check(user.password_hash, password):
+            return jsonify({"msg": "Bad credentials"}), 401
+        # Move old hashes to the configured work factor while we have the password
+        if hasher.needs_rehash(user.password_hash):
+            user.password_hash = hasher.hash(password)
+    except HasherBusy:
+        return _busy()
+
+    tokens = issue_tokens(user.id)
+    db.session.commit()
+    return jsonify(tokens), 200
 
-    token = create_access_token(identity=str(user.id))
-    return jsonify({"access_token": token}), 200
+@auth_bp.route("/refresh", methods=["POST"])
+@jwt_required(refresh=True)
+def refresh():
+    """Swap a refresh token for a new pair without touching the password."""
+    from server.extensions import db
+    from server.auth.tokens import issue_tokens
+
+    # Set by the blocklist check, which has already rejected revoked tokens
+    g.refresh_token.revoked_at = datetime.utcnow()
+    tokens = issue_tokens(int(get_jwt_identity()), family=get_jwt()["fam"])
+    db.session.commit()
+    return jsonify(tokens), 200
+
+@auth_bp.route("/logout", methods=["POST"])
+@jwt_required(refresh=True)
+def logout():
+    from server.extensions import db
+    from server.auth.tokens import revoke_family
+
+    revoke_family(get_jwt()["fam"])
+    db.session.commit()
+    return jsonify({"msg": "Logged out"}), 200
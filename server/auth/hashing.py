@@ -0,0 +1,68 @@
+# server/auth/hashing.py
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+class HasherBusy(Exception):
+    """Raised when too many password hashes are already queued."""
+
+class PasswordHasher:
+    """Runs bcrypt on a small dedicated thread pool.
+
+    bcrypt releases the GIL, so a few hashing threads leave the request
+    threads free to serve note traffic. At most ``workers + queue_limit``
+    hashes may be in flight; beyond that callers get HasherBusy straight
+    away rather than piling up behind a login burst.
+    """
+
+    def __init__(self, app=None):
+        self.workers = 2
+        self.queue_limit = 16
+        self.timeout = 30
+        self.rounds = 12
+        self._executor = None
+        self._slots = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault("BCRYPT_LOG_ROUNDS", 12)
+        app.config.setdefault("PASSWORD_HASH_WORKERS", 2)
+        app.config.setdefault("PASSWORD_HASH_QUEUE_LIMIT", 16)
+        app.config.setdefault("PASSWORD_HASH_TIMEOUT", 30)
+        self.workers = app.config["PASSWORD_HASH_WORKERS"]
+        self.queue_limit = app.config["PASSWORD_HASH_QUEUE_LIMIT"]
+        self.timeout = app.config["PASSWORD_HASH_TIMEOUT"]
+        self.rounds = app.config["BCRYPT_LOG_ROUNDS"]
+        app.extensions["password_hasher"] = self
+
+    def _submit(self, fn, *args):
+        # The pool is created on first use so no threads exist before a fork
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix="bcrypt")
+                self._slots = threading.BoundedSemaphore(self.workers + self.queue_limit)
+        if not self._slots.acquire(blocking=False):
+            raise HasherBusy()
+
+        def run():
+            try:
+                return fn(*args)
+            finally:
+                self._slots.release()
+        return self._executor.submit(run).result(self.timeout)
+
+    def hash(self, password):
+        from server.extensions import bcrypt
+        return self._submit(bcrypt.generate_password_hash, password, self.rounds).decode("utf-8")
+
+    def check(self, pw_hash, password):
+        from server.extensions import bcrypt
+        return self._submit(bcrypt.check_password_hash, pw_hash, password)
+
+    def needs_rehash(self, pw_hash):
+        """True when ``pw_hash`` was made with a different work factor."""
+        # bcrypt hashes look like $2b$12$..., the middle field being the cost
+        parts = pw_hash.split("$")
+        return len(parts) < 3 or parts[2] != f"{self.rounds:02d}"
@@ -0,0 +1,52 @@
+# server/auth/tokens.py
+
+from datetime import datetime
+from uuid import uuid4
+from flask import g
+from flask_jwt_extended import create_access_token, create_refresh_token, decode_token
+from server.extensions import db, jwt
+from server.models.note_model import RefreshToken
+
+def issue_tokens(user_id, family=None):
+    """Create an access/refresh pair and record the refresh token.
+
+    ``family`` links a refresh token to the login it descends from; rotation
+    passes the old family along, a fresh login starts a new one.
+    """
+    family = family or str(uuid4())
+    access = create_access_token(identity=str(user_id))
+    refresh = create_refresh_token(identity=str(user_id), additional_claims={"fam": family})
+    claims = decode_token(refresh)
+    now = datetime.utcnow()
+    # Expired rows are only useful until they expire, so clear them as we go
+    RefreshToken.query.filter(RefreshToken.user_id == user_id,
+                              RefreshToken.expires_at < now).delete(synchronize_session=False)
+    db.session.add(RefreshToken(
+        jti=claims["jti"],
+        family=family,
+        user_id=user_id,
+        expires_at=datetime.utcfromtimestamp(claims["exp"])
+    ))
+    return {"access_token": access, "refresh_token": refresh}
+
+def revoke_family(family):
+    RefreshToken.query.filter(RefreshToken.family == family,
+                              RefreshToken.revoked_at.is_(None)) \
+        .update({"revoked_at": datetime.utcnow()}, synchronize_session=False)
+
+@jwt.token_in_blocklist_loader
+def is_token_revoked(jwt_header, jwt_payload):
+    # Access tokens are short-lived and not looked up, so note requests stay
+    # free of an extra query; only refresh tokens are checked against the table
+    if jwt_payload.get("type") != "refresh":
+        return False
+    token = RefreshToken.query.filter_by(jti=jwt_payload["jti"]).first()
+    if token is None:
+        return True
+    if token.revoked_at is not None:
+        # A rotated token presented again means it leaked: end the whole session
+        revoke_family(token.family)
+        db.session.commit()
+        return True
+    g.refresh_token = token
+    return False
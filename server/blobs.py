@@ -0,0 +1,101 @@
+# server/blobs.py
+"""Content-addressed file storage for attachments and note thumbnails.
+
+Each blob is stored once under ATTACHMENT_DIR at ``ab/cd/<sha256>``, however
+many notes reference it. Uploads stream to a temporary file while being
+hashed and are then renamed into place, so a blob path only ever holds
+complete content and never changes once written.
+"""
+
+import hashlib
+import os
+import re
+import tempfile
+import time
+from flask import current_app
+
+CHUNK_SIZE = 64 * 1024
+_KEY = re.compile(r"^[0-9a-f]{64}$")
+
+class BlobTooLarge(Exception):
+    """Raised when an upload exceeds the size limit; nothing is stored."""
+
+class BlobStore:
+    """Reads its directory from the current app's ATTACHMENT_DIR on each call,
+    so one instance serves every app built by ``create_app``."""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault("ATTACHMENT_DIR", "devpad-attachments")
+        app.config.setdefault("ATTACHMENT_MAX_BYTES", 25 * 1024 * 1024)
+        app.config.setdefault("THUMBNAIL_MAX_BYTES", 256 * 1024)
+        app.extensions["blobs"] = self
+
+    def _root(self):
+        return os.path.abspath(current_app.config["ATTACHMENT_DIR"])
+
+    def path(self, key):
+        if not _KEY.match(key):
+            raise ValueError(f"Invalid blob key: {key!r}")
+        return os.path.join(self._root(), key[:2], key[2:4], key)
+
+    def save(self, stream, max_bytes):
+        """Copy ``stream`` into the store and return its ``(key, size)``."""
+        staging = os.path.join(self._root(), "tmp")
+        os.makedirs(staging, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=staging)
+        digest, size = hashlib.sha256(), 0
+        try:
+            with os.fdopen(fd, "wb") as f:
+                while True:
+                    chunk = stream.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    if size > max_bytes:
+                        raise BlobTooLarge(max_bytes)
+                    digest.update(chunk)
+                    f.write(chunk)
+                f.flush()
+                os.fsync(f.fileno())
+            key = digest.hexdigest()
+            path = self.path(key)
+            try:
+                # Same content already stored; touch it so a purge's grace
+                # period covers the reference about to be committed
+                os.utime(path)
+            except FileNotFoundError:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.replace(tmp, path)
+            else:
+                os.unlink(tmp)
+            return key, size
+        except BaseException:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+            raise
+
+    def exists(self, key):
+        return os.path.exists(self.path(key))
+
+    def delete(self, key):
+        try:
+            os.unlink(self.path(key))
+        except FileNotFoundError:
+            pass
+
+    def keys(self, older_than=0):
+        """Stored keys whose files are at least ``older_than`` seconds old."""
+        cutoff = time.time() - older_than
+        root = self._root()
+        if not os.path.isdir(root):
+            return
+        for dirpath, _, filenames in os.walk(root):
+            if os.path.basename(dirpath) == "tmp":
+                continue
+            for name in filenames:
+                if _KEY.match(name) and os.path.getmtime(os.path.join(dirpath, name)) <= cutoff:
+                    yield name
@@ -0,0 +1,225 @@
+# server/cache.py
+
+import functools
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from flask import Response, current_app, request
+from flask_jwt_extended import get_jwt_identity
+
+# Response headers worth replaying from a cached entry
+CACHED_HEADERS = ("ETag", "X-Next-Cursor")
+
+class CacheBackend:
+    """Interface for response cache stores.
+
+    Entries expire after ``ttl`` seconds. Generation counters are never
+    evicted, since losing one could resurrect entries from an older generation.
+    """
+
+    def get(self, key):
+        raise NotImplementedError
+
+    def set(self, key, value, ttl):
+        raise NotImplementedError
+
+    def generation(self, user_id):
+        raise NotImplementedError
+
+    def bump(self, user_id):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+class MemoryBackend(CacheBackend):
+    """Bounded per-process LRU. Each worker keeps its own copy."""
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._generations = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def generation(self, user_id):
+        with self._lock:
+            return self._generations.get(user_id, 0)
+
+    def bump(self, user_id):
+        with self._lock:
+            self._generations[user_id] = self._generations.get(user_id, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._generations.clear()
+
+class SQLiteBackend(CacheBackend):
+    """Cache in a local SQLite file, shared by every worker on the host.
+
+    A stand-in for a networked store: generations bumped by one worker are
+    seen by all of them, so no worker serves a listing another has invalidated.
+    """
+
+    def __init__(self, path, max_entries=10000):
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""CREATE TABLE IF NOT EXISTS cache_entries (
+                key TEXT PRIMARY KEY, value BLOB NOT NULL,
+                expires_at REAL NOT NULL, accessed_at REAL NOT NULL)""")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_accessed ON cache_entries(accessed_at)")
+            conn.execute("""CREATE TABLE IF NOT EXISTS cache_generations (
+                user_id TEXT PRIMARY KEY, value INTEGER NOT NULL)""")
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        conn = self._connect()
+        now = time.time()
+        row = conn.execute(
+            "SELECT value FROM cache_entries WHERE key = ? AND expires_at >= ?", (key, now)
+        ).fetchone()
+        if row is None:
+            return None
+        conn.execute("UPDATE cache_entries SET accessed_at = ? WHERE key = ?", (now, key))
+        return pickle.loads(row[0])
+
+    def set(self, key, value, ttl):
+        conn = self._connect()
+        now = time.time()
+        conn.execute(
+            "INSERT OR REPLACE INTO cache_entries (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+            (key, pickle.dumps(value), now + ttl, now)
+        )
+        conn.execute("""DELETE FROM cache_entries WHERE key IN (
+            SELECT key FROM cache_entries ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)""",
+            (self.max_entries,))
+
+    def generation(self, user_id):
+        row = self._connect().execute(
+            "SELECT value FROM cache_generations WHERE user_id = ?", (str(user_id),)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def bump(self, user_id):
+        self._connect().execute("""INSERT INTO cache_generations (user_id, value) VALUES (?, 1)
+            ON CONFLICT(user_id) DO UPDATE SET value = value + 1""", (str(user_id),))
+
+    def clear(self):
+        conn = self._connect()
+        conn.execute("DELETE FROM cache_entries")
+        conn.execute("DELETE FROM cache_generations")
+
+class ResponseCache:
+    """Caches encoded JSON responses per user, invalidated by generation bumps.
+
+    A function registered with ``generation_loader`` supplies each user's
+    generation from shared state (the database), so a write on one worker
+    invalidates entries on every worker whatever the backend. Without one,
+    generations live in the backend and are bumped by ``invalidates``.
+
+    The decorators are applied at import time, so this object is shared by
+    every app; each app's backend is kept in its ``extensions``.
+    """
+
+    def __init__(self, app=None):
+        self._generation_loader = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault("RESPONSE_CACHE_BACKEND", "memory")
+        app.config.setdefault("RESPONSE_CACHE_MAX_ENTRIES", 1024)
+        app.config.setdefault("RESPONSE_CACHE_TTL", 300)
+        app.config.setdefault("RESPONSE_CACHE_PATH", "devpad-cache.sqlite3")
+        kind = app.config["RESPONSE_CACHE_BACKEND"]
+        if isinstance(kind, CacheBackend):
+            backend = kind
+        elif kind == "memory":
+            backend = MemoryBackend(app.config["RESPONSE_CACHE_MAX_ENTRIES"])
+        elif kind == "sqlite":
+            backend = SQLiteBackend(app.config["RESPONSE_CACHE_PATH"],
+                                    app.config["RESPONSE_CACHE_MAX_ENTRIES"])
+        else:
+            raise ValueError(f"Unknown RESPONSE_CACHE_BACKEND: {kind!r}")
+        app.extensions["response_cache"] = backend
+
+    @property
+    def backend(self):
+        return current_app.extensions["response_cache"]
+
+    def generation_loader(self, fn):
+        """Register ``fn(user_id)`` as the source of users' cache generations."""
+        self._generation_loader = fn
+        return fn
+
+    def generation(self, user_id):
+        if self._generation_loader is not None:
+            return self._generation_loader(user_id)
+        return self.backend.generation(user_id)
+
+    def bump(self, user_id):
+        self.backend.bump(user_id)
+
+    def clear(self):
+        self.backend.clear()
+
+    def cached(self, view):
+        """Serve repeat GETs of ``view`` from the cache for the current user."""
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            user_id = get_jwt_identity()
+            generation = self.generation(user_id)
+            key = f"{user_id}:{generation}:{request.full_path}"
+            hit = self.backend.get(key)
+            if hit is not None:
+                body, headers = hit
+                response = Response(body, 200, headers=headers, mimetype="application/json")
+                return response.make_conditional(request)
+
+            response = current_app.make_response(view(*args, **kwargs))
+            if response.status_code == 200:
+                headers = {h: response.headers[h] for h in CACHED_HEADERS if h in response.headers}
+                self.backend.set(key, (response.get_data(), headers),
+                                 current_app.config["RESPONSE_CACHE_TTL"])
+            return response
+        return wrapper
+
+    def invalidates(self, view):
+        """Bump the current user's generation once ``view`` has run."""
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            try:
+                return view(*args, **kwargs)
+            finally:
+                self.bump(get_jwt_identity())
+        return wrapper
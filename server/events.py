@@ -0,0 +1,225 @@
+# server/events.py
+
+import json
+import logging
+import queue
+import threading
+import time
+from sqlalchemy.engine import make_url
+
+log = logging.getLogger("devpad.events")
+
+# Note columns worth reporting in a change event
+EVENT_FIELDS = ("title", "content_md", "language", "favorite", "tags")
+
+def snapshot(note):
+    """Current values of EVENT_FIELDS, taken before a write starts.
+
+    Attribute history is reset by every autoflush, so comparing against a
+    snapshot is the reliable way to tell what a request changed. The body is
+    represented by its content_hash, so taking one never loads the text.
+    """
+    values = {f: getattr(note, f) for f in EVENT_FIELDS if f not in ("content_md", "tags")}
+    values["content_md"] = note.content_hash
+    values["tags"] = sorted(t.name for t in note.tags)
+    return values
+
+def changed_fields(before, note):
+    after = snapshot(note)
+    return [f for f in EVENT_FIELDS if before[f] != after[f]]
+
+def note_event(op, note, fields=()):
+    return {
+        "op": op,
+        "id": note.id,
+        "revision": note.revision,
+        "change_seq": note.change_seq,
+        "fields": list(fields)
+    }
+
+class Subscription:
+    """One listener's bounded queue of events for a single user."""
+
+    def __init__(self, hub, user_id, maxsize):
+        self.hub = hub
+        self.user_id = user_id
+        self._queue = queue.Queue(maxsize)
+
+    def put(self, event):
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            # A slow reader loses the backlog and is told to resync via /changes
+            with self._queue.mutex:
+                self._queue.queue.clear()
+            self._queue.put_nowait({"op": "resync"})
+
+    def get(self, timeout):
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self.hub._unsubscribe(self)
+
+class LocalFanout:
+    """Delivers events only to subscribers connected to this process."""
+
+    def start(self, deliver):
+        self._deliver = deliver
+
+    def publish(self, user_id, event):
+        self._deliver(user_id, event)
+
+class PostgresFanout:
+    """Relays events between workers through Postgres LISTEN/NOTIFY.
+
+    Each process keeps one listening connection; a publish in any worker is
+    delivered to subscribers in all of them, including the sender. When that
+    connection drops it is reopened, and since notifications sent meanwhile
+    are lost, every local subscriber is told to resync.
+    """
+
+    # Seconds between reconnect attempts, doubling up to the maximum
+    reconnect_delay = 1
+    max_reconnect_delay = 30
+
+    def __init__(self, dsn, channel="devpad_note_events"):
+        self.dsn = dsn
+        self.channel = channel
+        self._local = threading.local()
+
+    def _connect(self):
+        import psycopg2
+        conn = psycopg2.connect(self.dsn)
+        conn.autocommit = True
+        return conn
+
+    def _listen(self):
+        listener = self._connect()
+        listener.cursor().execute(f'LISTEN "{self.channel}"')
+        return listener
+
+    def _reconnect(self, deliver):
+        delay = self.reconnect_delay
+        while True:
+            time.sleep(delay)
+            try:
+                listener = self._listen()
+            except Exception:
+                log.warning("Reconnecting to %s failed, retrying in %ss", self.channel, delay)
+                delay = min(delay * 2, self.max_reconnect_delay)
+                continue
+            # A user id of None reaches every subscriber
+            deliver(None, {"op": "resync"})
+            return listener
+
+    def start(self, deliver):
+        listener = self._listen()
+
+        def run():
+            import select
+            nonlocal listener
+            while True:
+                try:
+                    select.select([listener], [], [], 60)
+                    listener.poll()
+                    while listener.notifies:
+                        message = json.loads(listener.notifies.pop(0).payload)
+                        deliver(message["user_id"], message["event"])
+                except Exception:
+                    log.warning("Lost the %s listener connection", self.channel, exc_info=True)
+                    try:
+                        listener.close()
+                    except Exception:
+                        pass
+                    listener = self._reconnect(deliver)
+
+        threading.Thread(target=run, name="note-events-listener", daemon=True).start()
+
+    def publish(self, user_id, event):
+        payload = json.dumps({"user_id": user_id, "event": event})
+        # A connection dropped since the last publish is replaced once
+        for attempt in (1, 2):
+            conn = getattr(self._local, "conn", None)
+            try:
+                if conn is None or conn.closed:
+                    conn = self._local.conn = self._connect()
+                conn.cursor().execute("SELECT pg_notify(%s, %s)", (self.channel, payload))
+                return
+            except Exception:
+                self._local.conn = None
+                if attempt == 2:
+                    raise
+
+class EventHub:
+    """In-process publish/subscribe of note change events, keyed by user."""
+
+    def __init__(self, app=None):
+        self.backend = None
+        self.queue_size = 100
+        self._subscribers = {}
+        self._lock = threading.Lock()
+        self._started = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault("NOTE_EVENTS_BACKEND", "local")
+        app.config.setdefault("NOTE_EVENTS_QUEUE_SIZE", 100)
+        app.config.setdefault("NOTE_EVENTS_HEARTBEAT", 15)
+        kind = app.config["NOTE_EVENTS_BACKEND"]
+        if kind == "local":
+            self.backend = LocalFanout()
+        elif kind == "postgres":
+            url = make_url(app.config["SQLALCHEMY_DATABASE_URI"]).set(drivername="postgresql")
+            self.backend = PostgresFanout(url.render_as_string(hide_password=False))
+        elif hasattr(kind, "publish") and hasattr(kind, "start"):
+            self.backend = kind
+        else:
+            raise ValueError(f"Unknown NOTE_EVENTS_BACKEND: {kind!r}")
+        self.queue_size = app.config["NOTE_EVENTS_QUEUE_SIZE"]
+        self._started = False
+        app.extensions["note_events"] = self
+
+    def _ensure_started(self):
+        # Started on first use rather than in init_app, so no listener
+        # thread or connection exists before a preforking server forks
+        with self._lock:
+            if not self._started:
+                self.backend.start(self._deliver)
+                self._started = True
+
+    def _deliver(self, user_id, event):
+        with self._lock:
+            if user_id is None:
+                subscribers = [s for group in self._subscribers.values() for s in group]
+            else:
+                subscribers = list(self._subscribers.get(str(user_id), ()))
+        for subscription in subscribers:
+            subscription.put(event)
+
+    def _unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.user_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.user_id]
+
+    def subscribe(self, user_id):
+        self._ensure_started()
+        subscription = Subscription(self, str(user_id), self.queue_size)
+        with self._lock:
+            self._subscribers.setdefault(str(user_id), set()).add(subscription)
+        return subscription
+
+    def publish(self, user_id, event):
+        # Called once the write has committed, so a failure is logged rather
+        # than turning a saved change into an error response
+        try:
+            self._ensure_started()
+            self.backend.publish(str(user_id), event)
+        except Exception:
+            log.warning("Could not publish a note event for user %s", user_id, exc_info=True)
@@ -1,8 +1,42 @@
+from flask import current_app
 from flask_sqlalchemy import SQLAlchemy
 from flask_bcrypt import Bcrypt
 from flask_jwt_extended import JWTManager
+from server.auth.hashing import PasswordHasher
+from server.blobs import BlobStore
+from server.cache import ResponseCache
+from server.events import EventHub
+from server.metrics import RequestMetrics
+from server.rendering import NoteRenderer
+
+class PerApp:
+    """Module-level handle for an extension that holds per-app state.
+
+    ``init_app`` builds a separate instance for each app and keeps it in
+    ``app.extensions[key]``; attribute access goes to the current app's
+    instance, so a later ``create_app`` never reconfigures an earlier app.
+    """
+
+    def __init__(self, factory, key):
+        object.__setattr__(self, "_factory", factory)
+        object.__setattr__(self, "_key", key)
+
+    def init_app(self, app):
+        app.extensions[self._key] = self._factory(app)
+
+    def __getattr__(self, name):
+        return getattr(current_app.extensions[self._key], name)
+
+    def __setattr__(self, name, value):
+        setattr(current_app.extensions[self._key], name, value)
 
 # Initialize extensions
 db = SQLAlchemy()
 bcrypt = Bcrypt()
 jwt = JWTManager()
+hasher = PerApp(PasswordHasher, "password_hasher")
+cache = ResponseCache()
+events = PerApp(EventHub, "note_events")
+metrics = RequestMetrics()
+blobs = BlobStore()
+renderer = PerApp(NoteRenderer, "note_renderer")
@@ -0,0 +1,177 @@
+# server/metrics.py
+
+import logging
+import threading
+import time
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+slow_log = logging.getLogger("devpad.slow_requests")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (128, 1024, 8192, 65536, 524288, 4194304, 33554432)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 10, 25, 50, 100)
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(names, values, extra=()):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in [*zip(names, values), *extra]]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Counter:
+    def __init__(self, name, help, labels):
+        self.name, self.help, self.labels = name, help, labels
+        self._values = {}
+
+    def inc(self, key, amount=1):
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        for key, value in sorted(self._values.items()):
+            yield f"{self.name}{_labels(self.labels, key)} {_number(value)}"
+
+class Histogram:
+    def __init__(self, name, help, labels, buckets):
+        self.name, self.help, self.labels, self.buckets = name, help, labels, buckets
+        self._values = {}
+
+    def observe(self, key, value):
+        series = self._values.get(key)
+        if series is None:
+            # [per-bucket counts, total count, sum]
+            series = self._values[key] = [[0] * len(self.buckets), 0, 0]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[0][i] += 1
+        series[1] += 1
+        series[2] += value
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        for key, (buckets, count, total) in sorted(self._values.items()):
+            for bound, n in zip(self.buckets, buckets):
+                yield f"{self.name}_bucket{_labels(self.labels, key, [('le', _number(bound))])} {n}"
+            yield f"{self.name}_bucket{_labels(self.labels, key, [('le', '+Inf')])} {count}"
+            yield f"{self.name}_sum{_labels(self.labels, key)} {_number(total)}"
+            yield f"{self.name}_count{_labels(self.labels, key)} {count}"
+
+# SQL timing hooks. Registered once on the Engine class so they cover every
+# engine; outside a request they do nothing. A connection runs one statement
+# at a time, so one start time per connection is enough.
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info["metrics_started"] = time.perf_counter()
+
+def _handle_error(context):
+    # A failed statement never reaches after_cursor_execute; forget its start
+    if context.connection is not None:
+        context.connection.info.pop("metrics_started", None)
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.pop("metrics_started", None)
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    if has_request_context() and "metrics_sql" in g:
+        sql = g.metrics_sql
+        sql["count"] += 1
+        sql["seconds"] += elapsed
+        if sql["statements"] is not None:
+            sql["statements"].append((statement, elapsed))
+
+class RequestMetrics:
+    """Per-endpoint request and SQL metrics, rendered as Prometheus text.
+
+    Figures are kept per process, so with several workers each one is
+    scraped separately (or one worker's view is a sample of the whole).
+    """
+
+    def __init__(self, app=None):
+        self._lock = threading.Lock()
+        self.reset()
+        if app is not None:
+            self.init_app(app)
+
+    def reset(self):
+        with self._lock:
+            self.requests = Counter("devpad_http_requests_total",
+                                    "Requests handled, by endpoint, method and status.",
+                                    ("endpoint", "method", "status"))
+            self.latency = Histogram("devpad_http_request_duration_seconds",
+                                     "Time spent handling a request.",
+                                     ("endpoint", "method"), LATENCY_BUCKETS)
+            self.request_size = Histogram("devpad_http_request_size_bytes",
+                                          "Request body size.",
+                                          ("endpoint", "method"), SIZE_BUCKETS)
+            self.response_size = Histogram("devpad_http_response_size_bytes",
+                                           "Response body size, for non-streamed responses.",
+                                           ("endpoint", "method"), SIZE_BUCKETS)
+            self.sql_statements = Histogram("devpad_sql_statements_per_request",
+                                            "SQL statements executed while handling a request.",
+                                            ("endpoint", "method"), STATEMENT_BUCKETS)
+            self.sql_seconds = Histogram("devpad_sql_duration_seconds_per_request",
+                                         "Time spent in SQL while handling a request.",
+                                         ("endpoint", "method"), LATENCY_BUCKETS)
+
+    def init_app(self, app):
+        app.config.setdefault("METRICS_SLOW_REQUEST_MS", 0)
+        if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+            event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+            event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+            event.listen(Engine, "handle_error", _handle_error)
+        app.before_request(self._start)
+        app.after_request(self._finish)
+        app.extensions["request_metrics"] = self
+
+    def _start(self):
+        g.metrics_started = time.perf_counter()
+        # Statement text is only kept when the slow-request log may need it
+        keep = self._slow_threshold() is not None
+        g.metrics_sql = {"count": 0, "seconds": 0.0, "statements": [] if keep else None}
+
+    def _slow_threshold(self):
+        threshold = current_app.config.get("METRICS_SLOW_REQUEST_MS")
+        return threshold / 1000 if threshold else None
+
+    def _finish(self, response):
+        started = g.pop("metrics_started", None)
+        sql = g.pop("metrics_sql", None)
+        if started is None or sql is None:
+            return response
+        elapsed = time.perf_counter() - started
+        key = (request.endpoint or "unmatched", request.method)
+        with self._lock:
+            self.requests.inc(key + (str(response.status_code),))
+            self.latency.observe(key, elapsed)
+            self.request_size.observe(key, request.content_length or 0)
+            if not response.is_streamed:
+                self.response_size.observe(key, response.content_length or 0)
+            self.sql_statements.observe(key, sql["count"])
+            self.sql_seconds.observe(key, sql["seconds"])
+
+        threshold = self._slow_threshold()
+        if threshold is not None and elapsed >= threshold:
+            statements = "".join(f"\n  {seconds * 1000:8.2f} ms  {statement[:500]}"
+                                 for statement, seconds in sql["statements"] or ())
+            # The path alone: query strings can carry credentials such as ?jwt=
+            slow_log.warning("Slow request %s %s -> %s in %.1f ms, %d statements (%.1f ms)%s",
+                             request.method, request.path, response.status_code,
+                             elapsed * 1000, sql["count"], sql["seconds"] * 1000, statements)
+        return response
+
+    def render(self, extra=()):
+        """The Prometheus text exposition of every metric, plus ``extra`` lines."""
+        with self._lock:
+            lines = []
+            for metric in (self.requests, self.latency, self.request_size,
+                           self.response_size, self.sql_statements, self.sql_seconds):
+                lines.extend(metric.render())
+        lines.extend(extra)
+        return "\n".join(lines) + "\n"
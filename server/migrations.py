@@ -0,0 +1,302 @@
+# server/migrations.py
+"""Versioned schema migrations.
+
+The models are the source of truth for the schema. A new database built with
+``flask init-db`` already matches them and is stamped as fully migrated; an
+existing one is brought up to date with ``flask db upgrade``. Applied
+versions are recorded in ``schema_migrations``.
+
+Migrations must be safe to re-run against a database that already has
+their change (e.g. one built from database/schema.sql), so they check
+before they create or drop anything.
+"""
+
+import click
+import hashlib
+import time
+import zlib
+from datetime import datetime
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import inspect, text
+from server.extensions import db
+from server.models.note_model import (PREVIEW_LENGTH, Attachment, NoteBody, NoteThumbnail, NoteVersion,
+                                     summarize_content)
+
+MIGRATIONS = []
+
+def migration(version, description):
+    def register(fn):
+        MIGRATIONS.append((version, description, fn))
+        return fn
+    return register
+
+def _index(table, name):
+    return next(i for i in db.metadata.tables[table].indexes if i.name == name)
+
+@migration("0001", "Create any missing tables")
+def _create_missing_tables(conn):
+    db.metadata.create_all(conn)
+
+@migration("0002", "Index listing order and tag lookups; drop redundant indexes")
+def _hot_path_indexes(conn):
+    _index("notes", "idx_notes_user_updated").create(conn, checkfirst=True)
+    _index("note_tags", "idx_note_tags_tag").create(conn, checkfirst=True)
+    _index("notes", "idx_notes_language").create(conn, checkfirst=True)
+    # Covered by idx_notes_user_updated and the UNIQUE constraint on tags.name
+    conn.execute(text("DROP INDEX IF EXISTS idx_notes_user"))
+    conn.execute(text("DROP INDEX IF EXISTS idx_tags_name"))
+
+# Foreign keys that must cascade, as (table, column, referenced table)
+CASCADING_KEYS = [
+    ("notes", "user_id", "users"),
+    ("note_tags", "note_id", "notes"),
+    ("note_tags", "tag_id", "tags"),
+    ("note_versions", "note_id", "notes"),
+]
+
+@migration("0003", "Cascade deletes from users to notes and from notes to tags and versions")
+def _cascade_deletes(conn):
+    if conn.dialect.name != "postgresql":
+        # SQLite cannot alter constraints in place; tables it creates from
+        # the models already cascade
+        return
+    inspector = inspect(conn)
+    for table, column, target in CASCADING_KEYS:
+        for fk in inspector.get_foreign_keys(table):
+            if fk["constrained_columns"] != [column]:
+                continue
+            if (fk.get("options") or {}).get("ondelete", "").upper() == "CASCADE":
+                continue
+            conn.execute(text(
+                f'ALTER TABLE {table} DROP CONSTRAINT "{fk["name"]}", '
+                f'ADD CONSTRAINT "{fk["name"]}" FOREIGN KEY ({column}) '
+                f'REFERENCES {target}(id) ON DELETE CASCADE'
+            ))
+
+SUMMARY_COLUMNS = [
+    ("preview", f"VARCHAR({PREVIEW_LENGTH}) DEFAULT '' NOT NULL"),
+    ("word_count", "INTEGER DEFAULT 0 NOT NULL"),
+    ("byte_size", "INTEGER DEFAULT 0 NOT NULL"),
+    ("content_hash", "VARCHAR(64)"),
+]
+BACKFILL_BATCH_SIZE = 500
+
+@migration("0004", "Add precomputed note summaries and backfill them")
+def _note_summaries(conn):
+    existing = {c["name"] for c in inspect(conn).get_columns("notes")}
+    for name, ddl in SUMMARY_COLUMNS:
+        if name not in existing:
+            conn.execute(text(f"ALTER TABLE notes ADD COLUMN {name} {ddl}"))
+    # Walk by id so each batch reads a bounded slice of the bodies
+    last_id = 0
+    while True:
+        rows = conn.execute(text(
+            "SELECT id, content_md FROM notes WHERE id > :last_id AND content_hash IS NULL "
+            "ORDER BY id LIMIT :limit"), {"last_id": last_id, "limit": BACKFILL_BATCH_SIZE}).all()
+        if not rows:
+            break
+        params = []
+        for note_id, body in rows:
+            preview, words, size, digest = summarize_content(body)
+            params.append({"id": note_id, "preview": preview, "word_count": words,
+                           "byte_size": size, "content_hash": digest})
+        conn.execute(text("UPDATE notes SET preview = :preview, word_count = :word_count, "
+                          "byte_size = :byte_size, content_hash = :content_hash WHERE id = :id"), params)
+        last_id = rows[-1][0]
+
+@migration("0005", "Add out-of-row storage for large note bodies")
+def _note_bodies(conn):
+    NoteBody.__table__.create(conn, checkfirst=True)
+    if "body_hash" not in {c["name"] for c in inspect(conn).get_columns("notes")}:
+        conn.execute(text("ALTER TABLE notes ADD COLUMN body_hash VARCHAR(64) REFERENCES note_bodies(hash)"))
+    _index("notes", "ix_notes_body_hash").create(conn, checkfirst=True)
+    # Existing bodies are moved separately by ``flask db move-bodies``, which
+    # works in small batches and can run while the app is serving
+
+@migration("0006", "Add note attachments")
+def _attachments(conn):
+    Attachment.__table__.create(conn, checkfirst=True)
+
+@migration("0007", "Add note card thumbnails")
+def _thumbnails(conn):
+    NoteThumbnail.__table__.create(conn, checkfirst=True)
+
+# Columns added to tables that predate migrations, as (table, column, DDL)
+SYNC_COLUMNS = [
+    ("notes", "revision", "INTEGER DEFAULT 1 NOT NULL"),
+    ("notes", "change_seq", "INTEGER DEFAULT 0 NOT NULL"),
+    ("users", "change_seq", "INTEGER DEFAULT 0 NOT NULL"),
+]
+
+@migration("0008", "Add note revisions and change sequences to databases that predate them")
+def _revisions_and_change_seqs(conn):
+    inspector = inspect(conn)
+    added = set()
+    for table, column, ddl in SYNC_COLUMNS:
+        if column not in {c["name"] for c in inspector.get_columns(table)}:
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+            added.add((table, column))
+    if ("notes", "change_seq") in added:
+        # Number each user's existing notes in id order, then continue from there
+        conn.execute(text(
+            "UPDATE notes SET change_seq = (SELECT COUNT(*) FROM notes AS earlier "
+            "WHERE earlier.user_id = notes.user_id AND earlier.id <= notes.id)"))
+    if added:
+        conn.execute(text(
+            "UPDATE users SET change_seq = (SELECT COALESCE(MAX(change_seq), 0) FROM notes "
+            "WHERE notes.user_id = users.id)"))
+    _index("notes", "idx_notes_user_seq").create(conn, checkfirst=True)
+    _upgrade_legacy_versions(conn)
+
+def _upgrade_legacy_versions(conn):
+    # database/schema.sql used to declare note_versions with a plain content_md
+    # column; rebuild it in the keyframe/diff layout, each old row a keyframe
+    columns = {c["name"] for c in inspect(conn).get_columns("note_versions")}
+    if "payload" in columns:
+        return
+    rows = conn.execute(text(
+        "SELECT note_id, version_no, title, content_md, language, created_at FROM note_versions "
+        "ORDER BY note_id, version_no, id").columns(created_at=NoteVersion.created_at.type)).all()
+    conn.execute(text("DROP TABLE note_versions"))
+    NoteVersion.__table__.create(conn)
+    latest = {(r.note_id, r.version_no): r for r in rows}
+    if latest:
+        conn.execute(NoteVersion.__table__.insert(), [
+            {"note_id": r.note_id, "version_no": r.version_no, "title": r.title, "language": r.language,
+             "is_keyframe": True, "payload": zlib.compress(r.content_md.encode("utf-8")),
+             "created_at": r.created_at} for r in latest.values()])
+
+MOVE_BATCH_SIZE = 50
+
+def move_large_bodies(limit, batch_size=MOVE_BATCH_SIZE, pause=0):
+    """Move inline bodies over ``limit`` bytes into note_bodies.
+
+    Each batch is its own short transaction, so this can run alongside the
+    app and be interrupted and resumed at any point. Notes keep their
+    revision and updated_at; only where the text is stored changes.
+    """
+    moved, last_id = 0, 0
+    while True:
+        rows = db.session.execute(text(
+            "SELECT id, content_md FROM notes WHERE id > :last_id AND body_hash IS NULL "
+            "AND byte_size > :limit ORDER BY id LIMIT :batch"),
+            {"last_id": last_id, "limit": limit, "batch": batch_size}).all()
+        if not rows:
+            return moved
+        for note_id, body in rows:
+            raw = body.encode("utf-8")
+            digest = hashlib.sha256(raw).hexdigest()
+            NoteBody.store(raw, digest)
+            db.session.execute(text("UPDATE notes SET content_md = :head, body_hash = :hash WHERE id = :id"),
+                               {"head": raw[:limit].decode("utf-8", "ignore"), "hash": digest, "id": note_id})
+        db.session.commit()
+        moved += len(rows)
+        last_id = rows[-1][0]
+        if pause:
+            time.sleep(pause)
+
+def purge_orphan_bodies():
+    """Delete stored bodies no note refers to any more; returns how many."""
+    result = db.session.execute(text(
+        "DELETE FROM note_bodies WHERE NOT EXISTS "
+        "(SELECT 1 FROM notes WHERE notes.body_hash = note_bodies.hash)"))
+    db.session.commit()
+    return result.rowcount
+
+def _ensure_table(conn):
+    conn.execute(text("""CREATE TABLE IF NOT EXISTS schema_migrations (
+        version     VARCHAR(32) PRIMARY KEY,
+        description TEXT NOT NULL,
+        applied_at  TIMESTAMP NOT NULL)"""))
+
+def applied_versions(conn):
+    _ensure_table(conn)
+    return {row[0] for row in conn.execute(text("SELECT version FROM schema_migrations"))}
+
+def _record(conn, version, description):
+    conn.execute(text("INSERT INTO schema_migrations (version, description, applied_at) "
+                      "VALUES (:version, :description, :applied_at)"),
+                 {"version": version, "description": description, "applied_at": datetime.utcnow()})
+
+def upgrade(engine):
+    """Apply pending migrations in order, each in its own transaction."""
+    applied = []
+    for version, description, fn in MIGRATIONS:
+        with engine.begin() as conn:
+            if version in applied_versions(conn):
+                continue
+            fn(conn)
+            _record(conn, version, description)
+        applied.append(version)
+    return applied
+
+def stamp(engine):
+    """Mark every migration as applied, for a database built from the models."""
+    with engine.begin() as conn:
+        done = applied_versions(conn)
+        for version, description, _ in MIGRATIONS:
+            if version not in done:
+                _record(conn, version, description)
+
+def init_schema(engine):
+    """Build the schema in a new database, or migrate one that already exists.
+
+    Only a schema created here from the models is stamped as migrated; an
+    existing database may predate any migration, so it is upgraded instead.
+    Returns the versions applied.
+    """
+    if not inspect(engine).has_table("notes"):
+        db.metadata.create_all(engine)
+        stamp(engine)
+        return []
+    return upgrade(engine)
+
+def pending(engine):
+    with engine.begin() as conn:
+        done = applied_versions(conn)
+    return [(v, d) for v, d, _ in MIGRATIONS if v not in done]
+
+db_cli = AppGroup("db", help="Schema migrations and index checks.")
+
+@db_cli.command("upgrade")
+def upgrade_command():
+    """Apply pending migrations."""
+    applied = upgrade(db.engine)
+    click.echo(f"Applied {', '.join(applied)}" if applied else "Already up to date")
+
+@db_cli.command("status")
+def status_command():
+    """List migrations not yet applied."""
+    waiting = pending(db.engine)
+    for version, description in waiting:
+        click.echo(f"{version}  {description}")
+    if not waiting:
+        click.echo("Up to date")
+
+@db_cli.command("check-plans")
+@click.option("--verbose", is_flag=True, help="Print every plan, not just failures.")
+def check_plans_command(verbose):
+    """Verify the hot queries use their indexes; exits 1 if any do not."""
+    from server.query_plans import check_query_plans
+    results = check_query_plans(db.engine)
+    for result in results:
+        click.echo(f"{'ok  ' if result['ok'] else 'FAIL'}  {result['query']}  "
+                   f"(wants {result['index']}, uses {', '.join(result['indexes_used']) or 'none'})")
+        if verbose or not result["ok"]:
+            click.echo(result["plan"])
+    if not all(r["ok"] for r in results):
+        raise SystemExit(1)
+
+@db_cli.command("move-bodies")
+@click.option("--batch-size", type=int, default=MOVE_BATCH_SIZE, help="Notes per transaction.")
+@click.option("--pause", type=float, default=0, help="Seconds to sleep between batches.")
+def move_bodies_command(batch_size, pause):
+    """Move large note bodies written before out-of-row storage."""
+    limit = current_app.config["NOTE_BODY_INLINE_BYTES"]
+    click.echo(f"Moved {move_large_bodies(limit, batch_size, pause)} note bodies")
+
+@db_cli.command("purge-bodies")
+def purge_bodies_command():
+    """Delete stored note bodies that no note uses."""
+    click.echo(f"Removed {purge_orphan_bodies()} unused note bodies")
@@ -1,22 +1,64 @@
 # server/models/note_model.py
 
-from server.extensions import db
+import hashlib
+import sqlite3
+import zlib
+from flask import current_app, has_app_context
+from server.extensions import db, cache
 from datetime import datetime
+from sqlalchemy import event, select, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy.orm import Session, selectinload, undefer
+
+PREVIEW_LENGTH = 160
+# Bodies larger than this (UTF-8 bytes) are stored compressed in note_bodies
+INLINE_BODY_BYTES = 64 * 1024
+
+def make_preview(text):
+    # Collapse whitespace so cards get a single readable line of text
+    return " ".join((text or "").split())[:PREVIEW_LENGTH]
+
+def summarize_content(text):
+    """The (preview, word_count, byte_size, content_hash) stored alongside a body."""
+    text = text or ""
+    raw = text.encode("utf-8")
+    return make_preview(text), len(text.split()), len(raw), hashlib.sha256(raw).hexdigest()
 
 # 1) pivot table for many-to-many
 note_tags = db.Table(
     'note_tags',
-    db.Column('note_id', db.Integer, db.ForeignKey('notes.id'), primary_key=True),
-    db.Column('tag_id',  db.Integer, db.ForeignKey('tags.id'),  primary_key=True)
+    db.Column('note_id', db.Integer, db.ForeignKey('notes.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('tag_id',  db.Integer, db.ForeignKey('tags.id', ondelete='CASCADE'),  primary_key=True),
+    # The primary key serves note -> tags; this serves tag -> notes
+    db.Index('idx_note_tags_tag', 'tag_id', 'note_id')
 )
 
 # 2) NOTE comes first
 class Note(db.Model):
     __tablename__ = 'notes'
+    __table_args__ = (
+        # Listing order, including keyset pages; also serves plain user_id lookups
+        db.Index('idx_notes_user_updated', 'user_id', db.text('updated_at DESC'), db.text('id DESC')),
+        db.Index('idx_notes_user_seq', 'user_id', 'change_seq'),
+        db.Index('idx_notes_language', 'language'),
+    )
     id             = db.Column(db.Integer, primary_key=True)
-    user_id        = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    user_id        = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
     title          = db.Column(db.Text,    nullable=False)
-    content_md     = db.Column(db.Text,    nullable=False)
+    # The body is read through the content_md property below. Small bodies
+    # live in this column; larger ones are compressed into note_bodies and
+    # the column keeps only their first INLINE_BODY_BYTES for full-text
+    # search. It is deferred: query with Note.with_content() to read bodies.
+    # Full-text search indexes that column, so it only matches within the first
+    # INLINE_BODY_BYTES of a large body.
+    _content_md    = db.deferred(db.Column('content_md', db.Text, nullable=False))
+    body_hash      = db.Column(db.String(64), db.ForeignKey('note_bodies.hash'), index=True)
+    preview        = db.Column(db.String(PREVIEW_LENGTH), server_default='', nullable=False)
+    word_count     = db.Column(db.Integer, server_default='0', nullable=False)
+    byte_size      = db.Column(db.Integer, server_default='0', nullable=False)
+    content_hash   = db.Column(db.String(64))  # SHA-256 of the UTF-8 body
     language       = db.Column(db.String(30), nullable=False)
     favorite       = db.Column(db.Boolean, default=False, nullable=False)
     created_at     = db.Column(db.DateTime(timezone=True), default=datetime.utcnow, nullable=False)
@@ -24,19 +66,212 @@ class Note(db.Model):
                                 default=datetime.utcnow,
                                 onupdate=datetime.utcnow)
     last_viewed_at = db.Column(db.DateTime(timezone=True))
+    revision       = db.Column(db.Integer, default=1, nullable=False)
+    change_seq     = db.Column(db.Integer, default=0, nullable=False)
     tags           = db.relationship(
                         'Tag',
                         secondary=note_tags,
+                        lazy='selectin',
                         backref=db.backref('notes', lazy='dynamic')
                      )
+    versions       = db.relationship(
+                        'NoteVersion',
+                        backref='note',
+                        lazy='dynamic',
+                        cascade='all, delete-orphan',
+                        # ON DELETE CASCADE removes them; no need to load them first
+                        passive_deletes=True
+                     )
+    body           = db.relationship('NoteBody', viewonly=True)
+
+    @hybrid_property
+    def content_md(self):
+        if self.body_hash is None:
+            return self._content_md
+        cached = getattr(self, '_body_cache', None)
+        if cached is None or cached[0] != self.body_hash:
+            cached = self._body_cache = (self.body_hash, db.session.get(NoteBody, self.body_hash).text)
+        return cached[1]
+
+    @content_md.setter
+    def content_md(self, text):
+        # Every write path, including the constructor, goes through here, so
+        # the summary columns and body storage always match the text
+        text = text or ''
+        summary = summarize_content(text)
+        if self.content_hash is not None and summary[3] == self.content_hash:
+            # Unchanged text, e.g. a rename: the stored body is already right
+            return
+        self.preview, self.word_count, self.byte_size, self.content_hash = summary
+        raw = text.encode('utf-8')
+        limit = (current_app.config.get('NOTE_BODY_INLINE_BYTES', INLINE_BODY_BYTES)
+                 if has_app_context() else INLINE_BODY_BYTES)
+        superseded = self.body_hash
+        if len(raw) > limit:
+            NoteBody.store(raw, self.content_hash)
+            self.body_hash = self.content_hash
+            self._body_cache = (self.content_hash, text)
+            self._content_md = raw[:limit].decode('utf-8', 'ignore')
+        else:
+            self.body_hash = None
+            self._content_md = text
+        if superseded is not None and superseded != self.body_hash:
+            NoteBody.release(superseded)
+
+    @content_md.expression
+    def content_md(cls):
+        return cls._content_md
+
+    @classmethod
+    def with_content(cls):
+        """Loader options for queries whose notes will have their bodies read.
+
+        Loads the inline column and, in one batched SELECT, any out-of-row
+        bodies, instead of one lazy query per note.
+        """
+        return undefer(cls._content_md), selectinload(cls.body)
+
+# 3) Version history: the newest row holds the full text, older rows hold
+# zlib-compressed reverse diffs against the next newer row, with a full
+# keyframe kept periodically so any version rebuilds in a bounded number of steps.
+class NoteVersion(db.Model):
+    __tablename__ = 'note_versions'
+    __table_args__ = (db.Index('idx_note_versions_n', 'note_id', 'version_no', unique=True),)
+    id          = db.Column(db.Integer, primary_key=True)
+    note_id     = db.Column(db.Integer, db.ForeignKey('notes.id', ondelete='CASCADE'), nullable=False)
+    version_no  = db.Column(db.Integer, nullable=False)
+    title       = db.Column(db.Text,    nullable=False)
+    language    = db.Column(db.String(30), nullable=False)
+    is_keyframe = db.Column(db.Boolean, default=True, nullable=False)
+    payload     = db.Column(db.LargeBinary, nullable=False)
+    created_at  = db.Column(db.DateTime(timezone=True), default=datetime.utcnow, nullable=False)
+
+# 3b) Large note bodies, stored once per distinct text. Rows are keyed by the
+# SHA-256 of the UTF-8 text, so notes (and re-saves) with the same body share
+# one row. A body an edit or delete leaves unused is removed in the same
+# transaction; ``flask db purge-bodies`` sweeps up any that were missed.
+class NoteBody(db.Model):
+    __tablename__ = 'note_bodies'
+    hash        = db.Column(db.String(64), primary_key=True)
+    codec       = db.Column(db.String(10), default='zlib', nullable=False)
+    size        = db.Column(db.Integer, nullable=False)  # uncompressed bytes
+    data        = db.Column(db.LargeBinary, nullable=False)
+    created_at  = db.Column(db.DateTime(timezone=True), default=datetime.utcnow, nullable=False)
+
+    @property
+    def text(self):
+        return zlib.decompress(self.data).decode('utf-8')
+
+    @classmethod
+    def store(cls, raw, digest):
+        """Make sure a row holds ``raw``; an existing row with the same hash is reused."""
+        values = {"hash": digest, "codec": "zlib", "size": len(raw),
+                  "data": zlib.compress(raw, 6), "created_at": datetime.utcnow()}
+        dialect = db.session.get_bind().dialect.name
+        # Called mid-assignment, so the note itself must not be flushed yet
+        with db.session.no_autoflush:
+            if dialect in ("postgresql", "sqlite"):
+                insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+                db.session.execute(insert(cls).values(values).on_conflict_do_nothing(index_elements=["hash"]))
+            elif db.session.get(cls, digest) is None:
+                body = cls(**values)
+                db.session.add(body)
+                db.session.flush([body])
+
+    @classmethod
+    def release(cls, digest):
+        """Drop the row for ``digest`` after the next flush, unless a note still uses it."""
+        db.session.info.setdefault("released_bodies", set()).add(digest)
+
+@event.listens_for(Session, "before_flush")
+def _release_deleted_bodies(session, flush_context, instances):
+    for obj in session.deleted:
+        if isinstance(obj, Note) and obj.body_hash is not None:
+            session.info.setdefault("released_bodies", set()).add(obj.body_hash)
 
-# 3) TAG next
+@event.listens_for(Session, "after_flush")
+def _delete_released_bodies(session, flush_context):
+    # Run once the notes' new body_hash values are written, so the foreign
+    # key is clear and a body another note shares is kept
+    released = session.info.pop("released_bodies", None)
+    if released:
+        in_use = select(Note.id).where(Note.body_hash == NoteBody.hash).exists()
+        session.connection().execute(
+            NoteBody.__table__.delete().where(NoteBody.hash.in_(released), ~in_use))
+
+# 3c) Files attached to a note. The bytes live in the blob store (see
+# server/blobs.py) under blob_hash, shared by every attachment with the same
+# content; a row only records which note uses them and under what name.
+class Attachment(db.Model):
+    __tablename__ = 'attachments'
+    id           = db.Column(db.Integer, primary_key=True)
+    note_id      = db.Column(db.Integer, db.ForeignKey('notes.id', ondelete='CASCADE'),
+                             nullable=False, index=True)
+    blob_hash    = db.Column(db.String(64), nullable=False, index=True)
+    filename     = db.Column(db.Text, nullable=False)
+    content_type = db.Column(db.String(255), nullable=False)
+    size         = db.Column(db.Integer, nullable=False)
+    created_at   = db.Column(db.DateTime(timezone=True), default=datetime.utcnow, nullable=False)
+
+# 3d) One card thumbnail per note, rendered by a client and stored in the blob
+# store like attachments. content_hash records which body it was drawn from,
+# so it is current only while that still matches the note's content_hash.
+class NoteThumbnail(db.Model):
+    __tablename__ = 'note_thumbnails'
+    note_id      = db.Column(db.Integer, db.ForeignKey('notes.id', ondelete='CASCADE'), primary_key=True)
+    content_hash = db.Column(db.String(64), nullable=False)
+    blob_hash    = db.Column(db.String(64), nullable=False, index=True)
+    content_type = db.Column(db.String(255), nullable=False)
+    size         = db.Column(db.Integer, nullable=False)
+    created_at   = db.Column(db.DateTime(timezone=True), default=datetime.utcnow, nullable=False)
+
+# 4) Deleted notes leave a tombstone so syncing clients learn about removals
+class NoteTombstone(db.Model):
+    __tablename__ = 'note_tombstones'
+    __table_args__ = (db.Index('idx_note_tombstones_user_seq', 'user_id', 'change_seq'),)
+    id          = db.Column(db.Integer, primary_key=True)
+    user_id     = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    note_id     = db.Column(db.Integer, nullable=False)
+    change_seq  = db.Column(db.Integer, nullable=False)
+    deleted_at  = db.Column(db.DateTime(timezone=True), default=datetime.utcnow, nullable=False)
+
+# 5) TAG next
 class Tag(db.Model):
     __tablename__ = 'tags'
     id            = db.Column(db.Integer, primary_key=True)
     name          = db.Column(db.Text,    unique=True, nullable=False)
 
-# 4) Finally, USER can map without Note to allow startup success
+    @classmethod
+    def resolve(cls, names):
+        """Return Tag rows for ``names`` in order, creating any that are missing.
+
+        Existing tags are fetched with one IN query. Missing ones are inserted
+        with ON CONFLICT DO NOTHING, so two requests creating the same new tag
+        both succeed instead of one failing on the unique constraint.
+        """
+        names = list(dict.fromkeys(names))
+        if not names:
+            return []
+        # Pending note edits are left for the caller's single flush
+        with db.session.no_autoflush:
+            found = {t.name: t for t in cls.query.filter(cls.name.in_(names))}
+            missing = [n for n in names if n not in found]
+            if missing:
+                dialect = db.session.get_bind().dialect.name
+                if dialect in ("postgresql", "sqlite"):
+                    insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+                    db.session.execute(
+                        insert(cls)
+                        .values([{"name": n} for n in missing])
+                        .on_conflict_do_nothing(index_elements=["name"])
+                    )
+                else:
+                    db.session.add_all(cls(name=n) for n in missing)
+                    db.session.flush()
+                found.update((t.name, t) for t in cls.query.filter(cls.name.in_(missing)))
+        return [found[n] for n in names]
+
+# 6) Finally, USER can map without Note to allow startup success
 class User(db.Model):
     __tablename__ = 'users'
     id            = db.Column(db.Integer, primary_key=True)
@@ -46,5 +281,103 @@ class User(db.Model):
     updated_at    = db.Column(db.DateTime(timezone=True),
                               default=datetime.utcnow,
                               onupdate=datetime.utcnow)
+    change_seq    = db.Column(db.Integer, default=0, nullable=False)
     # Define the relationship with notes
-    notes = db.relationship('Note', backref='user', lazy=True, cascade="all, delete-orphan")
+    notes = db.relationship('Note', backref='user', lazy=True, cascade="all, delete-orphan",
+                            passive_deletes=True)
+
+    @classmethod
+    def next_change_seqs(cls, user_id, count=1):
+        """Reserve ``count`` consecutive change sequence numbers for a user.
+
+        The UPDATE holds the user's row lock until commit, so each user's
+        writes commit in sequence order. It runs before any pending note
+        change is flushed, so locks are always taken user first, then notes,
+        and the numbers can be assigned before the notes' single flush.
+        """
+        with db.session.no_autoflush:
+            last = db.session.execute(
+                update(cls)
+                .where(cls.id == user_id)
+                # Assigned to itself so the column's onupdate is not applied
+                .values(change_seq=cls.change_seq + count, updated_at=cls.updated_at)
+                .returning(cls.change_seq)
+                .execution_options(synchronize_session=False)
+            ).scalar_one()
+        return range(last - count + 1, last + 1)
+
+# Every note write bumps users.change_seq in the same transaction, which makes
+# it the user's response cache generation, shared by all workers
+@cache.generation_loader
+def _response_cache_generation(user_id):
+    return db.session.query(User.change_seq).filter(User.id == int(user_id)).scalar() or 0
+
+# 7) Refresh tokens are tracked so they can be rotated and revoked. Each login
+# starts a family; reusing a rotated token revokes the whole family.
+class RefreshToken(db.Model):
+    __tablename__ = 'refresh_tokens'
+    id          = db.Column(db.Integer, primary_key=True)
+    jti         = db.Column(db.String(36), unique=True, nullable=False)
+    family      = db.Column(db.String(36), nullable=False, index=True)
+    user_id     = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    expires_at  = db.Column(db.DateTime(timezone=True), nullable=False)
+    revoked_at  = db.Column(db.DateTime(timezone=True))
+    created_at  = db.Column(db.DateTime(timezone=True), default=datetime.utcnow, nullable=False)
+
+# 8) Full-text search index. Postgres keeps a generated tsvector column with a
+# GIN index; SQLite keeps an FTS5 external-content table synced by triggers.
+# Both are maintained by the database itself on every insert, update and delete.
+# They index notes.content_md, which for bodies stored in note_bodies holds
+# only the first INLINE_BODY_BYTES: text past that point is not searchable.
+PG_SEARCH_DDL = [
+    """ALTER TABLE notes ADD COLUMN IF NOT EXISTS search_vector tsvector
+       GENERATED ALWAYS AS (
+         setweight(to_tsvector('english', title), 'A') ||
+         setweight(to_tsvector('english', left(content_md, 1000000)), 'B')
+       ) STORED""",
+    "CREATE INDEX IF NOT EXISTS idx_notes_search ON notes USING GIN (search_vector)",
+]
+
+SQLITE_SEARCH_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS notes_fts
+       USING fts5(title, content_md, content='notes', content_rowid='id')""",
+    """CREATE TRIGGER IF NOT EXISTS notes_fts_ai AFTER INSERT ON notes BEGIN
+         INSERT INTO notes_fts(rowid, title, content_md)
+         VALUES (new.id, new.title, new.content_md);
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS notes_fts_ad AFTER DELETE ON notes BEGIN
+         INSERT INTO notes_fts(notes_fts, rowid, title, content_md)
+         VALUES ('delete', old.id, old.title, old.content_md);
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS notes_fts_au AFTER UPDATE OF title, content_md ON notes BEGIN
+         INSERT INTO notes_fts(notes_fts, rowid, title, content_md)
+         VALUES ('delete', old.id, old.title, old.content_md);
+         INSERT INTO notes_fts(rowid, title, content_md)
+         VALUES (new.id, new.title, new.content_md);
+       END""",
+]
+
+@event.listens_for(db.metadata, "after_create")
+def create_search_index(target, connection, **kw):
+    dialect = connection.dialect.name
+    if dialect == "postgresql":
+        for statement in PG_SEARCH_DDL:
+            connection.exec_driver_sql(statement)
+    elif dialect == "sqlite":
+        existed = connection.exec_driver_sql(
+            "SELECT 1 FROM sqlite_master WHERE name = 'notes_fts'"
+        ).first()
+        for statement in SQLITE_SEARCH_DDL:
+            connection.exec_driver_sql(statement)
+        if not existed:
+            # Index rows written before the FTS table was introduced
+            connection.exec_driver_sql("INSERT INTO notes_fts(notes_fts) VALUES ('rebuild')")
+
+# 9) SQLite only honours ON DELETE CASCADE when foreign keys are switched on,
+# which has to be done for every new connection
+@event.listens_for(Engine, "connect")
+def enable_sqlite_foreign_keys(dbapi_connection, connection_record):
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.close()
@@ -0,0 +1,100 @@
+# server/pool.py
+
+import threading
+import time
+from sqlalchemy import exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
+
+class PoolStats:
+    """Running counters for one connection pool."""
+
+    def __init__(self):
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, waited, timed_out=False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+                self.wait_seconds_total += waited
+            self.wait_seconds_max = max(self.wait_seconds_max, waited)
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that times how long each checkout waits for a connection.
+
+    The wait covers queueing for a free connection and opening a new one
+    when the pool may still grow. Counters restart when the pool is
+    recreated, e.g. by ``engine.dispose()`` after a fork.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            record = super()._do_get()
+        except exc.TimeoutError:
+            self.stats.record(time.perf_counter() - start, timed_out=True)
+            raise
+        self.stats.record(time.perf_counter() - start)
+        return record
+
+def engine_options(config):
+    """SQLALCHEMY_ENGINE_OPTIONS built from the DB_POOL_* settings.
+
+    Anything already in SQLALCHEMY_ENGINE_OPTIONS wins. In-memory SQLite
+    keeps Flask-SQLAlchemy's single shared connection and is left alone.
+    """
+    options = dict(config.get("SQLALCHEMY_ENGINE_OPTIONS") or {})
+    url = make_url(config["SQLALCHEMY_DATABASE_URI"])
+    if url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+        return options
+
+    options.setdefault("poolclass", InstrumentedQueuePool)
+    options.setdefault("pool_size", config["DB_POOL_SIZE"])
+    options.setdefault("max_overflow", config["DB_MAX_OVERFLOW"])
+    options.setdefault("pool_timeout", config["DB_POOL_TIMEOUT"])
+    options.setdefault("pool_recycle", config["DB_POOL_RECYCLE"])
+    options.setdefault("pool_pre_ping", config["DB_POOL_PRE_PING"])
+
+    if config["DB_TRANSACTION_POOLER"] and url.get_backend_name() == "postgresql":
+        # Behind PgBouncer-style transaction pooling consecutive statements may
+        # run on different server connections, so nothing may be prepared
+        # server-side. psycopg2 never prepares; psycopg 3 must be told not to.
+        if url.get_driver_name() == "psycopg":
+            options["connect_args"] = {"prepare_threshold": None, **options.get("connect_args", {})}
+    return options
+
+def pool_stats(engine):
+    """A JSON-ready snapshot of ``engine``'s pool."""
+    pool = engine.pool
+    stats = {"pool": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        stats.update({
+            "size": pool.size(),
+            "checked_in": pool.checkedin(),
+            "in_use": pool.checkedout(),
+            # Negative until the pool has opened its first pool_size connections
+            "overflow": max(pool.overflow(), 0),
+            "max_overflow": pool._max_overflow,
+            "timeout_seconds": pool.timeout()
+        })
+    counters = getattr(pool, "stats", None)
+    if counters is not None:
+        stats.update({
+            "checkouts": counters.checkouts,
+            "timeouts": counters.timeouts,
+            "wait_ms_total": round(counters.wait_seconds_total * 1000, 3),
+            "wait_ms_max": round(counters.wait_seconds_max * 1000, 3),
+            "wait_ms_avg": round(counters.wait_seconds_total * 1000 / counters.checkouts, 3)
+                           if counters.checkouts else 0.0
+        })
+    return stats
@@ -0,0 +1,74 @@
+# server/query_plans.py
+"""Checks that the hot queries are served by the indexes meant for them.
+
+Each entry in HOT_QUERIES mirrors a query the routes run on every request,
+names the index it should use and whether that index should also deliver
+the ORDER BY (no separate sort step). ``check_query_plans`` asks the
+database for each plan with EXPLAIN. On Postgres, sequential scans are
+discouraged for the check, since a tiny test table would otherwise
+always be scanned.
+"""
+
+import json
+from sqlalchemy import func, select, tuple_
+from server.models.note_model import Note, NoteTombstone, NoteVersion, Tag, note_tags
+
+def _hot_queries():
+    listing = select(Note).where(Note.user_id == 1).order_by(Note.updated_at.desc(), Note.id.desc())
+    return [
+        ("list_notes first page", "idx_notes_user_updated", True,
+         listing.limit(101)),
+        ("list_notes keyset page", "idx_notes_user_updated", True,
+         listing.where(tuple_(Note.updated_at, Note.id) < tuple_(func.current_timestamp(), 0)).limit(101)),
+        ("notes with a tag", "idx_note_tags_tag", False,
+         select(note_tags.c.note_id).where(note_tags.c.tag_id == 1)),
+        ("list_notes filtered by tag", "idx_note_tags_tag", False,
+         listing.where(Note.id.in_(select(note_tags.c.note_id).join(Tag, Tag.id == note_tags.c.tag_id)
+                                   .where(Tag.name.in_(["python", "flask"])))).limit(101)),
+        ("changes since", "idx_notes_user_seq", True,
+         select(Note).where(Note.user_id == 1, Note.change_seq > 0).order_by(Note.change_seq).limit(501)),
+        ("tombstones since", "idx_note_tombstones_user_seq", True,
+         select(NoteTombstone).where(NoteTombstone.user_id == 1, NoteTombstone.change_seq > 0)
+         .order_by(NoteTombstone.change_seq)),
+        ("newest version", "idx_note_versions_n", True,
+         select(NoteVersion).where(NoteVersion.note_id == 1)
+         .order_by(NoteVersion.version_no.desc()).limit(1)),
+    ]
+
+def _sqlite_plan(conn, sql):
+    details = [row[-1] for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}")]
+    indexes = {word for d in details for word in d.split() if word.startswith(("idx_", "ix_"))}
+    sorts = any("TEMP B-TREE" in d for d in details)
+    return indexes, sorts, "\n".join(details)
+
+def _postgres_plan(conn, sql):
+    conn.exec_driver_sql("SET LOCAL enable_seqscan = off")
+    plan = conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {sql}").scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    indexes, sorts, stack = set(), False, [plan[0]["Plan"]]
+    while stack:
+        node = stack.pop()
+        if "Index Name" in node:
+            indexes.add(node["Index Name"])
+        sorts = sorts or node["Node Type"] in ("Sort", "Incremental Sort")
+        stack.extend(node.get("Plans", []))
+    return indexes, sorts, json.dumps(plan, indent=2)
+
+def check_query_plans(engine):
+    """Return one result dict per hot query; ``ok`` is False when a plan misses its index."""
+    results = []
+    with engine.connect() as conn:
+        explain = _postgres_plan if conn.dialect.name == "postgresql" else _sqlite_plan
+        for name, index, ordered, stmt in _hot_queries():
+            sql = str(stmt.compile(dialect=conn.dialect, compile_kwargs={"literal_binds": True}))
+            # Postgres's SET LOCAL must not outlive the check
+            trans = conn.begin()
+            try:
+                indexes, sorts, plan = explain(conn, sql)
+            finally:
+                trans.rollback()
+            ok = index in indexes and not (ordered and sorts)
+            results.append({"query": name, "index": index, "ok": ok,
+                            "indexes_used": sorted(indexes), "plan": plan})
+    return results
@@ -0,0 +1,413 @@
+# server/rendering.py
+"""Server-side rendering of notes to HTML.
+
+Markdown notes are converted by a small built-in renderer covering the
+syntax people write in notes: headings, paragraphs, emphasis, code spans and
+fences, links, images, lists, block quotes and rules. It is safe by
+construction: all source text is HTML-escaped and only the renderer's own
+tags are emitted, so raw HTML in a note shows up as text. Link and image
+URLs are limited to SAFE_SCHEMES. Code fences, and whole notes in a
+programming language, are highlighted with Pygments using CSS classes (see
+``highlight_css``).
+
+Rendered HTML depends only on the text, the language and RENDERER_VERSION,
+so it is cached under those. Bump RENDERER_VERSION whenever output changes.
+"""
+
+import hashlib
+import html
+import os
+import re
+import tempfile
+import threading
+from collections import OrderedDict
+from pygments import highlight
+from pygments.formatters import HtmlFormatter
+from pygments.lexers import get_lexer_by_name
+from pygments.util import ClassNotFound
+
+RENDERER_VERSION = 2
+MARKDOWN_LANGUAGES = ("markdown", "md")
+SAFE_SCHEMES = ("http", "https", "mailto")
+# Raster images only; SVG can carry script
+SAFE_DATA_IMAGE = re.compile(r"^data:image/(png|gif|jpeg|webp);base64,[a-z0-9+/=\s]+$", re.I)
+
+_formatter = HtmlFormatter(cssclass="highlight")
+
+def highlight_css():
+    return _formatter.get_style_defs(".highlight")
+
+def highlight_code(code, language):
+    try:
+        lexer = get_lexer_by_name((language or "text").strip().lower())
+    except ClassNotFound:
+        lexer = get_lexer_by_name("text")
+    return highlight(code, lexer, _formatter)
+
+# ─── Inline syntax ──────────────────────────────────────────────────────────
+
+# Longer runs of inline text (one paragraph, heading or list line) are shown
+# escaped but otherwise as written, which bounds the work any one of them costs
+INLINE_MAX_CHARS = 64 * 1024
+
+_BACKTICKS = re.compile(r"`+")
+# URLs may hold one level of balanced parentheses, as Wikipedia links do
+_URL = r"((?:[^()\s]|\([^()\s]*\))+)"
+_IMAGE = re.compile(r"!\[([^\[\]]*)\]\(\s*" + _URL + r"(?:\s+&quot;([^&\n]*)&quot;)?\s*\)")
+_LINK = re.compile(r"\[([^\[\]]+)\]\(\s*" + _URL + r"(?:\s+&quot;([^&\n]*)&quot;)?\s*\)")
+_AUTOLINK = re.compile(r"&lt;((?:https?|mailto):[^\s&]+)&gt;|(?<![\w/=\x00])(https?://[^\s<\x00]+[^\s<\x00.,;:!?)])")
+_DELIMITERS = re.compile(r"(\*+|_+|~~)")
+# Delimiter runs that pair up, by character and length
+_EMPHASIS_TAGS = {("*", 1): ("<em>", "</em>"), ("_", 1): ("<em>", "</em>"),
+                  ("*", 2): ("<strong>", "</strong>"), ("_", 2): ("<strong>", "</strong>"),
+                  ("*", 3): ("<strong><em>", "</em></strong>"), ("_", 3): ("<strong><em>", "</em></strong>"),
+                  ("~", 2): ("<del>", "</del>")}
+_HARD_BREAK = re.compile(r"(?:(?<! ) {2,}|\\)\n")
+_PLACEHOLDER = re.compile(r"\x00(\d+)\x00")
+
+def _safe_url(escaped):
+    url = html.unescape(escaped).strip()
+    # Browsers ignore control characters and whitespace inside a scheme
+    compact = re.sub(r"[\x00-\x20]", "", url)
+    scheme = re.match(r"^([a-zA-Z][a-zA-Z0-9+.-]*):", compact)
+    if scheme is None or scheme.group(1).lower() in SAFE_SCHEMES or SAFE_DATA_IMAGE.match(compact):
+        return html.escape(url, quote=True)
+    return None
+
+def _code_spans(text, keep):
+    """Replace code spans with placeholders in one pass over the backtick runs.
+
+    A run opens a span closed by the next run of the same length; a run with
+    no such partner is literal.
+    """
+    runs = [(m.start(), m.end()) for m in _BACKTICKS.finditer(text)]
+    by_length = {}
+    for index, (start, end) in enumerate(runs):
+        by_length.setdefault(end - start, []).append(index)
+    cursor = {length: 0 for length in by_length}
+    out, pos, index = [], 0, 0
+    while index < len(runs):
+        start, end = runs[index]
+        length = end - start
+        same = by_length[length]
+        while cursor[length] < len(same) and same[cursor[length]] <= index:
+            cursor[length] += 1
+        if cursor[length] == len(same):
+            index += 1
+            continue
+        closer = same[cursor[length]]
+        close_start, close_end = runs[closer]
+        out.append(text[pos:start])
+        out.append(keep(f"<code>{html.escape(text[end:close_start].strip())}</code>"))
+        pos = close_end
+        index = closer + 1
+    out.append(text[pos:])
+    return "".join(out)
+
+def _emphasis(text):
+    """Pair emphasis delimiters in one left-to-right pass.
+
+    Openers wait on a stack; a closer pairs with the nearest opener of the
+    same character and length and discards any openers above it, so tags
+    always nest. Each opener is pushed and dropped at most once.
+    """
+    parts = _DELIMITERS.split(text)
+    stack = []          # (part index, key) of openers still waiting
+    waiting = {}        # key -> stack positions of its openers, oldest first
+    closes = {}
+    for index in range(1, len(parts), 2):
+        run = parts[index]
+        key = (run[0], len(run))
+        if key not in _EMPHASIS_TAGS:
+            continue
+        before = parts[index - 1][-1:] or " "
+        after = parts[index + 1][:1] or " "
+        can_open, can_close = not after.isspace(), not before.isspace()
+        if run[0] == "_":
+            # Underscores inside words, as in snake_case, stay literal
+            can_open = can_open and not before.isalnum()
+            can_close = can_close and not after.isalnum()
+        positions = waiting.get(key)
+        while positions and (positions[-1] >= len(stack) or stack[positions[-1]][0] in closes):
+            positions.pop()
+        if can_close and positions:
+            opener = positions.pop()
+            closes[stack[opener][0]] = index
+            del stack[opener:]
+        elif can_open:
+            waiting.setdefault(key, []).append(len(stack))
+            stack.append((index, key))
+    for opener, closer in closes.items():
+        key = (parts[opener][0], len(parts[opener]))
+        parts[opener], parts[closer] = _EMPHASIS_TAGS[key]
+    return "".join(parts)
+
+def render_inline(text):
+    text = text.replace("\x00", "")
+    if len(text) > INLINE_MAX_CHARS:
+        return html.escape(text).replace("\n", "<br>\n")
+    stash = []
+
+    def keep(fragment):
+        stash.append(fragment)
+        return f"\x00{len(stash) - 1}\x00"
+
+    # Code spans first, so nothing inside them is treated as markup
+    text = html.escape(_code_spans(text, keep), quote=True)
+
+    def image(m):
+        alt, url, title = m.group(1), _safe_url(m.group(2)), m.group(3)
+        if url is None:
+            return alt
+        title_attr = f' title="{title}"' if title else ""
+        return keep(f'<img src="{url}" alt="{alt}"{title_attr} loading="lazy">')
+
+    def link(m):
+        label, url, title = m.group(1), _safe_url(m.group(2)), m.group(3)
+        if url is None:
+            return label
+        title_attr = f' title="{title}"' if title else ""
+        return keep(f'<a href="{url}"{title_attr} rel="nofollow noopener noreferrer">') + label + keep("</a>")
+
+    def autolink(m):
+        target = m.group(1) or m.group(2)
+        url = _safe_url(target)
+        return keep(f'<a href="{url}" rel="nofollow noopener noreferrer">{target}</a>') if url else target
+
+    text = _IMAGE.sub(image, text)
+    text = _LINK.sub(link, text)
+    text = _AUTOLINK.sub(autolink, text)
+    text = _emphasis(text)
+    # Two trailing spaces or a backslash end a line with a hard break
+    text = _HARD_BREAK.sub("<br>\n", text)
+    while _PLACEHOLDER.search(text):
+        text = _PLACEHOLDER.sub(lambda m: stash[int(m.group(1))], text)
+    return text
+
+# ─── Block syntax ───────────────────────────────────────────────────────────
+
+_FENCE = re.compile(r"^ {0,3}(`{3,}|~{3,})\s*([\w+#.-]*)")
+_HEADING = re.compile(r"^ {0,3}(#{1,6})(?:[ \t]+(.*))?$")
+_RULE = re.compile(r"^ {0,3}([-*_])(?:\s*\1){2,}\s*$")
+_QUOTE = re.compile(r"^ {0,3}> ?")
+# Block quotes and lists nested deeper than this are not parsed further
+MAX_NESTING = 16
+_ITEM = re.compile(r"^( {0,3})([-*+]|\d{1,9}[.)])( +|$)")
+
+def _heading_text(text):
+    # Drop an optional closing run of #s; string methods keep this linear
+    text = text.rstrip()
+    bare = text.rstrip("#")
+    if bare != text and (not bare or bare[-1] in " \t"):
+        text = bare.rstrip()
+    return text
+
+def _is_block_start(line):
+    return bool(_FENCE.match(line) or _HEADING.match(line) or _RULE.match(line)
+                or _QUOTE.match(line) or _ITEM.match(line))
+
+def _render_list(lines, i, depth):
+    first = _ITEM.match(lines[i])
+    ordered = first.group(2)[-1] in ".)"
+    items = []
+    while i < len(lines):
+        m = _ITEM.match(lines[i])
+        if m is None or (m.group(2)[-1] in ".)") != ordered:
+            break
+        indent = len(m.group(0)) if m.group(3) else len(m.group(0)) + 1
+        body = [lines[i][len(m.group(0)):]]
+        i += 1
+        # Continuation lines are indented past the marker; a blank line only
+        # continues the item if indented content follows it
+        while i < len(lines):
+            line = lines[i]
+            if line.strip() == "":
+                if i + 1 < len(lines) and lines[i + 1].startswith(" " * indent) and lines[i + 1].strip():
+                    body.append("")
+                    i += 1
+                    continue
+                break
+            if line.startswith(" " * indent):
+                body.append(line[indent:])
+            elif _ITEM.match(line) or _is_block_start(line):
+                break
+            else:
+                body.append(line)  # lazy paragraph continuation
+            i += 1
+        inner = render_blocks(body, depth + 1)
+        # Tight items hold a single paragraph; drop its <p> wrapper
+        if inner.startswith("<p>") and inner.count("<p>") == 1:
+            inner = inner[3:].replace("</p>", "", 1)
+        items.append(f"<li>{inner}</li>")
+        while i < len(lines) and lines[i].strip() == "":
+            i += 1
+            if i < len(lines) and not _ITEM.match(lines[i]):
+                break
+    start = int(first.group(2)[:-1]) if ordered else 1
+    tag = "ol" if ordered else "ul"
+    start_attr = f' start="{start}"' if ordered and start != 1 else ""
+    return f"<{tag}{start_attr}>\n" + "\n".join(items) + f"\n</{tag}>", i
+
+def render_blocks(lines, depth=0):
+    if depth >= MAX_NESTING:
+        # Deeper quotes and lists are shown as text rather than recursed into
+        return f"<p>{render_inline(chr(10).join(line.strip() for line in lines if line.strip()))}</p>"
+    out, i = [], 0
+    while i < len(lines):
+        line = lines[i]
+        if line.strip() == "":
+            i += 1
+            continue
+        fence = _FENCE.match(line)
+        if fence:
+            marker, info = fence.group(1), fence.group(2)
+            code = []
+            i += 1
+            while i < len(lines) and not lines[i].strip().startswith(marker):
+                code.append(lines[i])
+                i += 1
+            i += 1
+            source = "\n".join(code) + "\n"
+            out.append(highlight_code(source, info) if info else
+                       f"<pre><code>{html.escape(source)}</code></pre>")
+            continue
+        heading = _HEADING.match(line)
+        if heading:
+            level = len(heading.group(1))
+            out.append(f"<h{level}>{render_inline(_heading_text(heading.group(2) or ''))}</h{level}>")
+            i += 1
+            continue
+        if _RULE.match(line):
+            out.append("<hr>")
+            i += 1
+            continue
+        if _QUOTE.match(line):
+            quoted = []
+            while i < len(lines) and lines[i].strip() and (_QUOTE.match(lines[i]) or quoted):
+                quoted.append(_QUOTE.sub("", lines[i], count=1))
+                i += 1
+            out.append(f"<blockquote>\n{render_blocks(quoted, depth + 1)}\n</blockquote>")
+            continue
+        if _ITEM.match(line):
+            block, i = _render_list(lines, i, depth)
+            out.append(block)
+            continue
+        paragraph = []
+        while i < len(lines) and lines[i].strip() and (not paragraph or not _is_block_start(lines[i])):
+            paragraph.append(lines[i].strip() if not lines[i].endswith("  ") else lines[i].lstrip())
+            i += 1
+        out.append(f"<p>{render_inline(chr(10).join(paragraph))}</p>")
+    return "\n".join(out)
+
+def render_markdown(text):
+    return render_blocks(text.replace("\r\n", "\n").replace("\r", "\n").expandtabs(4).split("\n"))
+
+def render_note(text, language):
+    """HTML for a note body, chosen by the note's language."""
+    language = (language or "").strip().lower()
+    if language in MARKDOWN_LANGUAGES:
+        return render_markdown(text or "")
+    if language in ("", "plaintext", "text"):
+        return f"<pre>{html.escape(text or '')}</pre>"
+    return highlight_code(text or "", language)
+
+def render_key(content_hash, language):
+    return f"{RENDERER_VERSION}:{(language or '').strip().lower()}:{content_hash}"
+
+# ─── Cache ──────────────────────────────────────────────────────────────────
+
+class NoteRenderer:
+    """Renders notes through an in-memory LRU, bounded by total bytes, and an
+    optional directory tier that survives restarts and is shared by workers.
+
+    Entries never go stale: the key includes the content hash, so an edited
+    note simply gets a new entry. The directory can be emptied at any time.
+    """
+
+    def __init__(self, app=None):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self.max_bytes = 32 * 1024 * 1024
+        self.directory = None
+        self.hits = self.disk_hits = self.misses = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault("RENDER_CACHE_MAX_BYTES", 32 * 1024 * 1024)
+        app.config.setdefault("RENDER_CACHE_DIR", None)
+        self.max_bytes = app.config["RENDER_CACHE_MAX_BYTES"]
+        self.directory = app.config["RENDER_CACHE_DIR"]
+        self.clear()
+        app.extensions["note_renderer"] = self
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self.hits = self.disk_hits = self.misses = 0
+
+    def _path(self, key):
+        name = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, name[:2], name + ".html")
+
+    def _remember(self, key, value):
+        size = len(value.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                return
+            self._entries[key] = (value, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+        if self.directory:
+            try:
+                with open(self._path(key), encoding="utf-8") as f:
+                    value = f.read()
+            except FileNotFoundError:
+                pass
+            else:
+                self.disk_hits += 1
+                self._remember(key, value)
+                return value
+        self.misses += 1
+        return None
+
+    def set(self, key, value):
+        self._remember(key, value)
+        if self.directory:
+            path = self._path(key)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path))
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(value)
+            os.replace(tmp, path)
+
+    def render(self, key, text_fn, language):
+        """Cached HTML for ``key``, calling ``text_fn`` for the body only on a miss.
+
+        Returns ``(html, hit)``.
+        """
+        value = self.get(key)
+        if value is not None:
+            return value, True
+        value = render_note(text_fn(), language)
+        self.set(key, value)
+        return value, False
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._bytes, "max_bytes": self.max_bytes,
+                    "hits": self.hits, "disk_hits": self.disk_hits, "misses": self.misses}
@@ -0,0 +1,135 @@
+# server/routes/attachments.py
+
+import click
+import mimetypes
+from flask import Blueprint, abort, current_app, request, jsonify, send_file
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from server.blobs import BlobTooLarge
+from server.extensions import db, blobs
+from server.models.note_model import Attachment, Note, NoteThumbnail
+
+attachments_bp = Blueprint("attachments", __name__, url_prefix="/api/notes")
+
+# An attachment never changes once uploaded, so clients may cache it for good
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+# Shown inline; anything else (HTML and SVG included) downloads as a file
+INLINE_TYPES = {"image/png", "image/jpeg", "image/gif", "image/webp", "application/pdf",
+                "text/plain"}
+# Blobs younger than this are kept by ``flask attachments purge``, since an
+# upload writes its blob before committing the row that references it
+PURGE_GRACE_SECONDS = 3600
+
+def _attachment_to_dict(a):
+    return {
+        "id": a.id,
+        "note_id": a.note_id,
+        "filename": a.filename,
+        "content_type": a.content_type,
+        "size": a.size,
+        "hash": a.blob_hash,
+        "url": f"/api/notes/{a.note_id}/attachments/{a.id}",
+        "created_at": a.created_at.isoformat()
+    }
+
+def _owns_note(note_id, user_id):
+    # Only the owner column is needed, so the note itself is never loaded
+    owner = db.session.query(Note.user_id).filter(Note.id == note_id).scalar()
+    if owner is None:
+        abort(404)
+    return owner == user_id
+
+@attachments_bp.route("/<int:note_id>/attachments", methods=["POST"])
+@jwt_required()
+def upload_attachment(note_id):
+    # The request body is the file itself, streamed to disk as it arrives
+    user_id = int(get_jwt_identity())
+    if not _owns_note(note_id, user_id):
+        return jsonify({"msg": "Forbidden"}), 403
+    filename = (request.args.get("filename") or "").strip() or "attachment"
+    max_bytes = current_app.config["ATTACHMENT_MAX_BYTES"]
+    if request.content_length is not None and request.content_length > max_bytes:
+        return jsonify({"msg": f"Attachments are limited to {max_bytes} bytes"}), 413
+    try:
+        key, size = blobs.save(request.stream, max_bytes)
+    except BlobTooLarge:
+        return jsonify({"msg": f"Attachments are limited to {max_bytes} bytes"}), 413
+    content_type = (request.mimetype if request.mimetype and request.mimetype != "application/octet-stream"
+                    else mimetypes.guess_type(filename)[0]) or "application/octet-stream"
+
+    attachment = Attachment(note_id=note_id, blob_hash=key, filename=filename,
+                            content_type=content_type, size=size)
+    db.session.add(attachment)
+    db.session.flush()
+    data = _attachment_to_dict(attachment)
+    db.session.commit()
+    return jsonify(data), 201
+
+@attachments_bp.route("/<int:note_id>/attachments", methods=["GET"])
+@jwt_required()
+def list_attachments(note_id):
+    user_id = int(get_jwt_identity())
+    if not _owns_note(note_id, user_id):
+        return jsonify({"msg": "Forbidden"}), 403
+    attachments = Attachment.query.filter_by(note_id=note_id).order_by(Attachment.id)
+    return jsonify([_attachment_to_dict(a) for a in attachments]), 200
+
+def _owned_attachment(note_id, attachment_id, user_id):
+    row = (db.session.query(Attachment, Note.user_id)
+           .join(Note, Note.id == Attachment.note_id)
+           .filter(Attachment.id == attachment_id, Attachment.note_id == note_id)
+           .first_or_404())
+    attachment, owner = row
+    return attachment if owner == user_id else None
+
+@attachments_bp.route("/<int:note_id>/attachments/<int:attachment_id>", methods=["GET"])
+@jwt_required(locations=["headers", "query_string"])
+def download_attachment(note_id, attachment_id):
+    # <img> tags cannot set headers, so the token may also arrive as ?jwt=
+    user_id = int(get_jwt_identity())
+    attachment = _owned_attachment(note_id, attachment_id, user_id)
+    if attachment is None:
+        return jsonify({"msg": "Forbidden"}), 403
+    if not blobs.exists(attachment.blob_hash):
+        return jsonify({"msg": "Attachment content is missing"}), 410
+    # send_file answers Range and If-None-Match requests from the file itself
+    response = send_file(
+        blobs.path(attachment.blob_hash),
+        mimetype=attachment.content_type,
+        as_attachment=attachment.content_type not in INLINE_TYPES,
+        download_name=attachment.filename,
+        conditional=True,
+        etag=attachment.blob_hash,
+        max_age=IMMUTABLE_MAX_AGE
+    )
+    response.cache_control.private = True
+    response.cache_control.public = False
+    response.cache_control.immutable = True
+    response.headers["X-Content-Type-Options"] = "nosniff"
+    response.headers["Content-Security-Policy"] = "default-src 'none'; sandbox"
+    return response
+
+@attachments_bp.route("/<int:note_id>/attachments/<int:attachment_id>", methods=["DELETE"])
+@jwt_required()
+def delete_attachment(note_id, attachment_id):
+    user_id = int(get_jwt_identity())
+    attachment = _owned_attachment(note_id, attachment_id, user_id)
+    if attachment is None:
+        return jsonify({"msg": "Forbidden"}), 403
+    # The blob may be shared; unreferenced blobs are removed by ``flask attachments purge``
+    db.session.delete(attachment)
+    db.session.commit()
+    return jsonify({"msg": "Deleted"}), 200
+
+@attachments_bp.cli.command("purge")
+@click.option("--grace", type=int, default=PURGE_GRACE_SECONDS,
+              help="Keep blobs written within this many seconds.")
+def purge_command(grace):
+    """Delete stored files that no attachment or thumbnail refers to."""
+    referenced = {h for (h,) in db.session.query(Attachment.blob_hash).distinct()}
+    referenced |= {h for (h,) in db.session.query(NoteThumbnail.blob_hash).distinct()}
+    removed = 0
+    for key in list(blobs.keys(older_than=grace)):
+        if key not in referenced:
+            blobs.delete(key)
+            removed += 1
+    click.echo(f"Removed {removed} unreferenced files")
@@ -0,0 +1,53 @@
+# server/routes/internal.py
+
+import hmac
+from flask import Blueprint, Response, current_app, jsonify, request
+from server.extensions import db, metrics, renderer
+from server.pool import pool_stats
+
+internal_bp = Blueprint("internal", __name__, url_prefix="/api/internal")
+# Prometheus expects /metrics at the root, so it gets its own blueprint
+metrics_bp = Blueprint("metrics", __name__)
+
+LOOPBACK = ("127.0.0.1", "::1")
+
+@internal_bp.before_request
+@metrics_bp.before_request
+def require_operator():
+    # Not for end users: allowed with the configured token, or from the host
+    # itself when INTERNAL_STATS_ALLOW_LOOPBACK says no proxy fronts the app
+    token = current_app.config.get("INTERNAL_STATS_TOKEN")
+    if token:
+        if not hmac.compare_digest(request.headers.get("X-Internal-Token", ""), token):
+            return jsonify({"msg": "Forbidden"}), 403
+    elif not (current_app.config.get("INTERNAL_STATS_ALLOW_LOOPBACK") and request.remote_addr in LOOPBACK):
+        return jsonify({"msg": "Forbidden"}), 403
+
+@internal_bp.route("/stats", methods=["GET"])
+def stats():
+    pools = {bind or "default": pool_stats(engine) for bind, engine in db.engines.items()}
+    return jsonify({"pools": pools, "render_cache": renderer.stats()}), 200
+
+# Pool figures exported as gauges alongside the request metrics
+POOL_GAUGES = {
+    "in_use": "Connections currently checked out.",
+    "checked_in": "Idle connections held by the pool.",
+    "overflow": "Connections open beyond the pool size.",
+    "checkouts": "Connections handed out since the pool was created.",
+    "timeouts": "Checkouts that gave up waiting for a connection.",
+    "wait_ms_max": "Longest wait for a connection, in milliseconds."
+}
+
+def _pool_lines():
+    stats = {bind or "default": pool_stats(engine) for bind, engine in db.engines.items()}
+    for field, help in POOL_GAUGES.items():
+        name = f"devpad_db_pool_{field}"
+        yield f"# HELP {name} {help}"
+        yield f"# TYPE {name} gauge"
+        for bind, values in sorted(stats.items()):
+            if field in values:
+                yield f'{name}{{bind="{bind}"}} {values[field]}'
+
+@metrics_bp.route("/metrics", methods=["GET"])
+def prometheus_metrics():
+    return Response(metrics.render(_pool_lines()), mimetype="text/plain; version=0.0.4")
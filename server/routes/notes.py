@@ -1,77 +1,628 @@
 # server/routes/notes.py
 
-from flask import Blueprint, request, jsonify
+import base64
+import binascii
+import io
+import json
+from datetime import datetime
+from flask import Blueprint, Response, current_app, request, jsonify, make_response, send_file
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from server.extensions import db
-from server.models.note_model import Note, Tag
+from sqlalchemy import func, select, tuple_
+from server.events import EVENT_FIELDS, changed_fields, note_event, snapshot
+from server.extensions import db, blobs, cache, events
+from server.models.note_model import Note, NoteThumbnail, NoteTombstone, Tag, User, make_preview, note_tags
+from server.routes.search import search_notes
+from server.routes.serializers import note_to_dict, note_etag
+from server.versioning import first_version, record_version, record_versions
 
 # Define and export the blueprint
 notes_bp = Blueprint("notes", __name__, url_prefix="/api/notes")
 
+# Keyset pagination bounds for list_notes
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+SEARCH_PAGE_SIZE = 20
+MAX_BATCH_OPS = 500
+CHANGES_PAGE_SIZE = 500
+# Fields a batch update may change; anything omitted is left untouched
+BATCH_UPDATE_FIELDS = ("title", "content_md", "language", "favorite")
+# JSON type each editable note field must arrive as
+NOTE_FIELD_TYPES = {"title": str, "content_md": str, "language": str, "favorite": bool}
+VERSIONED_FIELDS = ("title", "content_md", "language")
+MAX_SEARCH_PAGE_SIZE = 100
+
+def _apply_text_ops(text, ops):
+    """Apply ``{"start", "end", "text"}`` replacements in order.
+
+    Offsets are UTF-16 code units, matching JavaScript string indices, and
+    each op is relative to the document produced by the ops before it.
+    """
+    buf = bytearray(text.encode("utf-16-le"))
+    for op in ops:
+        start, end, insert = op["start"], op["end"], op.get("text", "")
+        if not (isinstance(start, int) and isinstance(end, int) and isinstance(insert, str)):
+            raise ValueError("Malformed edit operation")
+        if not 0 <= start <= end <= len(buf) // 2:
+            raise ValueError("Edit operation out of range")
+        buf[start * 2:end * 2] = insert.encode("utf-16-le")
+    return buf.decode("utf-16-le")
+
+def _parse_bool(value):
+    lowered = value.lower()
+    if lowered in ("1", "true", "yes"):
+        return True
+    if lowered in ("0", "false", "no"):
+        return False
+    raise ValueError(value)
+
+def _check_note_fields(data):
+    """Raise ValueError if a note field in ``data`` has the wrong JSON type.
+
+    Run before anything is assigned, so bad input is a 400 rather than an
+    error at flush time.
+    """
+    if not isinstance(data, dict):
+        raise ValueError("data must be an object")
+    for name, kind in NOTE_FIELD_TYPES.items():
+        if name in data and not isinstance(data[name], kind):
+            raise ValueError(f"{name} must be true or false" if kind is bool else f"{name} must be a string")
+    if len(data.get("language", "")) > Note.language.type.length:
+        raise ValueError("language is too long")
+    tags = data.get("tags", [])
+    if not isinstance(tags, list) or not all(isinstance(t, str) for t in tags):
+        raise ValueError("tags must be a list of strings")
+
+def _filter_notes(query, args):
+    """Narrow a notes query by ``tag`` (repeatable, with ``match=any|all``),
+    ``language`` and ``favorite`` query parameters.
+
+    Tags are matched in the database through note_tags, so the listing stays
+    one indexed query however many tags are asked for.
+    """
+    tags = list(dict.fromkeys(t.strip() for t in args.getlist("tag") if t.strip()))
+    if tags:
+        match = args.get("match", "any")
+        if match not in ("any", "all"):
+            raise ValueError("match must be 'any' or 'all'")
+        tagged = (select(note_tags.c.note_id)
+                  .join(Tag, Tag.id == note_tags.c.tag_id)
+                  .where(Tag.name.in_(tags)))
+        if match == "all":
+            tagged = tagged.group_by(note_tags.c.note_id).having(func.count() == len(tags))
+        query = query.filter(Note.id.in_(tagged))
+    language = args.get("language")
+    if language:
+        query = query.filter(Note.language == language)
+    favorite = args.get("favorite")
+    if favorite:
+        try:
+            query = query.filter(Note.favorite.is_(_parse_bool(favorite)))
+        except ValueError:
+            raise ValueError("favorite must be true or false")
+    return query
+
+def _encode_cursor(note):
+    raw = f"{note.updated_at.isoformat()}|{note.id}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+def _decode_cursor(cursor):
+    raw = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8")
+    updated_at, note_id = raw.rsplit("|", 1)
+    return datetime.fromisoformat(updated_at), int(note_id)
+
 @notes_bp.route("", methods=["GET"])
 @jwt_required()
+@cache.cached
 def list_notes():
     user_id = int(get_jwt_identity())
-    notes = Note.query.filter_by(user_id=user_id).order_by(Note.updated_at.desc()).all()
-    return jsonify([{
-        "id": n.id,
-        "title": n.title,
-        "content_md": n.content_md,
-        "language": n.language,
-        "favorite": n.favorite,
-        "tags": [t.name for t in n.tags],
-        "created_at": n.created_at.isoformat(),
-        "updated_at": n.updated_at.isoformat(),
-        "last_viewed_at": n.last_viewed_at.isoformat() if n.last_viewed_at else None
-    } for n in notes]), 200
+    summary = request.args.get("fields") == "summary"
+    try:
+        limit = int(request.args.get("limit", DEFAULT_PAGE_SIZE))
+    except ValueError:
+        return jsonify({"msg": "Invalid limit"}), 400
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+    try:
+        query = _filter_notes(Note.query.filter_by(user_id=user_id), request.args)
+    except ValueError as e:
+        return jsonify({"msg": f"Invalid filter: {e}"}), 400
+    cursor = request.args.get("cursor")
+    if cursor:
+        try:
+            updated_at, note_id = _decode_cursor(cursor)
+        except (ValueError, UnicodeDecodeError, binascii.Error):
+            return jsonify({"msg": "Invalid cursor"}), 400
+        query = query.filter(tuple_(Note.updated_at, Note.id) < (updated_at, note_id))
+    query = query.order_by(Note.updated_at.desc(), Note.id.desc())
+
+    if not summary:
+        query = query.options(*Note.with_content())
+    # Summaries come from the stored preview; the bodies stay in the database
+    notes = query.limit(limit + 1).all()
+    items = [note_to_dict(n, summary=summary) for n in notes[:limit]]
+
+    response = jsonify(items)
+    if len(notes) > limit:
+        response.headers["X-Next-Cursor"] = _encode_cursor(notes[limit - 1])
+    return response, 200
+
+@notes_bp.route("/search", methods=["GET"])
+@jwt_required()
+def search():
+    user_id = int(get_jwt_identity())
+    query = (request.args.get("q") or "").strip()
+    if not query:
+        return jsonify({"msg": "Search query required"}), 400
+    try:
+        limit = int(request.args.get("limit", SEARCH_PAGE_SIZE))
+        offset = int(request.args.get("cursor", 0))
+    except ValueError:
+        return jsonify({"msg": "Invalid limit or cursor"}), 400
+    limit = max(1, min(limit, MAX_SEARCH_PAGE_SIZE))
+    offset = max(0, offset)
+
+    hits = search_notes(user_id, query, limit + 1, offset)
+    page = hits[:limit]
+    notes = {
+        n.id: n for n in Note.query.filter(Note.id.in_([h["id"] for h in page]))
+    }
+    items = []
+    for hit in page:
+        item = note_to_dict(notes[hit["id"]], make_preview(hit.pop("snippet")))
+        item.update(hit)
+        items.append(item)
+
+    response = jsonify(items)
+    if len(hits) > limit:
+        # Ranked results page by offset; the cursor stays opaque to clients
+        response.headers["X-Next-Cursor"] = str(offset + limit)
+    return response, 200
+
+@notes_bp.route("/changes", methods=["GET"])
+@jwt_required()
+@cache.cached
+def list_changes():
+    user_id = int(get_jwt_identity())
+    try:
+        # Without ``since`` the client gets a full snapshot, including rows that predate sync
+        since = int(request.args.get("since", -1))
+        limit = int(request.args.get("limit", CHANGES_PAGE_SIZE))
+    except ValueError:
+        return jsonify({"msg": "Invalid since or limit"}), 400
+    limit = max(1, min(limit, CHANGES_PAGE_SIZE))
+
+    notes = (Note.query.options(*Note.with_content())
+             .filter(Note.user_id == user_id, Note.change_seq > since)
+             .order_by(Note.change_seq).limit(limit + 1).all())
+    tombstones = (NoteTombstone.query
+                  .filter(NoteTombstone.user_id == user_id, NoteTombstone.change_seq > since)
+                  .order_by(NoteTombstone.change_seq).limit(limit + 1).all())
+    changes = sorted(notes + tombstones, key=lambda c: c.change_seq)
+    page = changes[:limit]
+
+    return jsonify({
+        "notes": [note_to_dict(c) for c in page if isinstance(c, Note)],
+        "deleted": [c.note_id for c in page if isinstance(c, NoteTombstone)],
+        "cursor": page[-1].change_seq if page else max(since, 0),
+        "has_more": len(changes) > limit
+    }), 200
+
+def _sse(event):
+    return f"id: {event['change_seq']}\nevent: note\ndata: {json.dumps(event)}\n\n"
+
+@notes_bp.route("/events", methods=["GET"])
+@jwt_required(locations=["headers", "query_string"])
+def note_events():
+    # EventSource cannot set headers, so the token may also arrive as ?jwt=
+    user_id = int(get_jwt_identity())
+    subscription = events.subscribe(user_id)
+    heartbeat = current_app.config["NOTE_EVENTS_HEARTBEAT"]
+
+    # A reconnecting client sends the last id it saw; replay what it missed
+    backlog, truncated = [], False
+    last_seen = request.headers.get("Last-Event-ID", "")
+    if last_seen.isdigit():
+        since = int(last_seen)
+        # One row past the page on each side shows whether anything was left out
+        notes = (Note.query.filter(Note.user_id == user_id, Note.change_seq > since)
+                 .order_by(Note.change_seq).limit(CHANGES_PAGE_SIZE + 1))
+        tombstones = (NoteTombstone.query.filter(NoteTombstone.user_id == user_id,
+                                                 NoteTombstone.change_seq > since)
+                      .order_by(NoteTombstone.change_seq).limit(CHANGES_PAGE_SIZE + 1))
+        backlog = sorted(
+            [note_event("update", n) for n in notes] +
+            [{"op": "delete", "id": t.note_id, "change_seq": t.change_seq} for t in tombstones],
+            key=lambda e: e["change_seq"]
+        )
+        truncated = len(backlog) > CHANGES_PAGE_SIZE
+        backlog = backlog[:CHANGES_PAGE_SIZE]
+
+    def stream():
+        try:
+            yield "retry: 3000\n\n"
+            for event in backlog:
+                yield _sse(event)
+            if truncated:
+                # More was missed than one replay holds; the client reloads via /changes
+                yield "event: resync\ndata: {}\n\n"
+            while True:
+                event = subscription.get(timeout=heartbeat)
+                if event is None:
+                    yield ": keepalive\n\n"
+                elif event["op"] == "resync":
+                    yield "event: resync\ndata: {}\n\n"
+                else:
+                    yield _sse(event)
+        finally:
+            subscription.close()
+
+    return Response(stream(), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
 @notes_bp.route("", methods=["POST"])
 @jwt_required()
+@cache.invalidates
 def create_note():
     user_id = int(get_jwt_identity())
     data = request.get_json() or {}
+    try:
+        _check_note_fields(data)
+    except ValueError as exc:
+        return jsonify({"msg": str(exc)}), 400
     note = Note(
         user_id=user_id,
         title=data.get("title", "Untitled"),
         content_md=data.get("content_md", ""),
         language=data.get("language", "plaintext"),
-        favorite=data.get("favorite", False)
+        favorite=data.get("favorite", False),
+        tags=Tag.resolve(data.get("tags", [])),
+        change_seq=User.next_change_seqs(user_id)[0]
     )
-    # handle tags
-    for name in data.get("tags", []):
-        tag = Tag.query.filter_by(name=name).first() or Tag(name=name)
-        note.tags.append(tag)
 
     db.session.add(note)
+    db.session.flush()
+    db.session.add(first_version(note))
+    event = note_event("create", note, EVENT_FIELDS)
     db.session.commit()
-    return jsonify({"id": note.id}), 201
+    events.publish(user_id, event)
+    # Read from the event, since commit expired the note
+    return jsonify({"id": event["id"]}), 201
+
+def _is_note_id(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+@notes_bp.route("/batch", methods=["POST"])
+@jwt_required()
+@cache.invalidates
+def batch_notes():
+    user_id = int(get_jwt_identity())
+    data = request.get_json() or {}
+    ops = data.get("ops")
+    if not isinstance(ops, list) or not all(isinstance(op, dict) for op in ops):
+        return jsonify({"msg": "ops must be a list of objects"}), 400
+    if len(ops) > MAX_BATCH_OPS:
+        return jsonify({"msg": f"At most {MAX_BATCH_OPS} operations per batch"}), 400
+    atomic = bool(data.get("atomic", False))
+
+    # Payloads are checked first, so only well-formed tag lists are resolved
+    invalid = {}
+    for index, op in enumerate(ops):
+        if op.get("op") in ("create", "update"):
+            try:
+                _check_note_fields(op.get("data") or {})
+            except ValueError as exc:
+                invalid[index] = str(exc)
+
+    # One query for ownership of every note touched, one for every tag named.
+    # Bodies are loaded only when an update writes a version; pins and moves skip them.
+    ids = {op.get("id") for op in ops if op.get("op") in ("update", "delete") and _is_note_id(op.get("id"))}
+    versioning = any(op.get("op") == "update" and index not in invalid
+                     and any(f in (op.get("data") or {}) for f in VERSIONED_FIELDS)
+                     for index, op in enumerate(ops))
+    options = Note.with_content() if versioning else ()
+    existing = ({n.id: n for n in Note.query.options(*options).filter(Note.id.in_(ids))}
+                if ids else {})
+    tags = {t.name: t for t in Tag.resolve(
+        name for index, op in enumerate(ops)
+        if op.get("op") in ("create", "update") and index not in invalid
+        for name in (op.get("data") or {}).get("tags", [])
+    )}
+
+    results, created, updated, deleted, failed = [], [], [], [], False
+    before, versioned, seen = {}, {}, set()
+    for index, op in enumerate(ops):
+        kind, fields = op.get("op"), op.get("data") or {}
+        if kind == "create" and index in invalid:
+            results.append({"op": kind, "status": 400, "msg": invalid[index]})
+            failed = True
+            continue
+        if kind == "create":
+            note = Note(
+                user_id=user_id,
+                title=fields.get("title", "Untitled"),
+                content_md=fields.get("content_md", ""),
+                language=fields.get("language", "plaintext"),
+                favorite=fields.get("favorite", False),
+                tags=[tags[name] for name in dict.fromkeys(fields.get("tags", []))]
+            )
+            db.session.add(note)
+            created.append(note)
+            results.append({"op": kind, "status": 201})
+            continue
+        if kind not in ("update", "delete"):
+            results.append({"op": kind, "status": 400, "msg": "Unknown operation"})
+            failed = True
+            continue
+
+        valid_id = _is_note_id(op.get("id"))
+        note = existing.get(op["id"]) if valid_id else None
+        if not valid_id:
+            result = {"status": 400, "msg": "id must be a note id"}
+        elif index in invalid:
+            result = {"status": 400, "msg": invalid[index]}
+        elif op["id"] in seen:
+            # A later op would act on a note an earlier one already changed or deleted
+            result = {"status": 400, "msg": "A note may appear in only one operation per batch"}
+        elif note is None:
+            result = {"status": 404, "msg": "Not found"}
+        elif note.user_id != user_id:
+            result = {"status": 403, "msg": "Forbidden"}
+        elif "revision" in op and op["revision"] != note.revision:
+            result = {"status": 412, "msg": "Precondition failed", "revision": note.revision}
+        elif kind == "delete":
+            db.session.delete(note)
+            existing.pop(note.id)
+            deleted.append(note.id)
+            result = {"status": 200}
+        else:
+            before.setdefault(note.id, snapshot(note))
+            for field in BATCH_UPDATE_FIELDS:
+                if field in fields:
+                    setattr(note, field, fields[field])
+            if "tags" in fields:
+                note.tags = [tags[name] for name in dict.fromkeys(fields["tags"])]
+            note.revision += 1
+            if any(field in fields for field in VERSIONED_FIELDS):
+                versioned[note.id] = note
+            updated.append(note)
+            result = {"status": 200, "revision": note.revision}
+        if valid_id:
+            seen.add(op["id"])
+        failed = failed or result["status"] >= 400
+        results.append({"op": kind, "id": op.get("id"), **result})
+
+    if atomic and failed:
+        db.session.rollback()
+        return jsonify({"msg": "Batch rejected", "results": results}), 409
+
+    # One sequence reservation covers every change in the batch
+    seqs = iter(User.next_change_seqs(user_id, len(created) + len(updated) + len(deleted)))
+    for note in created + updated:
+        note.change_seq = next(seqs)
+    tombstones = [NoteTombstone(user_id=user_id, note_id=i, change_seq=next(seqs)) for i in deleted]
+    db.session.add_all(tombstones)
+
+    # Snapshot each edited note once, in its final state, with a fixed number of queries
+    versioned = [n for n in versioned.values() if n.id in existing]
+    if versioned:
+        record_versions(versioned)
+    db.session.flush()
+    for note, result in zip(created, (r for r in results if r["status"] == 201)):
+        db.session.add(first_version(note))
+        result["id"] = note.id
+        result["revision"] = note.revision
+    pending = [note_event("create", n, EVENT_FIELDS) for n in created]
+    pending += [note_event("update", n, changed_fields(before[n.id], n)) for n in dict.fromkeys(updated)]
+    pending += [{"op": "delete", "id": t.note_id, "change_seq": t.change_seq} for t in tombstones]
+    db.session.commit()
+    for event in sorted(pending, key=lambda e: e["change_seq"]):
+        events.publish(user_id, event)
+    return jsonify({"results": results}), 200
+
+@notes_bp.route("/<int:note_id>", methods=["GET"])
+@jwt_required()
+@cache.cached
+def get_note(note_id):
+    user_id = int(get_jwt_identity())
+    note = Note.query.options(*Note.with_content()).get_or_404(note_id)
+    if note.user_id != user_id:
+        return jsonify({"msg": "Forbidden"}), 403
+    etag = note_etag(note)
+    if request.if_none_match.contains(etag):
+        response = make_response("", 304)
+    else:
+        response = make_response(jsonify(note_to_dict(note)), 200)
+    response.set_etag(etag)
+    return response
 
 @notes_bp.route("/<int:note_id>", methods=["PUT"])
 @jwt_required()
+@cache.invalidates
 def update_note(note_id):
     user_id = int(get_jwt_identity())
-    note = Note.query.get_or_404(note_id)
+    note = Note.query.options(*Note.with_content()).get_or_404(note_id)
     if note.user_id != user_id:
         return jsonify({"msg": "Forbidden"}), 403
+    if request.if_match and not request.if_match.contains(note_etag(note)):
+        return jsonify({"msg": "Precondition failed", "revision": note.revision}), 412
     data = request.get_json() or {}
+    try:
+        _check_note_fields(data)
+    except ValueError as exc:
+        return jsonify({"msg": str(exc)}), 400
+    before = snapshot(note)
     note.title      = data.get("title", note.title)
     note.content_md = data.get("content_md", note.content_md)
     note.language   = data.get("language", note.language)
     note.favorite   = data.get("favorite", note.favorite)
-    note.tags.clear()
-    for name in data.get("tags", []):
-        tag = Tag.query.filter_by(name=name).first() or Tag(name=name)
-        note.tags.append(tag)
+    # Assigning the collection lets the ORM write only the changed note_tags rows
+    note.tags = Tag.resolve(data.get("tags", []))
+    note.revision += 1
+    note.change_seq = User.next_change_seqs(user_id)[0]
+    # The note's one UPDATE is flushed by the version lookup
+    record_version(note)
+    event = note_event("update", note, changed_fields(before, note))
+    # Built before commit, which would expire the note and cost a reload
+    response = jsonify({"msg": "Updated", "revision": note.revision})
+    response.set_etag(note_etag(note))
+    db.session.commit()
+    events.publish(user_id, event)
+    return response, 200
+
+@notes_bp.route("/<int:note_id>", methods=["PATCH"])
+@jwt_required()
+@cache.invalidates
+def patch_note(note_id):
+    user_id = int(get_jwt_identity())
+    # Reserved before the note is read, keeping the user-then-notes lock order
+    seq = User.next_change_seqs(user_id)[0]
+    # Lock the row so two patches against the same base cannot both apply
+    note = (Note.query.options(*Note.with_content()).with_for_update()
+            .filter_by(id=note_id).first_or_404())
+    if note.user_id != user_id:
+        return jsonify({"msg": "Forbidden"}), 403
+    data = request.get_json() or {}
+    try:
+        _check_note_fields(data)
+    except ValueError as exc:
+        return jsonify({"msg": str(exc)}), 400
+    if data.get("base_revision") != note.revision:
+        return jsonify({"msg": "Conflict", "revision": note.revision}), 409
+    before = snapshot(note)
+    try:
+        ops = data.get("ops", [])
+        if ops:
+            note.content_md = _apply_text_ops(note.content_md, ops)
+    except (KeyError, TypeError, ValueError, UnicodeDecodeError):
+        return jsonify({"msg": "Invalid edit operations"}), 400
+    note.title    = data.get("title", note.title)
+    note.language = data.get("language", note.language)
+    note.favorite = data.get("favorite", note.favorite)
+    if "tags" in data:
+        note.tags = Tag.resolve(data["tags"])
+    note.revision += 1
+    note.change_seq = seq
+    record_version(note)
+    event = note_event("update", note, changed_fields(before, note))
+    # Built before commit, which would expire the note and cost a reload
+    response = jsonify({"msg": "Updated", "revision": note.revision})
+    response.set_etag(note_etag(note))
     db.session.commit()
-    return jsonify({"msg": "Updated"}), 200
+    events.publish(user_id, event)
+    return response, 200
 
 @notes_bp.route("/<int:note_id>", methods=["DELETE"])
 @jwt_required()
+@cache.invalidates
 def delete_note(note_id):
     user_id = int(get_jwt_identity())
     note = Note.query.get_or_404(note_id)
     if note.user_id != user_id:
         return jsonify({"msg": "Forbidden"}), 403
     db.session.delete(note)
+    seq = User.next_change_seqs(user_id)[0]
+    db.session.add(NoteTombstone(user_id=user_id, note_id=note_id, change_seq=seq))
     db.session.commit()
+    events.publish(user_id, {"op": "delete", "id": note_id, "change_seq": seq})
     return jsonify({"msg": "Deleted"}), 200
+
+# Card thumbnails. A client draws a card image for a note and uploads it under
+# the content_hash it drew from. The URL includes that hash, so a response never
+# changes and can be cached for good; an edit gives the note a new URL.
+
+THUMBNAIL_MAX_AGE = 365 * 24 * 3600
+MAX_THUMBNAIL_LOOKUP = 500
+
+def _thumbnail_type(data):
+    # Only already-compressed raster formats; anything else is rejected
+    if data.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if data.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    return None
+
+def _thumbnail_url(note_id, content_hash):
+    return f"/api/notes/{note_id}/thumbnail/{content_hash}"
+
+@notes_bp.route("/<int:note_id>/thumbnail/<content_hash>", methods=["PUT"])
+@jwt_required()
+def put_thumbnail(note_id, content_hash):
+    """Store the card image drawn from the note's content ``content_hash``; the body is the image."""
+    user_id = int(get_jwt_identity())
+    row = db.session.query(Note.user_id, Note.content_hash).filter(Note.id == note_id).first_or_404()
+    if row.user_id != user_id:
+        return jsonify({"msg": "Forbidden"}), 403
+    if content_hash != row.content_hash:
+        # Drawn from an older body; the client should redraw from the current one
+        return jsonify({"msg": "Stale thumbnail", "content_hash": row.content_hash}), 409
+    max_bytes = current_app.config["THUMBNAIL_MAX_BYTES"]
+    data = request.stream.read(max_bytes + 1)
+    if len(data) > max_bytes:
+        return jsonify({"msg": f"Thumbnails are limited to {max_bytes} bytes"}), 413
+    content_type = _thumbnail_type(data)
+    if content_type is None:
+        return jsonify({"msg": "Thumbnails must be PNG, JPEG or WebP images"}), 415
+    key, size = blobs.save(io.BytesIO(data), max_bytes)
+
+    # Replaces any earlier thumbnail; its blob is removed by ``flask attachments purge``
+    thumbnail = db.session.get(NoteThumbnail, note_id) or NoteThumbnail(note_id=note_id)
+    thumbnail.content_hash = content_hash
+    thumbnail.blob_hash = key
+    thumbnail.content_type = content_type
+    thumbnail.size = size
+    thumbnail.created_at = datetime.utcnow()
+    db.session.add(thumbnail)
+    db.session.commit()
+    return jsonify({"id": note_id, "content_hash": content_hash, "size": size,
+                    "url": _thumbnail_url(note_id, content_hash)}), 201
+
+@notes_bp.route("/<int:note_id>/thumbnail/<content_hash>", methods=["GET"])
+@jwt_required(locations=["headers", "query_string"])
+def get_thumbnail(note_id, content_hash):
+    # <img> tags cannot set headers, so the token may also arrive as ?jwt=
+    user_id = int(get_jwt_identity())
+    row = (db.session.query(NoteThumbnail, Note.user_id)
+           .join(Note, Note.id == NoteThumbnail.note_id)
+           .filter(NoteThumbnail.note_id == note_id, NoteThumbnail.content_hash == content_hash)
+           .first_or_404())
+    thumbnail, owner = row
+    if owner != user_id:
+        return jsonify({"msg": "Forbidden"}), 403
+    if not blobs.exists(thumbnail.blob_hash):
+        return jsonify({"msg": "Thumbnail content is missing"}), 404
+    response = send_file(blobs.path(thumbnail.blob_hash), mimetype=thumbnail.content_type,
+                         conditional=True, etag=thumbnail.blob_hash, max_age=THUMBNAIL_MAX_AGE)
+    response.cache_control.private = True
+    response.cache_control.public = False
+    response.cache_control.immutable = True
+    response.headers["X-Content-Type-Options"] = "nosniff"
+    return response
+
+@notes_bp.route("/thumbnails", methods=["POST"])
+@jwt_required()
+def thumbnail_status():
+    """Which of the given notes have a thumbnail for their current content.
+
+    Takes ``{"ids": [...]}`` and returns one entry per owned note with its
+    content_hash and the thumbnail URL, or ``"url": null`` when the client
+    should draw and upload one. Unknown and other users' ids are left out.
+    """
+    user_id = int(get_jwt_identity())
+    ids = (request.get_json(silent=True) or {}).get("ids")
+    if not isinstance(ids, list) or not all(isinstance(i, int) and not isinstance(i, bool) for i in ids):
+        return jsonify({"msg": "ids must be a list of note ids"}), 400
+    if len(ids) > MAX_THUMBNAIL_LOOKUP:
+        return jsonify({"msg": f"At most {MAX_THUMBNAIL_LOOKUP} ids per request"}), 400
+    rows = db.session.execute(
+        select(Note.id, Note.content_hash, NoteThumbnail.content_hash)
+        .outerjoin(NoteThumbnail, NoteThumbnail.note_id == Note.id)
+        .where(Note.user_id == user_id, Note.id.in_(ids))
+        .order_by(Note.id)
+    )
+    return jsonify({"thumbnails": [
+        {"id": note_id, "content_hash": current,
+         "url": _thumbnail_url(note_id, current) if drawn == current else None}
+        for note_id, current, drawn in rows
+    ]}), 200
@@ -0,0 +1,51 @@
+# server/routes/rendering.py
+
+from flask import Blueprint, Response, jsonify, make_response, request
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from sqlalchemy.orm import lazyload
+from server.extensions import db, renderer
+from server.models.note_model import Note
+from server.rendering import highlight_css, render_key
+
+render_bp = Blueprint("rendering", __name__, url_prefix="/api/notes")
+
+def _note_body(note_id):
+    note = db.session.get(Note, note_id, options=[*Note.with_content(), lazyload(Note.tags)])
+    return note.content_md
+
+@render_bp.route("/<int:note_id>/html", methods=["GET"])
+@jwt_required()
+def note_html(note_id):
+    """A note rendered to sanitized HTML, from cache when its content was rendered before."""
+    user_id = int(get_jwt_identity())
+    # Only the columns the cache key needs; the body is read on a miss alone
+    row = (db.session.query(Note.user_id, Note.language, Note.content_hash)
+           .filter(Note.id == note_id).first_or_404())
+    if row.user_id != user_id:
+        return jsonify({"msg": "Forbidden"}), 403
+    key = render_key(row.content_hash, row.language)
+    # Same content and renderer version give the same HTML, whatever the
+    # revision, so the body carries nothing else a 304 could leave stale
+    etag = key.replace(":", "-")
+    if request.if_none_match.contains(etag):
+        response = make_response("", 304)
+    else:
+        html, hit = renderer.render(key, lambda: _note_body(note_id), row.language)
+        response = make_response(jsonify({
+            "id": note_id,
+            "content_hash": row.content_hash,
+            "html": html
+        }), 200)
+        response.headers["X-Render-Cache"] = "hit" if hit else "miss"
+    response.set_etag(etag)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+@render_bp.route("/highlight.css", methods=["GET"])
+def highlight_stylesheet():
+    # Styles for the classes code blocks are rendered with
+    response = Response(highlight_css(), mimetype="text/css")
+    response.cache_control.public = True
+    response.cache_control.max_age = 24 * 3600
+    return response
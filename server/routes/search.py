@@ -0,0 +1,80 @@
+# server/routes/search.py
+
+import html
+from sqlalchemy import text
+from server.extensions import db
+
+# Private-use sentinels mark matches inside the database; the surrounding text
+# is HTML-escaped afterwards and the sentinels become <mark> tags.
+_START, _STOP = "\ue000", "\ue001"
+
+_PG_SEARCH = text("""
+    SELECT hits.id, hits.rank,
+           ts_headline('english', n.title, hits.q,
+                       'HighlightAll=true,StartSel=' || :start || ',StopSel=' || :stop) AS title_hl,
+           ts_headline('english', left(n.content_md, 100000), hits.q,
+                       'MaxFragments=2,MaxWords=20,MinWords=8,StartSel=' || :start || ',StopSel=' || :stop) AS snippet
+    FROM (
+        SELECT notes.id, ts_rank(notes.search_vector, q) AS rank, q
+        FROM notes, websearch_to_tsquery('english', :query) AS q
+        WHERE notes.user_id = :user_id AND notes.search_vector @@ q
+        ORDER BY rank DESC, notes.id DESC
+        LIMIT :limit OFFSET :offset
+    ) AS hits
+    JOIN notes n ON n.id = hits.id
+    ORDER BY hits.rank DESC, hits.id DESC
+""")
+
+_SQLITE_SEARCH = text("""
+    SELECT notes.id, -bm25(notes_fts, 10.0, 1.0) AS rank,
+           highlight(notes_fts, 0, :start, :stop) AS title_hl,
+           snippet(notes_fts, 1, :start, :stop, '…', 16) AS snippet
+    FROM notes_fts JOIN notes ON notes.id = notes_fts.rowid
+    WHERE notes_fts MATCH :query AND notes.user_id = :user_id
+    ORDER BY rank DESC, notes.id DESC
+    LIMIT :limit OFFSET :offset
+""")
+
+def _fts5_query(query):
+    # Quote every term so user input is matched literally rather than parsed
+    # as FTS5 syntax; the last term also matches as a prefix.
+    terms = ['"%s"' % t.replace('"', '""') for t in query.split()]
+    if terms:
+        terms[-1] += "*"
+    return " ".join(terms)
+
+def _to_html(fragment):
+    escaped = html.escape(fragment or "")
+    return escaped.replace(_START, "<mark>").replace(_STOP, "</mark>")
+
+def _to_plain(fragment):
+    return (fragment or "").replace(_START, "").replace(_STOP, "")
+
+def search_notes(user_id, query, limit, offset):
+    """Return ranked hits as dicts with id, rank, title_html, snippet_html and snippet.
+
+    Only the inline head of a large body is indexed (see INLINE_BODY_BYTES).
+    """
+    dialect = db.session.get_bind().dialect.name
+    if dialect == "postgresql":
+        statement, query_text = _PG_SEARCH, query
+    elif dialect == "sqlite":
+        statement, query_text = _SQLITE_SEARCH, _fts5_query(query)
+    else:
+        raise NotImplementedError(f"Full-text search is not available on {dialect}")
+
+    rows = db.session.execute(statement, {
+        "query": query_text,
+        "user_id": user_id,
+        "limit": limit,
+        "offset": offset,
+        "start": _START,
+        "stop": _STOP,
+    })
+    return [{
+        "id": row.id,
+        "rank": float(row.rank),
+        "title_html": _to_html(row.title_hl),
+        "snippet_html": _to_html(row.snippet),
+        "snippet": _to_plain(row.snippet),
+    } for row in rows]
@@ -0,0 +1,36 @@
+# server/routes/serializers.py
+
+# Shared JSON shape for every endpoint that returns notes. Note.tags is
+# mapped with lazy="selectin", so serializing a page of notes costs one
+# extra batched SELECT for all their tags rather than one per note.
+# Note bodies are deferred: full responses must query with
+# Note.with_content(); summaries never touch them.
+
+def note_to_dict(n, preview=None, summary=False):
+    data = {
+        "id": n.id,
+        "title": n.title,
+        "language": n.language,
+        "favorite": n.favorite,
+        "revision": n.revision,
+        "change_seq": n.change_seq,
+        "word_count": n.word_count,
+        "byte_size": n.byte_size,
+        "content_hash": n.content_hash,
+        "tags": [t.name for t in n.tags],
+        "created_at": n.created_at.isoformat(),
+        "updated_at": n.updated_at.isoformat(),
+        "last_viewed_at": n.last_viewed_at.isoformat() if n.last_viewed_at else None
+    }
+    if preview is not None:
+        data["preview"] = preview
+    elif summary:
+        data["preview"] = n.preview
+    else:
+        data["content_md"] = n.content_md
+    return data
+
+def note_etag(n):
+    # SQLite hands a deleted note's id to the next note, so id and revision
+    # alone can repeat; created_at tells the two notes apart
+    return f"{n.id}-{n.revision}-{n.created_at:%Y%m%d%H%M%S%f}"
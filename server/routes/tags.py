@@ -0,0 +1,26 @@
+# server/routes/tags.py
+
+from flask import Blueprint, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from sqlalchemy import func
+from server.extensions import db, cache
+from server.models.note_model import Note, Tag, note_tags
+
+tags_bp = Blueprint("tags", __name__, url_prefix="/api/tags")
+
+@tags_bp.route("", methods=["GET"])
+@jwt_required()
+@cache.cached
+def list_tags():
+    """Every tag on the user's notes with how many notes carry it, most used first."""
+    user_id = int(get_jwt_identity())
+    count = func.count(note_tags.c.note_id)
+    rows = db.session.execute(
+        db.select(Tag.name, count)
+        .join(note_tags, note_tags.c.tag_id == Tag.id)
+        .join(Note, Note.id == note_tags.c.note_id)
+        .where(Note.user_id == user_id)
+        .group_by(Tag.id, Tag.name)
+        .order_by(count.desc(), Tag.name)
+    )
+    return jsonify([{"name": name, "count": n} for name, n in rows]), 200
@@ -0,0 +1,137 @@
+# server/routes/transfer.py
+
+import gzip
+import json
+import zlib
+from datetime import datetime
+from flask import Blueprint, Response, request, jsonify, stream_with_context
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from sqlalchemy import select
+from server.extensions import db, cache, events
+from server.models.note_model import Note, Tag, User
+from server.routes.serializers import note_to_dict
+from server.versioning import first_version
+
+transfer_bp = Blueprint("transfer", __name__, url_prefix="/api/notes")
+
+# Rows fetched per round trip from the server-side cursor during export
+EXPORT_FETCH_SIZE = 500
+# Notes written per transaction during import
+IMPORT_BATCH_SIZE = 500
+MAX_REPORTED_ERRORS = 100
+# Text fields of an imported line and the value used when one is missing
+IMPORT_TEXT_FIELDS = {"title": "Untitled", "content_md": "", "language": "plaintext"}
+
+def _export_lines(user_id):
+    query = (select(Note)
+             .options(*Note.with_content())
+             .where(Note.user_id == user_id)
+             .order_by(Note.id)
+             .execution_options(yield_per=EXPORT_FETCH_SIZE))
+    for note in db.session.scalars(query):
+        yield json.dumps(note_to_dict(note), ensure_ascii=False).encode("utf-8") + b"\n"
+
+def _gzip_chunks(lines):
+    compressor = zlib.compressobj(wbits=31)  # gzip container
+    for line in lines:
+        chunk = compressor.compress(line)
+        if chunk:
+            yield chunk
+    yield compressor.flush()
+
+@transfer_bp.route("/export", methods=["GET"])
+@jwt_required()
+def export_notes():
+    user_id = int(get_jwt_identity())
+    lines = _export_lines(user_id)
+    if request.args.get("gzip") in ("1", "true"):
+        body, mimetype, filename = _gzip_chunks(lines), "application/gzip", "notes.ndjson.gz"
+    else:
+        body, mimetype, filename = lines, "application/x-ndjson", "notes.ndjson"
+    return Response(
+        stream_with_context(body),
+        mimetype=mimetype,
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
+
+def _parse_timestamp(value):
+    try:
+        return datetime.fromisoformat(value) if value else None
+    except (TypeError, ValueError):
+        return None
+
+def _note_from_record(user_id, record):
+    if not isinstance(record, dict):
+        raise ValueError("Each line must be a JSON object")
+    tags = record.get("tags", [])
+    if not isinstance(tags, list) or not all(isinstance(t, str) for t in tags):
+        raise ValueError("tags must be a list of strings")
+    # Checked up front: a bad value would otherwise fail the whole batch's commit
+    fields = {}
+    for name, default in IMPORT_TEXT_FIELDS.items():
+        fields[name] = record.get(name, default)
+        if not isinstance(fields[name], str):
+            raise ValueError(f"{name} must be a string")
+    if len(fields["language"]) > Note.language.type.length:
+        raise ValueError("language is too long")
+    favorite = record.get("favorite", False)
+    if not isinstance(favorite, bool):
+        raise ValueError("favorite must be true or false")
+    created_at = _parse_timestamp(record.get("created_at")) or datetime.utcnow()
+    return Note(
+        user_id=user_id,
+        **fields,
+        favorite=favorite,
+        created_at=created_at,
+        updated_at=_parse_timestamp(record.get("updated_at")) or created_at
+    ), tags
+
+def _flush_batch(user_id, batch):
+    # One tag lookup for the whole batch instead of one per note
+    tags = {t.name: t for t in Tag.resolve(name for _, names in batch for name in names)}
+    notes = []
+    for (note, names), seq in zip(batch, User.next_change_seqs(user_id, len(batch))):
+        note.tags = [tags[name] for name in dict.fromkeys(names)]
+        note.change_seq = seq
+        notes.append(note)
+    db.session.add_all(notes)
+    db.session.flush()
+    db.session.add_all(first_version(note) for note in notes)
+    db.session.commit()
+    # Drop the committed objects so memory stays flat across batches
+    db.session.expunge_all()
+    return len(notes)
+
+@transfer_bp.route("/import", methods=["POST"])
+@jwt_required()
+@cache.invalidates
+def import_notes():
+    user_id = int(get_jwt_identity())
+    stream = request.stream
+    if request.mimetype == "application/gzip" or request.headers.get("Content-Encoding") == "gzip":
+        stream = gzip.GzipFile(fileobj=stream)
+
+    imported, errors, batch = 0, [], []
+    try:
+        for line_no, raw in enumerate(stream, start=1):
+            if not raw.strip():
+                continue
+            try:
+                batch.append(_note_from_record(user_id, json.loads(raw)))
+            except ValueError as exc:
+                if len(errors) < MAX_REPORTED_ERRORS:
+                    errors.append({"line": line_no, "msg": str(exc)})
+                continue
+            if len(batch) >= IMPORT_BATCH_SIZE:
+                imported += _flush_batch(user_id, batch)
+                batch = []
+        if batch:
+            imported += _flush_batch(user_id, batch)
+    except (OSError, EOFError):
+        db.session.rollback()
+        return jsonify({"msg": "Invalid gzip stream", "imported": imported}), 400
+
+    if imported:
+        # Too many notes for per-note events; tell live clients to resync instead
+        events.publish(user_id, {"op": "resync"})
+    return jsonify({"imported": imported, "errors": errors}), 200
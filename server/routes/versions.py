@@ -0,0 +1,89 @@
+# server/routes/versions.py
+
+import click
+from flask import Blueprint, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from sqlalchemy.orm import defer
+from server.events import changed_fields, note_event, snapshot
+from server.extensions import db, cache, events
+from server.models.note_model import Note, NoteVersion, User
+from server.routes.serializers import note_etag
+from server.versioning import record_version, version_content, compact_versions
+
+versions_bp = Blueprint("versions", __name__, url_prefix="/api/notes")
+
+def _version_to_dict(v):
+    return {
+        "version_no": v.version_no,
+        "title": v.title,
+        "language": v.language,
+        "created_at": v.created_at.isoformat()
+    }
+
+def _owned_version(note_id, version_no, user_id, *options):
+    note = Note.query.options(*options).get_or_404(note_id)
+    if note.user_id != user_id:
+        return note, None
+    version = NoteVersion.query.filter_by(note_id=note_id, version_no=version_no).first_or_404()
+    return note, version
+
+@versions_bp.route("/<int:note_id>/versions", methods=["GET"])
+@jwt_required()
+def list_versions(note_id):
+    user_id = int(get_jwt_identity())
+    note = Note.query.get_or_404(note_id)
+    if note.user_id != user_id:
+        return jsonify({"msg": "Forbidden"}), 403
+    versions = (note.versions.options(defer(NoteVersion.payload))
+                .order_by(NoteVersion.version_no.desc())
+                .all())
+    return jsonify([_version_to_dict(v) for v in versions]), 200
+
+@versions_bp.route("/<int:note_id>/versions/<int:version_no>", methods=["GET"])
+@jwt_required()
+def get_version(note_id, version_no):
+    user_id = int(get_jwt_identity())
+    note, version = _owned_version(note_id, version_no, user_id)
+    if version is None:
+        return jsonify({"msg": "Forbidden"}), 403
+    data = _version_to_dict(version)
+    data["content_md"] = version_content(version)
+    return jsonify(data), 200
+
+@versions_bp.route("/<int:note_id>/versions/<int:version_no>/restore", methods=["POST"])
+@jwt_required()
+@cache.invalidates
+def restore_version(note_id, version_no):
+    user_id = int(get_jwt_identity())
+    note, version = _owned_version(note_id, version_no, user_id, *Note.with_content())
+    if version is None:
+        return jsonify({"msg": "Forbidden"}), 403
+    before = snapshot(note)
+    # Rebuilt before any field changes, so its queries flush nothing
+    content = version_content(version)
+    note.title      = version.title
+    note.language   = version.language
+    note.content_md = content
+    note.revision  += 1
+    note.change_seq = User.next_change_seqs(user_id)[0]
+    # Never fold a restore into the newest version; that would lose the pre-restore text
+    record_version(note, coalesce=False)
+    event = note_event("update", note, changed_fields(before, note))
+    # Built before commit, which would expire the note and cost a reload
+    response = jsonify({"msg": "Restored", "revision": note.revision})
+    response.set_etag(note_etag(note))
+    db.session.commit()
+    events.publish(user_id, event)
+    return response, 200
+
+@versions_bp.cli.command("compact")
+@click.option("--keep-recent", type=int, default=None, help="Newest versions always kept.")
+@click.option("--spacing", type=int, default=None, help="Seconds between kept older versions.")
+def compact_command(keep_recent, spacing):
+    """Thin out old note versions and re-encode their diff chains."""
+    removed = 0
+    note_ids = [i for (i,) in db.session.query(NoteVersion.note_id).distinct()]
+    for note_id in note_ids:
+        removed += compact_versions(note_id, keep_recent, spacing)
+        db.session.commit()
+    click.echo(f"Removed {removed} versions across {len(note_ids)} notes")
@@ -0,0 +1,241 @@
+# server/versioning.py
+
+import difflib
+import json
+import zlib
+from datetime import datetime, timedelta, timezone
+from flask import current_app
+from sqlalchemy import and_, delete, func, or_
+from sqlalchemy.orm import aliased
+from server.extensions import db
+from server.models.note_model import NoteVersion
+
+# Defaults for the NOTE_VERSION_* settings in app.config
+DEFAULT_KEYFRAME_INTERVAL = 20   # longest run of diffs applied to rebuild a version
+DEFAULT_RETENTION = 500          # versions kept per note; older ones are pruned
+DEFAULT_COALESCE_SECONDS = 0     # saves this close to the newest version replace it
+DEFAULT_COMPACT_KEEP_RECENT = 50
+DEFAULT_COMPACT_SPACING = 3600   # compaction keeps one older version per this many seconds
+
+def _setting(name, default):
+    return current_app.config.get(name, default)
+
+def _pack_text(text):
+    return zlib.compress(text.encode("utf-8"))
+
+def _unpack_text(payload):
+    return zlib.decompress(payload).decode("utf-8")
+
+def _pack_delta(newer, older):
+    """Compressed ops that rebuild ``older`` from ``newer``.
+
+    ``[i, j]`` copies lines i..j of ``newer``; a string is inserted verbatim.
+    """
+    a = newer.splitlines(keepends=True)
+    b = older.splitlines(keepends=True)
+    ops = []
+    for tag, i1, i2, j1, j2 in difflib.SequenceMatcher(None, a, b, autojunk=False).get_opcodes():
+        if tag == "equal":
+            ops.append([i1, i2])
+        elif j2 > j1:
+            ops.append("".join(b[j1:j2]))
+    return zlib.compress(json.dumps(ops, separators=(",", ":")).encode("utf-8"))
+
+def _apply_delta(newer, payload):
+    lines = newer.splitlines(keepends=True)
+    ops = json.loads(zlib.decompress(payload))
+    return "".join(op if isinstance(op, str) else "".join(lines[op[0]:op[1]]) for op in ops)
+
+def _as_utc(dt):
+    # SQLite hands back naive UTC values, Postgres aware ones
+    return dt.astimezone(timezone.utc).replace(tzinfo=None) if dt.tzinfo else dt
+
+def _history(note_ids):
+    """Each note's newest version row, its row count, and the length of the
+    run of diffs directly below it, in three statements whatever the count."""
+    V = NoteVersion
+    heads = (db.select(V.note_id, func.max(V.version_no).label("head_no"),
+                       func.count().label("total"))
+             .where(V.note_id.in_(note_ids))
+             .group_by(V.note_id)
+             .subquery())
+    rows = db.session.execute(
+        db.select(V, heads.c.total)
+        .join(heads, and_(V.note_id == heads.c.note_id, V.version_no == heads.c.head_no))
+    ).all()
+    keyframes = (db.select(V.note_id, func.max(V.version_no).label("keyframe_no"))
+                 .join(heads, V.note_id == heads.c.note_id)
+                 .where(V.is_keyframe, V.version_no < heads.c.head_no)
+                 .group_by(V.note_id)
+                 .subquery())
+    runs = dict(db.session.execute(
+        db.select(V.note_id, func.count())
+        .join(heads, V.note_id == heads.c.note_id)
+        .outerjoin(keyframes, V.note_id == keyframes.c.note_id)
+        .where(V.version_no < heads.c.head_no,
+               V.version_no > func.coalesce(keyframes.c.keyframe_no, -1))
+        .group_by(V.note_id)
+    ).all()) if rows else {}
+    return {head.note_id: (head, total, runs.get(head.note_id, 0)) for head, total in rows}
+
+def _rows_below(heads):
+    """The row directly below each of ``heads``, keyed by note id, in one query."""
+    V = NoteVersion
+    below = (db.select(V.note_id, func.max(V.version_no).label("below_no"))
+             .where(or_(*(and_(V.note_id == h.note_id, V.version_no < h.version_no) for h in heads)))
+             .group_by(V.note_id)
+             .subquery())
+    rows = db.session.scalars(
+        db.select(V).join(below, and_(V.note_id == below.c.note_id, V.version_no == below.c.below_no)))
+    return {row.note_id: row for row in rows}
+
+def _prune(note_ids, retention):
+    # Reverse diffs point at newer rows, so dropping the oldest never breaks a chain
+    newer = aliased(NoteVersion)
+    newer_count = (db.select(func.count())
+                   .where(newer.note_id == NoteVersion.note_id, newer.version_no > NoteVersion.version_no)
+                   .scalar_subquery())
+    db.session.execute(
+        delete(NoteVersion)
+        .where(NoteVersion.note_id.in_(note_ids), newer_count >= retention)
+        .execution_options(synchronize_session=False))
+
+def first_version(note):
+    """Build the initial version of a brand-new note without querying for a head."""
+    return NoteVersion(
+        note_id=note.id,
+        version_no=note.revision,
+        title=note.title,
+        language=note.language,
+        is_keyframe=True,
+        payload=_pack_text(note.content_md),
+        created_at=datetime.utcnow()
+    )
+
+def record_version(note, coalesce=True):
+    """Snapshot ``note`` as its newest version. Call once its fields are final."""
+    record_versions([note], coalesce)
+
+def record_versions(notes, coalesce=True):
+    """Snapshot each of ``notes`` as its newest version, in a fixed number of
+    statements however many notes there are."""
+    now = datetime.utcnow()
+    history = _history([n.id for n in notes])
+    window = _setting("NOTE_VERSION_COALESCE_SECONDS", DEFAULT_COALESCE_SECONDS)
+    interval = _setting("NOTE_VERSION_KEYFRAME_INTERVAL", DEFAULT_KEYFRAME_INTERVAL)
+    retention = _setting("NOTE_VERSION_RETENTION", DEFAULT_RETENTION)
+
+    coalesced, added, over_retention = [], [], []
+    for note in notes:
+        if note.id not in history:
+            added.append(note)
+            continue
+        head, total, run = history[note.id]
+        head_content = _unpack_text(head.payload)
+        if (head.title, head.language, head_content) == (note.title, note.language, note.content_md):
+            continue
+        if coalesce and window and _as_utc(head.created_at) > now - timedelta(seconds=window):
+            # Fold a burst of autosaves into the newest version
+            coalesced.append((note, head, head_content))
+        else:
+            # Demote the head to a diff unless that would make a chain longer than interval
+            if interval > 1 and run < interval - 1:
+                head.is_keyframe = False
+                head.payload = _pack_delta(note.content_md, head_content)
+            added.append(note)
+            if total + 1 > retention:
+                over_retention.append(note.id)
+
+    if coalesced:
+        # The row below each head may be a diff against the old head text, so
+        # rebase it onto the text that replaces it
+        below = _rows_below([head for _, head, _ in coalesced])
+        for note, head, head_content in coalesced:
+            row = below.get(note.id)
+            if row is not None and not row.is_keyframe:
+                row.payload = _pack_delta(note.content_md, _apply_delta(head_content, row.payload))
+            head.version_no = note.revision
+            head.title = note.title
+            head.language = note.language
+            head.payload = _pack_text(note.content_md)
+
+    db.session.flush()
+    if added:
+        # A core executemany, so new rows cost one statement rather than one each
+        db.session.execute(NoteVersion.__table__.insert(), [{
+            "note_id": note.id,
+            "version_no": note.revision,
+            "title": note.title,
+            "language": note.language,
+            "is_keyframe": True,
+            "payload": _pack_text(note.content_md),
+            "created_at": now
+        } for note in added])
+    if over_retention:
+        _prune(over_retention, retention)
+
+def version_content(version):
+    """Rebuild the full text of ``version`` from the nearest newer keyframe."""
+    if version.is_keyframe:
+        return _unpack_text(version.payload)
+    keyframe_no = (db.session.query(func.min(NoteVersion.version_no))
+                   .filter(NoteVersion.note_id == version.note_id,
+                           NoteVersion.version_no > version.version_no,
+                           NoteVersion.is_keyframe)
+                   .scalar())
+    chain = (NoteVersion.query
+             .filter(NoteVersion.note_id == version.note_id,
+                     NoteVersion.version_no.between(version.version_no, keyframe_no))
+             .order_by(NoteVersion.version_no.desc())
+             .all())
+    content = _unpack_text(chain[0].payload)
+    for row in chain[1:]:
+        content = _apply_delta(content, row.payload)
+    return content
+
+def compact_versions(note_id, keep_recent=None, spacing=None):
+    """Thin out old versions of one note and re-encode the surviving chain.
+
+    The newest ``keep_recent`` versions are kept as-is; older ones are kept
+    only when at least ``spacing`` seconds apart. Returns the number removed.
+    """
+    keep_recent = keep_recent if keep_recent is not None else _setting(
+        "NOTE_VERSION_COMPACT_KEEP_RECENT", DEFAULT_COMPACT_KEEP_RECENT)
+    spacing = spacing if spacing is not None else _setting(
+        "NOTE_VERSION_COMPACT_SPACING", DEFAULT_COMPACT_SPACING)
+    interval = _setting("NOTE_VERSION_KEYFRAME_INTERVAL", DEFAULT_KEYFRAME_INTERVAL)
+
+    rows = (NoteVersion.query.filter_by(note_id=note_id)
+            .order_by(NoteVersion.version_no.desc())
+            .all())
+    if len(rows) <= keep_recent:
+        return 0
+
+    # Walk newest to oldest once, rebuilding every version's text
+    contents = []
+    for row in rows:
+        if row.is_keyframe:
+            contents.append(_unpack_text(row.payload))
+        else:
+            contents.append(_apply_delta(contents[-1], row.payload))
+
+    kept, removed = [], 0
+    last_kept_at = None
+    for index, (row, content) in enumerate(zip(rows, contents)):
+        created = _as_utc(row.created_at)
+        if index < max(keep_recent, 1) or last_kept_at - created >= timedelta(seconds=spacing):
+            kept.append((row, content))
+            last_kept_at = created
+        else:
+            db.session.delete(row)
+            removed += 1
+
+    # Re-encode newest first so every diff targets the next surviving row
+    for index, (row, content) in enumerate(kept):
+        if index % max(interval, 1) == 0:
+            row.is_keyframe = True
+            row.payload = _pack_text(content)
+        else:
+            row.is_keyframe = False
+            row.payload = _pack_delta(kept[index - 1][1], content)
+    return removed
@@ -0,0 +1,46 @@
+# tests/test_app.py
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from server.app import create_app
+
+def test_create_app_does_not_touch_database(tmp_path):
+    """Test that building the app neither connects nor creates tables."""
+    path = tmp_path / 'startup.db'
+    connects = []
+    listener = lambda *args: connects.append(args)
+    event.listen(Engine, 'connect', listener)
+    try:
+        app = create_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{path}'})
+    finally:
+        event.remove(Engine, 'connect', listener)
+
+    assert connects == []
+    assert not path.exists()
+    assert app.config['SQLALCHEMY_DATABASE_URI'] == f'sqlite:///{path}'
+
+def test_init_db_command_creates_tables(tmp_path):
+    """Test that tables are created on demand by the init-db command."""
+    path = tmp_path / 'init.db'
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{path}'})
+
+    result = app.test_cli_runner().invoke(args=['init-db'])
+
+    assert result.exit_code == 0
+    assert path.exists()
+
+def test_second_app_does_not_reconfigure_the_first(app, tmp_path):
+    """Test that extension settings stay with the app that configured them."""
+    from server.extensions import cache, events, hasher, renderer
+    rounds, queue_size, max_bytes, backend = (hasher.rounds, events.queue_size,
+                                              renderer.max_bytes, cache.backend)
+
+    other = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'other.db'}",
+                        'BCRYPT_LOG_ROUNDS': 5, 'NOTE_EVENTS_QUEUE_SIZE': 3,
+                        'RENDER_CACHE_MAX_BYTES': 7})
+
+    assert (hasher.rounds, events.queue_size, renderer.max_bytes) == (rounds, queue_size, max_bytes)
+    assert cache.backend is backend
+    with other.app_context():
+        assert (hasher.rounds, events.queue_size, renderer.max_bytes) == (5, 3, 7)
+        assert cache.backend is not backend
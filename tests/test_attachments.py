@@ -0,0 +1,140 @@
+# tests/test_attachments.py
+
+import hashlib
+import os
+import pytest
+from server.extensions import blobs
+
+pytestmark = pytest.mark.query_budget
+
+PNG = b'\x89PNG\r\n\x1a\n' + bytes(range(256)) * 40
+
+def _note(client, headers):
+    return client.post('/api/notes', json={'title': 'With files'}, headers=headers).get_json()['id']
+
+def _upload(client, headers, note_id, data, filename='image.png', content_type='image/png'):
+    return client.post(f'/api/notes/{note_id}/attachments?filename={filename}', data=data,
+                       headers={'Authorization': headers['Authorization'], 'Content-Type': content_type})
+
+def test_upload_and_download_attachment(client, auth_headers):
+    """Test that an uploaded file is stored by hash and downloaded unchanged."""
+    note_id = _note(client, auth_headers)
+
+    response = _upload(client, auth_headers, note_id, PNG)
+
+    assert response.status_code == 201
+    data = response.get_json()
+    assert data['hash'] == hashlib.sha256(PNG).hexdigest()
+    assert data['size'] == len(PNG)
+    assert data['content_type'] == 'image/png'
+    with client.application.app_context():
+        assert os.path.exists(blobs.path(data['hash']))
+
+    download = client.get(data['url'], headers=auth_headers)
+    assert download.status_code == 200
+    assert download.data == PNG
+    assert download.headers['Content-Type'] == 'image/png'
+    assert 'immutable' in download.headers['Cache-Control']
+    assert 'private' in download.headers['Cache-Control']
+    assert download.headers['X-Content-Type-Options'] == 'nosniff'
+
+    listed = client.get(f'/api/notes/{note_id}/attachments', headers=auth_headers).get_json()
+    assert [a['id'] for a in listed] == [data['id']]
+
+def test_download_supports_ranges_and_etags(client, auth_headers):
+    """Test partial content and conditional requests."""
+    note_id = _note(client, auth_headers)
+    data = _upload(client, auth_headers, note_id, PNG).get_json()
+
+    partial = client.get(data['url'], headers={**auth_headers, 'Range': 'bytes=8-23'})
+    assert partial.status_code == 206
+    assert partial.data == PNG[8:24]
+    assert partial.headers['Content-Range'] == f'bytes 8-23/{len(PNG)}'
+
+    tail = client.get(data['url'], headers={**auth_headers, 'Range': 'bytes=-10'})
+    assert tail.data == PNG[-10:]
+
+    cached = client.get(data['url'], headers={**auth_headers, 'If-None-Match': f'"{data["hash"]}"'})
+    assert cached.status_code == 304
+
+    token = auth_headers['Authorization'].split()[1]
+    assert client.get(f"{data['url']}?jwt={token}").status_code == 200
+
+def test_identical_uploads_share_one_blob(client, auth_headers):
+    """Test that the same content is stored once, even across notes."""
+    first = _upload(client, auth_headers, _note(client, auth_headers), PNG).get_json()
+    second = _upload(client, auth_headers, _note(client, auth_headers), PNG, 'copy.png').get_json()
+
+    assert first['hash'] == second['hash']
+    assert first['id'] != second['id']
+    with client.application.app_context():
+        stored = [k for k in blobs.keys() if k == first['hash']]
+    assert len(stored) == 1
+
+def test_reupload_refreshes_blob_age(client, auth_headers):
+    """Test that storing existing content again resets its age for purge grace periods."""
+    key = _upload(client, auth_headers, _note(client, auth_headers), PNG).get_json()['hash']
+    with client.application.app_context():
+        path = blobs.path(key)
+        os.utime(path, (0, 0))
+        assert key in list(blobs.keys(older_than=3600))
+
+    _upload(client, auth_headers, _note(client, auth_headers), PNG, 'again.png')
+
+    with client.application.app_context():
+        assert key not in list(blobs.keys(older_than=3600))
+
+def test_unsafe_types_download_as_files(client, auth_headers):
+    """Test that HTML is never rendered inline from the app's origin."""
+    note_id = _note(client, auth_headers)
+    data = _upload(client, auth_headers, note_id, b'<script>alert(1)</script>', 'page.html', 'text/html').get_json()
+
+    response = client.get(data['url'], headers=auth_headers)
+
+    assert response.headers['Content-Disposition'].startswith('attachment')
+    assert 'sandbox' in response.headers['Content-Security-Policy']
+
+def test_attachment_ownership(client, auth_headers):
+    """Test that other users can neither upload to nor read a note's files."""
+    note_id = _note(client, auth_headers)
+    data = _upload(client, auth_headers, note_id, PNG).get_json()
+    other = client.post('/api/auth/register', json={'email': 'other@example.com', 'password': 'OtherPass123'})
+    other_headers = {'Authorization': f"Bearer {other.get_json()['access_token']}"}
+
+    assert client.get(data['url'], headers=other_headers).status_code == 403
+    assert _upload(client, other_headers, note_id, PNG).status_code == 403
+    assert client.get(f'/api/notes/{note_id}/attachments', headers=other_headers).status_code == 403
+    assert client.delete(data['url'], headers=other_headers).status_code == 403
+
+def test_upload_size_limit(client, auth_headers):
+    """Test that oversized uploads are rejected and leave nothing behind."""
+    note_id = _note(client, auth_headers)
+    payload = b'too large ' * 20
+    client.application.config['ATTACHMENT_MAX_BYTES'] = 100
+    try:
+        response = _upload(client, auth_headers, note_id, payload)
+    finally:
+        client.application.config['ATTACHMENT_MAX_BYTES'] = 25 * 1024 * 1024
+
+    assert response.status_code == 413
+    with client.application.app_context():
+        assert hashlib.sha256(payload).hexdigest() not in set(blobs.keys())
+
+def test_deleted_attachments_are_purged(client, auth_headers):
+    """Test that blobs go once nothing references them, but not before."""
+    first_note, second_note = _note(client, auth_headers), _note(client, auth_headers)
+    first = _upload(client, auth_headers, first_note, PNG).get_json()
+    _upload(client, auth_headers, second_note, PNG)
+    runner = client.application.test_cli_runner()
+
+    assert client.delete(first['url'], headers=auth_headers).status_code == 200
+    runner.invoke(args=['attachments', 'purge', '--grace', '0'])
+    with client.application.app_context():
+        assert blobs.exists(first['hash'])
+
+    # Deleting the note drops its attachment rows with it
+    client.delete(f'/api/notes/{second_note}', headers=auth_headers)
+    result = runner.invoke(args=['attachments', 'purge', '--grace', '0'])
+    assert result.exit_code == 0
+    with client.application.app_context():
+        assert not blobs.exists(first['hash'])
@@ -97,3 +97,81 @@ def test_user_registration_no_json_content_type(client):
     
     # Flask returns 415 when content-type is not application/json
     assert response.status_code == 415
+
+def _login(client, email='refresh@example.com', password='SecurePassword123'):
+    client.post('/api/auth/register', json={'email': email, 'password': password})
+    response = client.post('/api/auth/login', json={'email': email, 'password': password})
+    assert response.status_code == 200
+    return response.get_json()
+
+def test_refresh_token_rotation(client):
+    """Test that a refresh token yields a new pair and cannot be used twice."""
+    tokens = _login(client)
+    assert 'refresh_token' in tokens
+
+    response = client.post('/api/auth/refresh',
+                           headers={'Authorization': f"Bearer {tokens['refresh_token']}"})
+    assert response.status_code == 200
+    rotated = response.get_json()
+    assert rotated['refresh_token'] != tokens['refresh_token']
+    notes = client.get('/api/notes', headers={'Authorization': f"Bearer {rotated['access_token']}"})
+    assert notes.status_code == 200
+
+    # Replaying the rotated-out token revokes the whole session
+    replay = client.post('/api/auth/refresh',
+                         headers={'Authorization': f"Bearer {tokens['refresh_token']}"})
+    assert replay.status_code == 401
+    response = client.post('/api/auth/refresh',
+                           headers={'Authorization': f"Bearer {rotated['refresh_token']}"})
+    assert response.status_code == 401
+
+def test_refresh_requires_refresh_token(client):
+    """Test that an access token cannot be used to refresh."""
+    tokens = _login(client)
+
+    response = client.post('/api/auth/refresh',
+                           headers={'Authorization': f"Bearer {tokens['access_token']}"})
+
+    assert response.status_code == 422
+
+def test_logout_revokes_refresh_token(client):
+    """Test that logging out revokes the session's refresh tokens."""
+    tokens = _login(client)
+    headers = {'Authorization': f"Bearer {tokens['refresh_token']}"}
+
+    assert client.post('/api/auth/logout', headers=headers).status_code == 200
+    assert client.post('/api/auth/refresh', headers=headers).status_code == 401
+
+def test_login_rehashes_old_work_factor(client):
+    """Test that a password hashed with a different cost is upgraded on login."""
+    from server.extensions import hasher
+    from server.models.note_model import User
+    _login(client, email='rehash@example.com')
+    old_rounds = hasher.rounds
+    hasher.rounds = 4
+    try:
+        _login(client, email='rehash@example.com')
+    finally:
+        hasher.rounds = old_rounds
+
+    assert User.query.filter_by(email='rehash@example.com').one().password_hash.startswith('$2b$04$')
+
+def test_hasher_rejects_when_queue_full():
+    """Test that the hashing pool refuses work beyond its queue limit."""
+    import threading
+    import pytest
+    from server.auth.hashing import HasherBusy, PasswordHasher
+    hasher = PasswordHasher()
+    hasher.workers, hasher.queue_limit = 1, 0
+    release = threading.Event()
+    worker = threading.Thread(target=hasher._submit, args=(release.wait,))
+    worker.start()
+    try:
+        while hasher._slots is None or hasher._slots._value:
+            release.wait(0.001)
+        with pytest.raises(HasherBusy):
+            hasher._submit(lambda: None)
+    finally:
+        release.set()
+        worker.join()
+    assert hasher._submit(lambda: 'done') == 'done'
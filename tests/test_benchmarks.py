@@ -0,0 +1,33 @@
+# tests/test_benchmarks.py
+
+from benchmarks.compare import compare
+from benchmarks.corpus import Corpus
+from benchmarks.run import SCENARIOS, run
+
+def test_corpus_is_deterministic():
+    """Test that one seed always produces the same notes."""
+    first = list(Corpus(seed=7, users=1, notes_per_user=20).notes(0))
+    second = list(Corpus(seed=7, users=1, notes_per_user=20).notes(0))
+    other = list(Corpus(seed=8, users=1, notes_per_user=20).notes(0))
+
+    assert first == second
+    assert first != other
+    assert all(20 <= len(n['content_md']) <= 256 * 1024 for n in first)
+    assert any(n['tags'] for n in first)
+
+def test_benchmark_run_reports_every_scenario(tmp_path):
+    """Test a tiny end-to-end run and that a run compares cleanly with itself."""
+    corpus = Corpus(seed=1, users=2, notes_per_user=15)
+
+    report = run(f"sqlite:///{tmp_path / 'bench.db'}", corpus, list(SCENARIOS),
+                 iterations=4, warmup=1, bcrypt_rounds=4)
+
+    assert report['database'] == 'sqlite'
+    assert report['corpus']['notes_per_user'] == 15
+    assert set(report['results']) == set(SCENARIOS)
+    for result in report['results'].values():
+        assert result['iterations'] >= 1
+        assert result['p50_ms'] <= result['p95_ms'] <= result['max_ms']
+    rows, regressed = compare(report, report, threshold=10)
+    assert len(rows) == len(SCENARIOS)
+    assert regressed == []
@@ -0,0 +1,115 @@
+# tests/test_cache.py
+
+import time
+from server.cache import MemoryBackend, SQLiteBackend
+from server.extensions import db
+from server.models.note_model import Note, User
+from tests.conftest import count_queries
+
+def test_repeat_listing_served_from_cache(client, auth_headers, sample_note_data):
+    """Test that an unchanged listing is answered from cache after one generation lookup."""
+    client.post('/api/notes', json=sample_note_data, headers=auth_headers)
+    first = client.get('/api/notes', headers=auth_headers)
+
+    with count_queries() as statements:
+        second = client.get('/api/notes', headers=auth_headers)
+
+    assert len(statements) == 1 and 'users.change_seq' in statements[0]
+    assert second.status_code == 200
+    assert second.data == first.data
+
+def test_writes_invalidate_cached_listing(client, auth_headers, sample_note_data):
+    """Test that create, update and delete all bump the user's cache generation."""
+    note_id = client.post('/api/notes', json=sample_note_data,
+                          headers=auth_headers).get_json()['id']
+    assert len(client.get('/api/notes', headers=auth_headers).get_json()) == 1
+
+    client.put(f'/api/notes/{note_id}', json={'title': 'Renamed'}, headers=auth_headers)
+    assert client.get('/api/notes', headers=auth_headers).get_json()[0]['title'] == 'Renamed'
+    assert client.get(f'/api/notes/{note_id}', headers=auth_headers).get_json()['title'] == 'Renamed'
+
+    client.post('/api/notes', json={'title': 'Second'}, headers=auth_headers)
+    assert len(client.get('/api/notes', headers=auth_headers).get_json()) == 2
+
+    client.delete(f'/api/notes/{note_id}', headers=auth_headers)
+    assert len(client.get('/api/notes', headers=auth_headers).get_json()) == 1
+    assert client.get(f'/api/notes/{note_id}', headers=auth_headers).status_code == 404
+
+def test_write_on_another_worker_invalidates_cache(client, auth_headers, sample_note_data):
+    """Test that a write this process never saw still invalidates its cached responses."""
+    note_id = client.post('/api/notes', json=sample_note_data,
+                          headers=auth_headers).get_json()['id']
+    assert client.get(f'/api/notes/{note_id}', headers=auth_headers).get_json()['revision'] == 1
+    client.get('/api/notes', headers=auth_headers)
+
+    # Another worker commits an update; only the database records it
+    with client.application.app_context():
+        note = db.session.get(Note, note_id)
+        note.title = 'Changed elsewhere'
+        note.revision += 1
+        note.change_seq = User.next_change_seqs(note.user_id)[0]
+        db.session.commit()
+
+    assert client.get('/api/notes', headers=auth_headers).get_json()[0]['title'] == 'Changed elsewhere'
+    response = client.get(f'/api/notes/{note_id}', headers=auth_headers)
+    assert response.get_json()['revision'] == 2
+    assert response.headers['ETag'].startswith(f'"{note_id}-2-')
+
+def test_cached_note_answers_conditional_requests(client, auth_headers, sample_note_data):
+    """Test that a cached single note still honors If-None-Match."""
+    note_id = client.post('/api/notes', json=sample_note_data,
+                          headers=auth_headers).get_json()['id']
+    etag = client.get(f'/api/notes/{note_id}', headers=auth_headers).headers['ETag']
+
+    with count_queries() as statements:
+        response = client.get(f'/api/notes/{note_id}',
+                              headers={**auth_headers, 'If-None-Match': etag})
+
+    assert len(statements) == 1
+    assert response.status_code == 304
+    assert response.headers['ETag'] == etag
+
+def test_cache_is_per_user(client, auth_headers, sample_note_data):
+    """Test that one user's cached listing is never served to another."""
+    client.post('/api/notes', json=sample_note_data, headers=auth_headers)
+    client.get('/api/notes', headers=auth_headers)
+    other = client.post('/api/auth/register', json={
+        'email': 'cached@example.com',
+        'password': 'Password123'
+    }).get_json()['access_token']
+
+    response = client.get('/api/notes', headers={'Authorization': f'Bearer {other}'})
+
+    assert response.get_json() == []
+
+def test_memory_backend_lru_and_ttl():
+    """Test that the in-process backend evicts least recently used and expired entries."""
+    backend = MemoryBackend(max_entries=2)
+    backend.set('a', 1, ttl=60)
+    backend.set('b', 2, ttl=60)
+    assert backend.get('a') == 1
+    backend.set('c', 3, ttl=60)
+
+    assert backend.get('b') is None
+    assert backend.get('a') == 1
+    assert backend.get('c') == 3
+
+    backend.set('short', 4, ttl=0.01)
+    time.sleep(0.02)
+    assert backend.get('short') is None
+
+def test_sqlite_backend_shared_between_workers(tmp_path):
+    """Test that two backends on one file see each other's entries and bumps."""
+    path = str(tmp_path / 'cache.sqlite3')
+    worker_a = SQLiteBackend(path, max_entries=2)
+    worker_b = SQLiteBackend(path, max_entries=2)
+
+    worker_a.set('1:0:/api/notes?', (b'[]', {}), ttl=60)
+    assert worker_b.get('1:0:/api/notes?') == (b'[]', {})
+
+    worker_b.bump('1')
+    assert worker_a.generation('1') == 1
+
+    worker_a.set('k2', 'v2', ttl=60)
+    worker_a.set('k3', 'v3', ttl=60)
+    assert worker_b.get('1:0:/api/notes?') is None
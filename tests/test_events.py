@@ -0,0 +1,211 @@
+# tests/test_events.py
+
+import json
+import os
+import threading
+from types import SimpleNamespace
+from server.events import EventHub, LocalFanout, PostgresFanout
+from server.routes import notes as notes_routes
+
+def _open_stream(client, headers, **kwargs):
+    response = client.get('/api/notes/events', headers=headers, buffered=False, **kwargs)
+    assert response.status_code == 200
+    assert response.mimetype == 'text/event-stream'
+    chunks = iter(response.response)
+    assert next(chunks) == b'retry: 3000\n\n'
+    return response, chunks
+
+def _next_event(chunks):
+    chunk = next(chunks).decode('utf-8')
+    data = [line[len('data: '):] for line in chunk.splitlines() if line.startswith('data: ')]
+    return json.loads(data[0])
+
+def test_event_stream_pushes_note_changes(client, auth_headers):
+    """Test that create, update and delete are pushed to an open stream."""
+    response, chunks = _open_stream(client, auth_headers)
+    try:
+        note_id = client.post('/api/notes', json={'title': 'Live'},
+                              headers=auth_headers).get_json()['id']
+        client.put(f'/api/notes/{note_id}', json={'title': 'Renamed'}, headers=auth_headers)
+        client.delete(f'/api/notes/{note_id}', headers=auth_headers)
+
+        created = _next_event(chunks)
+        updated = _next_event(chunks)
+        deleted = _next_event(chunks)
+    finally:
+        response.close()
+
+    assert created['op'] == 'create' and created['id'] == note_id
+    assert updated['op'] == 'update' and updated['revision'] == 2
+    assert updated['fields'] == ['title']
+    assert 'content_md' not in updated
+    assert deleted == {'op': 'delete', 'id': note_id, 'change_seq': updated['change_seq'] + 1}
+
+def test_event_stream_token_in_query_string(client, auth_headers):
+    """Test that EventSource clients can authenticate with ?jwt=."""
+    token = auth_headers['Authorization'].split()[1]
+
+    response = client.get(f'/api/notes/events?jwt={token}', buffered=False)
+
+    assert response.status_code == 200
+    response.close()
+    assert client.get('/api/notes/events').status_code == 401
+
+def test_event_stream_replays_after_last_event_id(client, auth_headers):
+    """Test that a reconnecting client receives the changes it missed."""
+    first = client.post('/api/notes', json={'title': 'Seen'}, headers=auth_headers).get_json()['id']
+    second = client.post('/api/notes', json={'title': 'Missed'}, headers=auth_headers).get_json()['id']
+
+    response, chunks = _open_stream(client, {**auth_headers, 'Last-Event-ID': '1'})
+    try:
+        event = _next_event(chunks)
+    finally:
+        response.close()
+
+    assert event['id'] == second
+    assert event['change_seq'] == 2
+    assert first != second
+
+def test_truncated_replay_ends_with_resync(client, auth_headers, monkeypatch):
+    """Test that a replay cut at the page size tells the client to resync."""
+    monkeypatch.setattr(notes_routes, 'CHANGES_PAGE_SIZE', 2)
+    for title in ('a', 'b', 'c'):
+        client.post('/api/notes', json={'title': title}, headers=auth_headers)
+
+    response, chunks = _open_stream(client, {**auth_headers, 'Last-Event-ID': '0'})
+    try:
+        replayed = [_next_event(chunks)['change_seq'] for _ in range(2)]
+        assert next(chunks) == b'event: resync\ndata: {}\n\n'
+    finally:
+        response.close()
+    assert replayed == [1, 2]
+
+def test_event_stream_isolated_per_user(client, auth_headers):
+    """Test that one user's events are not delivered to another user's stream."""
+    other = client.post('/api/auth/register', json={
+        'email': 'listener@example.com',
+        'password': 'Password123'
+    }).get_json()['access_token']
+    other_headers = {'Authorization': f'Bearer {other}'}
+    client.application.config['NOTE_EVENTS_HEARTBEAT'] = 0.01
+    response, chunks = _open_stream(client, other_headers)
+    try:
+        client.post('/api/notes', json={'title': 'Private'}, headers=auth_headers)
+        assert next(chunks) == b': keepalive\n\n'
+    finally:
+        response.close()
+        client.application.config['NOTE_EVENTS_HEARTBEAT'] = 15
+
+def test_slow_subscriber_is_told_to_resync():
+    """Test that an overflowing subscriber queue collapses to a resync event."""
+    hub = EventHub()
+    hub.backend = LocalFanout()
+    hub.queue_size = 2
+    subscription = hub.subscribe(7)
+
+    for seq in range(5):
+        hub.publish(7, {'op': 'update', 'id': 1, 'change_seq': seq})
+
+    received = [subscription.get(timeout=0.01) for _ in range(3)]
+    assert received[0] == {'op': 'resync'}
+    subscription.close()
+    assert hub._subscribers == {}
+
+class _FakeListener:
+    """A LISTEN connection whose poll() fails or yields queued notifications."""
+
+    def __init__(self, fail=False, payloads=()):
+        self._read, self._write = os.pipe()
+        os.write(self._write, b'x')  # always readable, so select returns at once
+        self.fail = fail
+        self.notifies = []
+        self._payloads = list(payloads)
+
+    def fileno(self):
+        return self._read
+
+    def cursor(self):
+        return SimpleNamespace(execute=lambda sql: None)
+
+    def poll(self):
+        if self.fail:
+            raise OSError('server closed the connection')
+        self.notifies.extend(SimpleNamespace(payload=p) for p in self._payloads)
+        # Drop after one delivery so the thread ends up waiting to reconnect, not spinning
+        self.fail = True
+
+    def close(self):
+        os.close(self._read)
+        os.close(self._write)
+
+def test_postgres_listener_reconnects_after_connection_loss(monkeypatch):
+    """Test that the listener thread reopens its connection and resyncs local subscribers."""
+    payload = json.dumps({'user_id': '7', 'event': {'op': 'update', 'id': 1, 'change_seq': 3}})
+    connections = iter([_FakeListener(fail=True), _FakeListener(payloads=[payload])])
+    fanout = PostgresFanout('postgresql://unused')
+    fanout.reconnect_delay = 0.01
+    monkeypatch.setattr(fanout, '_connect', lambda: next(connections))
+
+    delivered, done = [], threading.Event()
+    def deliver(user_id, event):
+        delivered.append((user_id, event))
+        if len(delivered) == 2:
+            done.set()
+    fanout.start(deliver)
+
+    assert done.wait(5)
+    assert delivered == [(None, {'op': 'resync'}), ('7', {'op': 'update', 'id': 1, 'change_seq': 3})]
+
+def test_hub_resync_reaches_every_subscriber():
+    """Test that an event for user None is delivered to all subscribers."""
+    hub = EventHub()
+    hub.backend = LocalFanout()
+    first, second = hub.subscribe(1), hub.subscribe(2)
+
+    hub._deliver(None, {'op': 'resync'})
+
+    assert first.get(timeout=0.01) == second.get(timeout=0.01) == {'op': 'resync'}
+
+def test_failed_publish_does_not_fail_the_write(client, auth_headers, monkeypatch):
+    """Test that a write still succeeds when its change event cannot be sent."""
+    from server.extensions import events
+    def broken(user_id, event):
+        raise OSError('notify connection lost')
+    monkeypatch.setattr(events.backend, 'publish', broken)
+
+    response = client.post('/api/notes', json={'title': 'Saved anyway'}, headers=auth_headers)
+
+    assert response.status_code == 201
+    assert client.get(f"/api/notes/{response.get_json()['id']}", headers=auth_headers).status_code == 200
+
+def test_postgres_publish_replaces_a_dropped_connection(monkeypatch):
+    """Test that publishing reconnects once when the cached connection has gone."""
+    sent = []
+    def dead(sql, params):
+        raise OSError('server closed the connection')
+    connections = iter([SimpleNamespace(closed=False, cursor=lambda: SimpleNamespace(execute=dead)),
+                        SimpleNamespace(closed=False,
+                                        cursor=lambda: SimpleNamespace(execute=lambda sql, p: sent.append(p)))])
+    fanout = PostgresFanout('postgresql://unused')
+    monkeypatch.setattr(fanout, '_connect', lambda: next(connections))
+
+    fanout.publish('7', {'op': 'resync'})
+
+    assert len(sent) == 1 and json.loads(sent[0][1])['user_id'] == '7'
+
+def test_batch_pin_does_not_load_bodies(client, auth_headers):
+    """Test that change events and pins work from content_hash without reading note bodies."""
+    from tests.conftest import count_queries
+    ids = [client.post('/api/notes', json={'title': f'P{i}', 'content_md': 'body'},
+                       headers=auth_headers).get_json()['id'] for i in range(3)]
+    response, chunks = _open_stream(client, auth_headers)
+    try:
+        with count_queries() as statements:
+            client.post('/api/notes/batch', json={'ops': [
+                {'op': 'update', 'id': i, 'data': {'favorite': True}} for i in ids]}, headers=auth_headers)
+        events = [_next_event(chunks) for _ in ids]
+    finally:
+        response.close()
+
+    assert not any('content_md' in s or 'note_bodies' in s for s in statements)
+    assert all(e['fields'] == ['favorite'] for e in events)
@@ -1,5 +1,9 @@
 # tests/test_integration.py
 
+import pytest
+
+pytestmark = pytest.mark.query_budget
+
 def test_full_user_workflow(client):
     """Test a complete user workflow: register, create notes, update, delete."""
     
@@ -0,0 +1,94 @@
+# tests/test_metrics.py
+
+import logging
+import pytest
+from server.extensions import metrics
+from server.metrics import Histogram
+
+def _samples(text):
+    """Parse Prometheus text into {series: value}, skipping comments."""
+    samples = {}
+    for line in text.splitlines():
+        if line and not line.startswith('#'):
+            series, value = line.rsplit(' ', 1)
+            samples[series] = float(value)
+    return samples
+
+def test_metrics_record_requests_and_sql(client, auth_headers, sample_note_data):
+    """Test that requests are counted with their latency and SQL statements."""
+    client.post('/api/notes', json=sample_note_data, headers=auth_headers)
+    metrics.reset()
+
+    client.get('/api/notes', headers=auth_headers)
+    client.get('/api/notes/999999', headers=auth_headers)
+    response = client.get('/metrics')
+
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    samples = _samples(response.get_data(as_text=True))
+    labels = 'endpoint="notes.list_notes",method="GET"'
+    assert samples[f'devpad_http_requests_total{{{labels},status="200"}}'] == 1
+    assert samples[f'devpad_http_request_duration_seconds_count{{{labels}}}'] == 1
+    assert 1 <= samples[f'devpad_sql_statements_per_request_sum{{{labels}}}'] <= 3
+    assert samples['devpad_http_requests_total{endpoint="notes.get_note",method="GET",status="404"}'] == 1
+    assert samples['devpad_db_pool_checkouts{bind="default"}'] >= 1
+
+def test_listing_statement_count_does_not_grow_with_notes(client, auth_headers, sample_note_data):
+    """Test that an N+1 in the listing would show up in the SQL histogram."""
+    labels = 'endpoint="notes.list_notes",method="GET"'
+    counts = []
+    for total in (1, 10):
+        while len(client.get('/api/notes?limit=500', headers=auth_headers).get_json()) < total:
+            client.post('/api/notes', json=sample_note_data, headers=auth_headers)
+        metrics.reset()
+        client.get('/api/notes?limit=500&fresh', headers=auth_headers)
+        counts.append(_samples(metrics.render())[f'devpad_sql_statements_per_request_sum{{{labels}}}'])
+
+    assert counts[0] == counts[1]
+
+def test_slow_request_log_includes_statements(client, auth_headers, app, caplog):
+    """Test that the opt-in slow-request log names the SQL that ran."""
+    app.config['METRICS_SLOW_REQUEST_MS'] = 0.0001
+    try:
+        with caplog.at_level(logging.WARNING, logger='devpad.slow_requests'):
+            client.get('/api/notes?jwt=secret-token', headers=auth_headers)
+    finally:
+        app.config['METRICS_SLOW_REQUEST_MS'] = 0
+
+    message = caplog.records[-1].getMessage()
+    assert 'Slow request GET /api/notes -> 200' in message
+    assert 'SELECT' in message
+    assert 'secret-token' not in message
+
+def test_failed_statement_does_not_leave_a_start_time(app):
+    """Test that a statement that errors clears its timing state on the connection."""
+    from sqlalchemy import exc, text
+    from server.extensions import db
+    with db.engine.connect() as conn:
+        with pytest.raises(exc.OperationalError):
+            conn.execute(text('SELECT * FROM no_such_table'))
+        assert 'metrics_started' not in conn.info
+        conn.execute(text('SELECT 1'))
+        assert 'metrics_started' not in conn.info
+
+def test_metrics_endpoint_is_internal(client):
+    """Test that /metrics follows the internal stats access rule."""
+    response = client.get('/metrics', environ_base={'REMOTE_ADDR': '203.0.113.9'})
+
+    assert response.status_code == 403
+
+def test_histogram_exposition():
+    """Test that histogram buckets are cumulative with +Inf, sum and count."""
+    histogram = Histogram('demo_seconds', 'Demo.', ('route',), (0.1, 1))
+    for value in (0.05, 0.5, 5):
+        histogram.observe(('a"b',), value)
+
+    lines = list(histogram.render())
+
+    assert lines[2:] == [
+        'demo_seconds_bucket{route="a\\"b",le="0.1"} 1',
+        'demo_seconds_bucket{route="a\\"b",le="1"} 2',
+        'demo_seconds_bucket{route="a\\"b",le="+Inf"} 3',
+        'demo_seconds_sum{route="a\\"b"} 5.55',
+        'demo_seconds_count{route="a\\"b"} 3'
+    ]
@@ -0,0 +1,171 @@
+# tests/test_migrations.py
+
+import zlib
+from sqlalchemy import create_engine, inspect, text
+from server.app import create_app
+from server.extensions import db
+from server.migrations import MIGRATIONS, move_large_bodies, pending, purge_orphan_bodies, upgrade
+from server.models.note_model import Note, NoteBody, NoteVersion, note_tags
+from server.query_plans import check_query_plans
+
+def test_hot_queries_use_their_indexes(app):
+    """Test that every hot query is planned on its index without a separate sort."""
+    results = check_query_plans(db.engine)
+
+    failures = [f"{r['query']}: {r['plan']}" for r in results if not r['ok']]
+    assert failures == []
+
+# The tables as the app created them before any migration existed
+BASELINE_SCHEMA = [
+    """CREATE TABLE users (id INTEGER PRIMARY KEY, email TEXT NOT NULL UNIQUE, password_hash TEXT NOT NULL,
+       created_at DATETIME NOT NULL, updated_at DATETIME)""",
+    """CREATE TABLE notes (id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL REFERENCES users(id),
+       title TEXT NOT NULL, content_md TEXT NOT NULL, language VARCHAR(30) NOT NULL,
+       favorite BOOLEAN NOT NULL, created_at DATETIME NOT NULL, updated_at DATETIME,
+       last_viewed_at DATETIME)""",
+    "CREATE TABLE tags (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE)",
+    """CREATE TABLE note_tags (note_id INTEGER NOT NULL REFERENCES notes(id),
+       tag_id INTEGER NOT NULL REFERENCES tags(id), PRIMARY KEY (note_id, tag_id))""",
+    "CREATE INDEX idx_notes_user ON notes(user_id)",
+    "CREATE INDEX idx_tags_name ON tags(name)",
+]
+
+def _baseline_database(path):
+    engine = create_engine(f"sqlite:///{path}")
+    with engine.begin() as conn:
+        for statement in BASELINE_SCHEMA:
+            conn.execute(text(statement))
+        conn.execute(text("INSERT INTO users (id, email, password_hash, created_at) "
+                          "VALUES (1, 'old@example.com', 'x', CURRENT_TIMESTAMP)"))
+        for title in ('first', 'second'):
+            conn.execute(text("INSERT INTO notes (user_id, title, content_md, language, favorite, created_at) "
+                              "VALUES (1, :title, 'body', 'markdown', 0, CURRENT_TIMESTAMP)"), {"title": title})
+    return engine
+
+def test_upgrade_brings_baseline_database_up_to_date(tmp_path):
+    """Test that upgrade adds every later column and index to a database from before migrations."""
+    engine = _baseline_database(tmp_path / 'old.db')
+    with engine.begin() as conn:
+        # As once declared in database/schema.sql
+        conn.execute(text("CREATE TABLE note_versions (id INTEGER PRIMARY KEY, note_id INTEGER NOT NULL, "
+                          "version_no INTEGER NOT NULL, title TEXT NOT NULL, content_md TEXT NOT NULL, "
+                          "language VARCHAR(30) NOT NULL, created_at DATETIME NOT NULL)"))
+        conn.execute(text("INSERT INTO note_versions (note_id, version_no, title, content_md, language, "
+                          "created_at) VALUES (1, 1, 'first', 'old text', 'markdown', CURRENT_TIMESTAMP)"))
+
+    assert upgrade(engine) == [version for version, _, _ in MIGRATIONS]
+    assert upgrade(engine) == []
+    assert pending(engine) == []
+
+    inspector = inspect(engine)
+    assert {'revision', 'change_seq', 'content_hash', 'body_hash'} <= {c['name'] for c in inspector.get_columns('notes')}
+    assert 'change_seq' in {c['name'] for c in inspector.get_columns('users')}
+    note_indexes = {i['name'] for i in inspector.get_indexes('notes')}
+    assert {'idx_notes_user_updated', 'idx_notes_user_seq'} <= note_indexes
+    assert 'idx_notes_user' not in note_indexes
+    assert 'idx_note_tags_tag' in {i['name'] for i in inspector.get_indexes('note_tags')}
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT revision, change_seq FROM notes ORDER BY id")).all() == [(1, 1), (1, 2)]
+        assert conn.execute(text("SELECT change_seq FROM users")).scalar() == 2
+        version = conn.execute(text("SELECT is_keyframe, payload FROM note_versions")).one()
+    assert version[0] and zlib.decompress(version[1]) == b'old text'
+    engine.dispose()
+
+def test_baseline_database_serves_requests_after_init_db(tmp_path):
+    """Test that init-db migrates an existing database instead of stamping it."""
+    _baseline_database(tmp_path / 'old.db').dispose()
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'old.db'}"})
+    runner = app.test_cli_runner()
+
+    result = runner.invoke(args=['init-db'])
+    assert result.exit_code == 0
+    assert 'Applied migrations 0001' in result.output
+    assert 'Up to date' in runner.invoke(args=['db', 'status']).output
+
+    client = app.test_client()
+    response = client.post('/api/auth/register', json={'email': 'new@example.com', 'password': 'Password123'})
+    assert response.status_code == 201
+    headers = {'Authorization': f"Bearer {response.get_json()['access_token']}"}
+    created = client.post('/api/notes', json={'title': 'After upgrade', 'content_md': 'text'}, headers=headers)
+    assert created.status_code == 201
+    with app.app_context():
+        db.engines[None].dispose()
+
+def test_init_db_stamps_migrations(tmp_path):
+    """Test that a database built by init-db has no pending migrations."""
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'fresh.db'}"})
+    runner = app.test_cli_runner()
+
+    assert runner.invoke(args=['init-db']).exit_code == 0
+    result = runner.invoke(args=['db', 'status'])
+    assert 'Up to date' in result.output
+
+    result = runner.invoke(args=['db', 'check-plans'])
+    assert result.exit_code == 0
+    assert 'FAIL' not in result.output
+
+def test_deleting_note_cascades_in_database(client, auth_headers, sample_note_data):
+    """Test that a note's tags and versions go with it when deleted."""
+    response = client.post('/api/notes', json=sample_note_data, headers=auth_headers)
+    note_id = response.get_json()['id']
+    client.put(f'/api/notes/{note_id}', json={'content_md': 'changed'}, headers=auth_headers)
+
+    response = client.delete(f'/api/notes/{note_id}', headers=auth_headers)
+
+    assert response.status_code == 200
+    with client.application.app_context():
+        assert db.session.get(Note, note_id) is None
+        assert db.session.query(NoteVersion).filter_by(note_id=note_id).count() == 0
+        assert db.session.execute(
+            note_tags.select().where(note_tags.c.note_id == note_id)).first() is None
+
+def test_upgrade_backfills_note_summaries(tmp_path):
+    """Test that notes written before the summary columns get them filled in."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'summaries.db'}")
+    db.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO users (id, email, password_hash, created_at, change_seq) "
+                          "VALUES (1, 'a@example.com', 'x', CURRENT_TIMESTAMP, 0)"))
+        conn.execute(text("INSERT INTO notes (user_id, title, content_md, language, favorite, created_at, "
+                          "revision, change_seq) VALUES (1, 't', 'old  body text', 'markdown', 0, "
+                          "CURRENT_TIMESTAMP, 1, 0)"))
+
+    upgrade(engine)
+
+    with engine.connect() as conn:
+        row = conn.execute(text("SELECT preview, word_count, byte_size, content_hash FROM notes")).one()
+    assert row[:3] == ('old body text', 3, 14)
+    assert len(row[3]) == 64
+    engine.dispose()
+
+def test_move_large_bodies_converts_existing_rows(app):
+    """Test that inline bodies over the limit are moved without touching note metadata."""
+    from server.models.note_model import User
+    user = User(email='mover@example.com', password_hash='x')
+    db.session.add(user)
+    db.session.commit()
+    body = 'payload ' * 200
+    db.session.execute(Note.__table__.insert(), [
+        {'user_id': user.id, 'title': t, 'content_md': body, 'language': 'plaintext',
+         'byte_size': len(body), 'updated_at': None} for t in ('a', 'b')
+    ] + [{'user_id': user.id, 'title': 'small', 'content_md': 'tiny', 'language': 'plaintext',
+          'byte_size': 4, 'updated_at': None}])
+    db.session.commit()
+
+    assert move_large_bodies(limit=100, batch_size=1) == 2
+    assert move_large_bodies(limit=100) == 0
+
+    db.session.expire_all()
+    notes = {n.title: n for n in Note.query.options(*Note.with_content())}
+    assert notes['a'].content_md == body and notes['b'].content_md == body
+    assert notes['a'].updated_at is None and notes['a'].revision == 1
+    assert notes['small'].body_hash is None
+    assert NoteBody.query.count() == 1
+
+    db.session.delete(notes['a'])
+    db.session.commit()
+    assert purge_orphan_bodies() == 0
+    # Orphaned behind the ORM's back, so only the purge can find it
+    db.session.execute(Note.__table__.update().values(body_hash=None))
+    db.session.commit()
+    assert purge_orphan_bodies() == 1
@@ -1,5 +1,10 @@
 # tests/test_notes.py
 
+import pytest
+from tests.conftest import QUERY_BUDGETS, count_queries, query_budget
+
+pytestmark = pytest.mark.query_budget
+
 def test_list_notes_empty(client, auth_headers):
     """Test listing notes when no notes exist."""
     response = client.get('/api/notes', headers=auth_headers)
@@ -280,3 +285,656 @@ def test_notes_ordering(client, auth_headers):
     assert notes[0]['title'] == 'Third Note'  # Most recent first
     assert notes[1]['title'] == 'Second Note'
     assert notes[2]['title'] == 'First Note'
+
+def test_list_notes_keyset_pagination(client, auth_headers):
+    """Test that list_notes pages through notes with a cursor."""
+    for i in range(5):
+        response = client.post('/api/notes',
+                               json={'title': f'Note {i}'},
+                               headers=auth_headers)
+        assert response.status_code == 201
+
+    seen = []
+    cursor = None
+    pages = 0
+    while True:
+        url = '/api/notes?limit=2' + (f'&cursor={cursor}' if cursor else '')
+        response = client.get(url, headers=auth_headers)
+        assert response.status_code == 200
+        page = response.get_json()
+        assert len(page) <= 2
+        seen.extend(n['id'] for n in page)
+        pages += 1
+        cursor = response.headers.get('X-Next-Cursor')
+        if not cursor:
+            break
+
+    assert pages == 3
+    assert len(seen) == len(set(seen)) == 5
+
+    full = client.get('/api/notes', headers=auth_headers).get_json()
+    assert [n['id'] for n in full] == seen
+
+def test_list_notes_invalid_cursor(client, auth_headers):
+    """Test that a malformed cursor is rejected."""
+    response = client.get('/api/notes?cursor=not-a-cursor', headers=auth_headers)
+
+    assert response.status_code == 400
+    assert response.get_json()['msg'] == 'Invalid cursor'
+
+def test_list_notes_summary_fields(client, auth_headers):
+    """Test that fields=summary omits content_md and returns a preview."""
+    response = client.post('/api/notes', json={
+        'title': 'Long Note',
+        'content_md': '# Heading\n\n' + 'word ' * 1000
+    }, headers=auth_headers)
+    assert response.status_code == 201
+
+    response = client.get('/api/notes?fields=summary', headers=auth_headers)
+
+    assert response.status_code == 200
+    note = response.get_json()[0]
+    assert 'content_md' not in note
+    assert note['preview'].startswith('# Heading word word')
+    assert len(note['preview']) <= 160
+    assert note['title'] == 'Long Note'
+
+def test_list_notes_summary_does_not_read_bodies(client, auth_headers):
+    """Test that summary listings never select content_md."""
+    client.post('/api/notes', json={'title': 'Big', 'content_md': 'x' * 5000}, headers=auth_headers)
+
+    with count_queries() as statements:
+        response = client.get('/api/notes?fields=summary', headers=auth_headers)
+
+    assert response.status_code == 200
+    assert not any('content_md' in s for s in statements)
+
+def test_note_summary_columns_follow_every_write(client, auth_headers):
+    """Test that word count, size, hash and preview track the body on each write path."""
+    import hashlib
+
+    def summary(note_id):
+        notes = client.get('/api/notes?fields=summary', headers=auth_headers).get_json()
+        return next(n for n in notes if n['id'] == note_id)
+
+    def expect(note_id, body):
+        note = summary(note_id)
+        assert note['preview'] == ' '.join(body.split())[:160]
+        assert note['word_count'] == len(body.split())
+        assert note['byte_size'] == len(body.encode('utf-8'))
+        assert note['content_hash'] == hashlib.sha256(body.encode('utf-8')).hexdigest()
+
+    note_id = client.post('/api/notes', json={'content_md': 'one two'}, headers=auth_headers).get_json()['id']
+    expect(note_id, 'one two')
+
+    client.put(f'/api/notes/{note_id}', json={'content_md': 'héllo  wörld again'}, headers=auth_headers)
+    expect(note_id, 'héllo  wörld again')
+
+    client.patch(f'/api/notes/{note_id}', json={
+        'base_revision': 2, 'ops': [{'start': 0, 'end': 5, 'text': 'bye'}]}, headers=auth_headers)
+    expect(note_id, 'bye  wörld again')
+
+    client.post('/api/notes/batch', json={'ops': [
+        {'op': 'update', 'id': note_id, 'data': {'content_md': 'batched'}}]}, headers=auth_headers)
+    expect(note_id, 'batched')
+
+    client.post(f'/api/notes/{note_id}/versions/1/restore', headers=auth_headers)
+    expect(note_id, 'one two')
+
+def test_get_note_success(client, auth_headers, sample_note_data):
+    """Test fetching a single note returns it with an ETag."""
+    create_response = client.post('/api/notes',
+                                 json=sample_note_data,
+                                 headers=auth_headers)
+    note_id = create_response.get_json()['id']
+
+    response = client.get(f'/api/notes/{note_id}', headers=auth_headers)
+
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data['id'] == note_id
+    assert data['content_md'] == sample_note_data['content_md']
+    assert set(data['tags']) == set(sample_note_data['tags'])
+    assert response.headers['ETag'].startswith(f'"{note_id}-1-')
+
+def test_etag_changes_when_a_deleted_id_is_reused(client, auth_headers):
+    """Test that a new note given a deleted note's id does not match the old ETag."""
+    note_id = client.post('/api/notes', json={'title': 'Old'}, headers=auth_headers).get_json()['id']
+    old_etag = client.get(f'/api/notes/{note_id}', headers=auth_headers).headers['ETag']
+    client.delete(f'/api/notes/{note_id}', headers=auth_headers)
+    new_id = client.post('/api/notes', json={'title': 'New'}, headers=auth_headers).get_json()['id']
+    if new_id != note_id:
+        pytest.skip('this database does not reuse ids')
+
+    response = client.get(f'/api/notes/{new_id}', headers={**auth_headers, 'If-None-Match': old_etag})
+    assert response.status_code == 200 and response.get_json()['title'] == 'New'
+    response = client.put(f'/api/notes/{new_id}', json={'title': 'Clobbered'},
+                          headers={**auth_headers, 'If-Match': old_etag})
+    assert response.status_code == 412
+
+def test_get_note_not_modified(client, auth_headers, sample_note_data):
+    """Test that a matching If-None-Match returns 304 with no body."""
+    create_response = client.post('/api/notes',
+                                 json=sample_note_data,
+                                 headers=auth_headers)
+    note_id = create_response.get_json()['id']
+    etag = client.get(f'/api/notes/{note_id}', headers=auth_headers).headers['ETag']
+
+    response = client.get(f'/api/notes/{note_id}',
+                          headers={**auth_headers, 'If-None-Match': etag})
+
+    assert response.status_code == 304
+    assert response.data == b''
+
+    # After an update the old ETag no longer matches
+    client.put(f'/api/notes/{note_id}', json={'title': 'Changed'}, headers=auth_headers)
+    response = client.get(f'/api/notes/{note_id}',
+                          headers={**auth_headers, 'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.get_json()['title'] == 'Changed'
+
+def test_get_note_different_user(client, auth_headers, sample_note_data):
+    """Test that another user's note cannot be read."""
+    create_response = client.post('/api/notes',
+                                 json=sample_note_data,
+                                 headers=auth_headers)
+    note_id = create_response.get_json()['id']
+
+    other = client.post('/api/auth/register', json={
+        'email': 'reader@example.com',
+        'password': 'Password123'
+    }).get_json()['access_token']
+
+    response = client.get(f'/api/notes/{note_id}',
+                          headers={'Authorization': f'Bearer {other}'})
+    assert response.status_code == 403
+
+def test_update_note_if_match(client, auth_headers, sample_note_data):
+    """Test that update_note honors If-Match and rejects stale ETags."""
+    create_response = client.post('/api/notes',
+                                 json=sample_note_data,
+                                 headers=auth_headers)
+    note_id = create_response.get_json()['id']
+    etag = client.get(f'/api/notes/{note_id}', headers=auth_headers).headers['ETag']
+
+    response = client.put(f'/api/notes/{note_id}',
+                          json={'title': 'First Writer'},
+                          headers={**auth_headers, 'If-Match': etag})
+    assert response.status_code == 200
+    assert response.get_json()['revision'] == 2
+    assert response.headers['ETag'] != etag
+
+    response = client.put(f'/api/notes/{note_id}',
+                          json={'title': 'Second Writer'},
+                          headers={**auth_headers, 'If-Match': etag})
+    assert response.status_code == 412
+
+    data = client.get(f'/api/notes/{note_id}', headers=auth_headers).get_json()
+    assert data['title'] == 'First Writer'
+
+def test_list_notes_query_count_is_constant(client, auth_headers):
+    """Test that listing notes does not issue one tag query per note."""
+    counts = []
+    for batch in (2, 8):
+        for i in range(batch):
+            response = client.post('/api/notes', json={
+                'title': f'Note {i}',
+                'tags': [f'tag-{i}', 'shared']
+            }, headers=auth_headers)
+            assert response.status_code == 201
+
+        for path in ('/api/notes', '/api/notes?fields=summary'):
+            with count_queries() as statements:
+                response = client.get(path, headers=auth_headers)
+            assert response.status_code == 200
+            assert all(len(n['tags']) == 2 for n in response.get_json())
+            counts.append(len(statements))
+
+    assert counts[:2] == counts[2:]
+    assert max(counts) <= 3
+
+def test_tag_resolution_query_count_is_constant(client, auth_headers):
+    """Test that saving a note resolves its tags in a fixed number of queries."""
+    counts = []
+    for size in (1, 10):
+        tags = [f'bulk-{size}-{i}' for i in range(size)]
+        with count_queries() as statements:
+            response = client.post('/api/notes',
+                                   json={'title': 'Tagged', 'tags': tags},
+                                   headers=auth_headers)
+        assert response.status_code == 201
+        counts.append(len(statements))
+
+    assert counts[0] == counts[1]
+
+def test_tag_resolution_reuses_existing_tags(client, auth_headers):
+    """Test that new and existing tags resolve to single shared rows."""
+    from server.models.note_model import Tag
+
+    client.post('/api/notes', json={'tags': ['alpha']}, headers=auth_headers)
+    response = client.post('/api/notes',
+                           json={'tags': ['alpha', 'beta', 'beta']},
+                           headers=auth_headers)
+    assert response.status_code == 201
+
+    note_id = response.get_json()['id']
+    data = client.get(f'/api/notes/{note_id}', headers=auth_headers).get_json()
+    assert sorted(data['tags']) == ['alpha', 'beta']
+    assert Tag.query.filter(Tag.name.in_(['alpha', 'beta'])).count() == 2
+
+def test_search_notes_ranked_and_highlighted(client, auth_headers):
+    """Test that search returns matching notes ranked with highlights."""
+    client.post('/api/notes', json={
+        'title': 'Flask tips',
+        'content_md': 'Use blueprints to organise a Flask app.'
+    }, headers=auth_headers)
+    client.post('/api/notes', json={
+        'title': 'Groceries',
+        'content_md': 'Milk, eggs and a <script> tag about flask bottles'
+    }, headers=auth_headers)
+    client.post('/api/notes', json={
+        'title': 'Unrelated',
+        'content_md': 'Nothing to see here'
+    }, headers=auth_headers)
+
+    response = client.get('/api/notes/search?q=flask', headers=auth_headers)
+
+    assert response.status_code == 200
+    results = response.get_json()
+    assert [r['title'] for r in results] == ['Flask tips', 'Groceries']
+    assert '<mark>Flask</mark>' in results[0]['title_html']
+    assert 'content_md' not in results[0]
+    assert '&lt;script&gt;' in results[1]['snippet_html']
+    assert '<mark>flask</mark>' in results[1]['snippet_html']
+
+def test_search_notes_tracks_updates_and_deletes(client, auth_headers):
+    """Test that the search index follows note updates and deletions."""
+    note_id = client.post('/api/notes', json={
+        'title': 'Draft',
+        'content_md': 'original wording'
+    }, headers=auth_headers).get_json()['id']
+
+    client.put(f'/api/notes/{note_id}', json={'content_md': 'revised wording'},
+               headers=auth_headers)
+    assert client.get('/api/notes/search?q=original', headers=auth_headers).get_json() == []
+    assert len(client.get('/api/notes/search?q=revised', headers=auth_headers).get_json()) == 1
+
+    client.delete(f'/api/notes/{note_id}', headers=auth_headers)
+    assert client.get('/api/notes/search?q=revised', headers=auth_headers).get_json() == []
+
+def test_search_notes_pagination_and_isolation(client, auth_headers):
+    """Test that search pages with a cursor and only sees the caller's notes."""
+    for i in range(3):
+        client.post('/api/notes', json={'title': f'Topic {i}', 'content_md': 'shared keyword'},
+                    headers=auth_headers)
+    other = client.post('/api/auth/register', json={
+        'email': 'searcher@example.com',
+        'password': 'Password123'
+    }).get_json()['access_token']
+    client.post('/api/notes', json={'title': 'Other', 'content_md': 'shared keyword'},
+                headers={'Authorization': f'Bearer {other}'})
+
+    first = client.get('/api/notes/search?q=keyword&limit=2', headers=auth_headers)
+    cursor = first.headers['X-Next-Cursor']
+    second = client.get(f'/api/notes/search?q=keyword&limit=2&cursor={cursor}',
+                        headers=auth_headers)
+
+    assert len(first.get_json()) == 2
+    assert len(second.get_json()) == 1
+    assert 'X-Next-Cursor' not in second.headers
+    titles = [r['title'] for r in first.get_json() + second.get_json()]
+    assert sorted(titles) == ['Topic 0', 'Topic 1', 'Topic 2']
+
+def test_search_notes_requires_query(client, auth_headers):
+    """Test that an empty search query is rejected."""
+    response = client.get('/api/notes/search?q=', headers=auth_headers)
+
+    assert response.status_code == 400
+
+def test_patch_note_applies_text_ops(client, auth_headers):
+    """Test that PATCH applies edit operations against the base revision."""
+    note_id = client.post('/api/notes', json={
+        'title': 'Patched',
+        'content_md': 'Hello world',
+        'tags': ['keep']
+    }, headers=auth_headers).get_json()['id']
+
+    response = client.patch(f'/api/notes/{note_id}', json={
+        'base_revision': 1,
+        'ops': [
+            {'start': 6, 'end': 11, 'text': 'there'},
+            {'start': 0, 'end': 0, 'text': '🚀 '}
+        ]
+    }, headers=auth_headers)
+
+    assert response.status_code == 200
+    assert response.get_json()['revision'] == 2
+    data = client.get(f'/api/notes/{note_id}', headers=auth_headers).get_json()
+    assert data['content_md'] == '🚀 Hello there'
+    assert data['tags'] == ['keep']
+
+    # Offsets after the emoji count it as two UTF-16 code units
+    response = client.patch(f'/api/notes/{note_id}', json={
+        'base_revision': 2,
+        'ops': [{'start': 3, 'end': 8, 'text': 'Goodbye'}]
+    }, headers=auth_headers)
+    assert response.status_code == 200
+    data = client.get(f'/api/notes/{note_id}', headers=auth_headers).get_json()
+    assert data['content_md'] == '🚀 Goodbye there'
+
+def test_patch_note_stale_base_revision(client, auth_headers):
+    """Test that PATCH rejects edits made against an old revision."""
+    note_id = client.post('/api/notes', json={'content_md': 'abc'},
+                          headers=auth_headers).get_json()['id']
+    client.put(f'/api/notes/{note_id}', json={'content_md': 'abcd'}, headers=auth_headers)
+
+    response = client.patch(f'/api/notes/{note_id}', json={
+        'base_revision': 1,
+        'ops': [{'start': 0, 'end': 1, 'text': 'X'}]
+    }, headers=auth_headers)
+
+    assert response.status_code == 409
+    assert response.get_json()['revision'] == 2
+
+def test_patch_note_invalid_ops(client, auth_headers):
+    """Test that out-of-range or malformed operations are rejected."""
+    note_id = client.post('/api/notes', json={'content_md': 'abc'},
+                          headers=auth_headers).get_json()['id']
+
+    for ops in ([{'start': 2, 'end': 10, 'text': 'x'}], [{'start': 'a', 'end': 1}], [{}]):
+        response = client.patch(f'/api/notes/{note_id}',
+                                json={'base_revision': 1, 'ops': ops},
+                                headers=auth_headers)
+        assert response.status_code == 400
+
+    data = client.get(f'/api/notes/{note_id}', headers=auth_headers).get_json()
+    assert data['content_md'] == 'abc'
+    assert data['revision'] == 1
+
+def test_note_writes_reject_mistyped_fields(client, auth_headers):
+    """Test that create, update and patch answer 400 to wrongly typed fields."""
+    note_id = client.post('/api/notes', json={'title': 'Typed'}, headers=auth_headers).get_json()['id']
+    for body in ({'title': None}, {'language': 5}, {'favorite': 'yes'}, {'tags': 'a,b'},
+                 {'tags': [1]}, {'language': 'x' * 31}):
+        assert client.post('/api/notes', json=body, headers=auth_headers).status_code == 400
+        assert client.put(f'/api/notes/{note_id}', json=body, headers=auth_headers).status_code == 400
+        response = client.patch(f'/api/notes/{note_id}', json={'base_revision': 1, **body},
+                                headers=auth_headers)
+        assert response.status_code == 400, body
+    assert client.patch(f'/api/notes/{note_id}', json=[1], headers=auth_headers).status_code == 400
+
+    data = client.get(f'/api/notes/{note_id}', headers=auth_headers).get_json()
+    assert data['title'] == 'Typed' and data['revision'] == 1
+
+def test_batch_notes_mixed_operations(client, auth_headers):
+    """Test that one batch request creates, updates and deletes notes."""
+    keep_id = client.post('/api/notes', json={'title': 'Keep', 'tags': ['old']},
+                          headers=auth_headers).get_json()['id']
+    drop_id = client.post('/api/notes', json={'title': 'Drop'},
+                          headers=auth_headers).get_json()['id']
+
+    response = client.post('/api/notes/batch', json={'ops': [
+        {'op': 'create', 'data': {'title': 'Fresh', 'tags': ['new']}},
+        {'op': 'update', 'id': keep_id, 'data': {'title': 'Renamed', 'favorite': True}},
+        {'op': 'delete', 'id': drop_id},
+        {'op': 'delete', 'id': 99999}
+    ]}, headers=auth_headers)
+
+    assert response.status_code == 200
+    results = response.get_json()['results']
+    assert [r['status'] for r in results] == [201, 200, 200, 404]
+    assert isinstance(results[0]['id'], int)
+    assert results[1]['revision'] == 2
+
+    notes = {n['title']: n for n in client.get('/api/notes', headers=auth_headers).get_json()}
+    assert set(notes) == {'Fresh', 'Renamed'}
+    assert notes['Fresh']['tags'] == ['new']
+    assert notes['Renamed']['favorite'] is True
+    assert notes['Renamed']['tags'] == ['old']
+
+def test_batch_notes_ownership_and_atomic(client, auth_headers):
+    """Test per-operation ownership checks and all-or-nothing batches."""
+    mine = client.post('/api/notes', json={'title': 'Mine'},
+                       headers=auth_headers).get_json()['id']
+    other = client.post('/api/auth/register', json={
+        'email': 'batcher@example.com',
+        'password': 'Password123'
+    }).get_json()['access_token']
+    theirs = client.post('/api/notes', json={'title': 'Theirs'},
+                         headers={'Authorization': f'Bearer {other}'}).get_json()['id']
+
+    ops = [
+        {'op': 'update', 'id': mine, 'data': {'title': 'Changed'}},
+        {'op': 'delete', 'id': theirs}
+    ]
+    response = client.post('/api/notes/batch', json={'ops': ops, 'atomic': True},
+                           headers=auth_headers)
+    assert response.status_code == 409
+    assert [r['status'] for r in response.get_json()['results']] == [200, 403]
+    titles = [n['title'] for n in client.get('/api/notes', headers=auth_headers).get_json()]
+    assert titles == ['Mine']
+
+    response = client.post('/api/notes/batch', json={'ops': ops}, headers=auth_headers)
+    assert [r['status'] for r in response.get_json()['results']] == [200, 403]
+    titles = [n['title'] for n in client.get('/api/notes', headers=auth_headers).get_json()]
+    assert titles == ['Changed']
+
+def test_batch_notes_query_count_is_constant(client, auth_headers):
+    """Test that pinning or editing many notes in a batch costs a fixed number of queries."""
+    for data in ({'favorite': True}, {'content_md': 'edited in bulk'}):
+        counts = []
+        for size in (2, 10, 40):
+            ids = [client.post('/api/notes', json={'title': f'N{i}', 'content_md': f'body {i}'},
+                               headers=auth_headers).get_json()['id'] for i in range(size)]
+            # A second save first, so every note has a version below its head
+            client.post('/api/notes/batch', json={'ops': [
+                {'op': 'update', 'id': i, 'data': {'title': 'Renamed'}} for i in ids]}, headers=auth_headers)
+            ops = [{'op': 'update', 'id': i, 'data': data} for i in ids]
+            with count_queries() as statements:
+                response = client.post('/api/notes/batch', json={'ops': ops}, headers=auth_headers)
+            assert response.status_code == 200
+            counts.append(len(statements))
+
+        assert len(set(counts)) == 1, f'{data}: {counts}'
+
+def test_batch_content_updates_keep_history(client, auth_headers):
+    """Test that batched edits are versioned and the history below them still rebuilds."""
+    note_id = client.post('/api/notes', json={'title': 'H', 'content_md': 'one\ntwo\n'},
+                          headers=auth_headers).get_json()['id']
+    for content in ('one\ntwo\nthree\n', 'one\nfour\n'):
+        client.post('/api/notes/batch', json={'ops': [
+            {'op': 'update', 'id': note_id, 'data': {'content_md': content}}]}, headers=auth_headers)
+
+    versions = client.get(f'/api/notes/{note_id}/versions', headers=auth_headers).get_json()
+    assert [v['version_no'] for v in versions] == [3, 2, 1]
+    for version_no, content in ((1, 'one\ntwo\n'), (2, 'one\ntwo\nthree\n')):
+        version = client.get(f'/api/notes/{note_id}/versions/{version_no}', headers=auth_headers).get_json()
+        assert version['content_md'] == content
+    assert client.get(f'/api/notes/{note_id}', headers=auth_headers).get_json()['content_md'] == 'one\nfour\n'
+
+def test_batch_notes_rejects_non_scalar_ids(client, auth_headers):
+    """Test that an operation whose id is not a note id fails on its own with a 400."""
+    response = client.post('/api/notes/batch', json={'ops': [
+        {'op': 'update', 'id': [1], 'data': {'favorite': True}},
+        {'op': 'delete', 'id': {'x': 1}}]}, headers=auth_headers)
+
+    assert response.status_code == 200
+    assert [r['status'] for r in response.get_json()['results']] == [400, 400]
+
+def test_batch_notes_rejects_bad_payload(client, auth_headers):
+    """Test that a batch without an ops list is rejected."""
+    response = client.post('/api/notes/batch', json={'ops': 'nope'}, headers=auth_headers)
+
+    assert response.status_code == 400
+
+def test_batch_notes_rejects_mistyped_data(client, auth_headers):
+    """Test that wrongly typed op data fails that op with a 400, or the whole atomic batch."""
+    note_id = client.post('/api/notes', json={'title': 'Typed'}, headers=auth_headers).get_json()['id']
+    ops = [
+        {'op': 'update', 'id': note_id, 'data': [1]},
+        {'op': 'create', 'data': {'tags': [1]}},
+        {'op': 'create', 'data': {'title': None}},
+        {'op': 'create', 'data': {'favorite': 'false'}},
+        {'op': 'create', 'data': {'title': 'Fine', 'tags': ['ok']}}
+    ]
+    response = client.post('/api/notes/batch', json={'ops': ops, 'atomic': True}, headers=auth_headers)
+    assert response.status_code == 409
+    assert [r['status'] for r in response.get_json()['results']] == [400, 400, 400, 400, 201]
+
+    response = client.post('/api/notes/batch', json={'ops': ops}, headers=auth_headers)
+    assert response.status_code == 200
+    results = response.get_json()['results']
+    assert [r['status'] for r in results] == [400, 400, 400, 400, 201]
+    assert results[1]['msg'] == 'tags must be a list of strings'
+    titles = sorted(n['title'] for n in client.get('/api/notes', headers=auth_headers).get_json())
+    assert titles == ['Fine', 'Typed']
+
+def test_batch_notes_rejects_repeated_ids(client, auth_headers):
+    """Test that a second operation on the same note in one batch is refused."""
+    note_id = client.post('/api/notes', json={'title': 'Once'}, headers=auth_headers).get_json()['id']
+    response = client.post('/api/notes/batch', json={'ops': [
+        {'op': 'update', 'id': note_id, 'data': {'title': 'Twice'}},
+        {'op': 'delete', 'id': note_id}]}, headers=auth_headers)
+
+    assert [r['status'] for r in response.get_json()['results']] == [200, 400]
+    note = client.get(f'/api/notes/{note_id}', headers=auth_headers).get_json()
+    assert note['title'] == 'Twice'
+
+def test_note_writes_update_the_row_once(client, auth_headers):
+    """Test that a save writes the note in one UPDATE and leaves users.updated_at alone."""
+    from server.models.note_model import User
+    note_id = client.post('/api/notes', json={'title': 'Once', 'tags': ['a']},
+                          headers=auth_headers).get_json()['id']
+    stamp = User.query.filter_by(email='test@example.com').one().updated_at
+
+    with count_queries() as statements:
+        client.put(f'/api/notes/{note_id}', json={'title': 'Twice', 'content_md': 'new', 'tags': ['a', 'b']},
+                   headers=auth_headers)
+        client.patch(f'/api/notes/{note_id}', json={'base_revision': 2, 'title': 'Thrice'},
+                     headers=auth_headers)
+    assert sum(s.startswith('UPDATE notes') for s in statements) == 2
+    assert not any(s.startswith('UPDATE users') and 'updated_at=?' in s for s in statements)
+    assert User.query.filter_by(email='test@example.com').one().updated_at == stamp
+
+def _seed_notes(count, start=0):
+    """Insert ``count`` tagged notes for the test user directly, returning their ids."""
+    from server.extensions import db
+    from server.models.note_model import Note, Tag, User
+    from server.versioning import first_version
+    user = User.query.filter_by(email='test@example.com').one()
+    notes = []
+    for i in range(start, start + count):
+        notes.append(Note(user_id=user.id, title=f'Seed {i}', content_md=f'seed body {i}\n' * 5,
+                          language='markdown',
+                          tags=Tag.resolve([f'seed-{i}', 'seed-shared', 'fresh', 'moved'])))
+    db.session.add_all(notes)
+    db.session.flush()
+    db.session.add_all(first_version(n) for n in notes)
+    db.session.commit()
+    return [n.id for n in notes]
+
+def test_query_counts_do_not_scale(client, auth_headers):
+    """Test that every endpoint issues the same number of queries as data grows."""
+    from server.extensions import cache
+    requests = {
+        'notes.list_notes': lambda ids: client.get('/api/notes', headers=auth_headers),
+        'tags.list_tags': lambda ids: client.get('/api/tags', headers=auth_headers),
+        'notes.get_note': lambda ids: client.get(f'/api/notes/{ids[-1]}', headers=auth_headers),
+        'notes.search': lambda ids: client.get('/api/notes/search?q=seed', headers=auth_headers),
+        'notes.create_note': lambda ids: client.post('/api/notes', json={
+            'title': 'Fresh', 'tags': ['seed-shared', 'fresh']}, headers=auth_headers),
+        'notes.update_note': lambda ids: client.put(f'/api/notes/{ids[0]}', json={
+            'content_md': f'changed {len(ids)}', 'tags': ['seed-shared', 'moved']}, headers=auth_headers),
+        'notes.patch_note': lambda ids: client.patch(f'/api/notes/{ids[1]}', json={
+            'base_revision': 1, 'ops': [{'start': 0, 'end': 4, 'text': 'SEED'}]}, headers=auth_headers),
+        'notes.delete_note': lambda ids: client.delete(f'/api/notes/{ids[2]}', headers=auth_headers),
+        'notes.batch_notes': lambda ids: client.post('/api/notes/batch', json={'ops': [
+            {'op': 'update', 'id': i, 'data': {'favorite': True, 'content_md': f'batched {i}'}}
+            for i in ids[3:]
+        ]}, headers=auth_headers)
+    }
+    # Tags named by the requests exist up front, so creating them isn't counted
+    _seed_notes(1, start=-1)
+    counts = {name: [] for name in requests}
+    seeded = 0
+    for size in (5, 20, 60):
+        ids = _seed_notes(size, start=seeded)
+        seeded += size
+        for name, send in requests.items():
+            cache.clear()
+            with count_queries() as statements:
+                response = send(ids)
+            assert response.status_code in (200, 201), (name, response.get_json())
+            counts[name].append(len(statements))
+
+    for name, per_size in counts.items():
+        assert len(set(per_size)) == 1, f'{name} statements grew with data: {per_size}'
+        assert per_size[0] <= QUERY_BUDGETS[name]
+
+def test_query_budget_failure_lists_statements(client, auth_headers):
+    """Test that exceeding a budget fails with the statements that ran."""
+    with pytest.raises(pytest.fail.Exception) as excinfo:
+        with query_budget(0, 'Listing'):
+            client.get('/api/notes', headers=auth_headers)
+
+    message = str(excinfo.value)
+    assert 'Listing issued 2 SQL statements, budget is 0' in message
+    assert '1. SELECT' in message
+
+def test_large_bodies_stored_out_of_row(client, auth_headers):
+    """Test that large bodies are compressed into note_bodies and read back transparently."""
+    from server.models.note_model import Note, NoteBody
+    from server.extensions import db
+    big = '# Dump\n' + ''.join(f'line {i} of a very large diagram\n' for i in range(5000))
+    first = client.post('/api/notes', json={'title': 'Big', 'content_md': big}, headers=auth_headers).get_json()['id']
+    second = client.post('/api/notes', json={'title': 'Copy', 'content_md': big}, headers=auth_headers).get_json()['id']
+
+    assert client.get(f'/api/notes/{first}', headers=auth_headers).get_json()['content_md'] == big
+    listed = {n['id']: n for n in client.get('/api/notes', headers=auth_headers).get_json()}
+    assert listed[second]['content_md'] == big
+    with client.application.app_context():
+        notes = Note.query.filter(Note.id.in_([first, second])).all()
+        assert {n.body_hash for n in notes} == {notes[0].content_hash}
+        assert NoteBody.query.count() == 1
+        stored = db.session.execute(db.text('SELECT content_md FROM notes WHERE id = :id'),
+                                    {'id': first}).scalar()
+        assert len(stored.encode('utf-8')) <= 64 * 1024
+        assert big.startswith(stored)
+
+    # Editing a large note back under the limit stores it inline again
+    client.patch(f'/api/notes/{first}', json={
+        'base_revision': 1, 'ops': [{'start': 7, 'end': len(big), 'text': 'short'}]}, headers=auth_headers)
+    assert client.get(f'/api/notes/{first}', headers=auth_headers).get_json()['content_md'] == '# Dump\nshort'
+    with client.application.app_context():
+        assert db.session.get(Note, first).body_hash is None
+        # Still used by the copy
+        assert NoteBody.query.count() == 1
+
+    # A rename leaves the stored body alone; deleting its last user removes it
+    with count_queries() as statements:
+        client.put(f'/api/notes/{second}', json={'title': 'Renamed copy'}, headers=auth_headers)
+    assert not any(s.startswith(('INSERT INTO note_bodies', 'UPDATE notes SET content_md')) for s in statements)
+    client.delete(f'/api/notes/{second}', headers=auth_headers)
+    with client.application.app_context():
+        assert NoteBody.query.count() == 0
+
+def test_editing_a_large_body_replaces_its_stored_row(client, auth_headers):
+    """Test that the body an edit supersedes is deleted in the same request."""
+    from server.models.note_model import NoteBody
+    big = 'start\n' + 'filler line for a large note\n' * 4000
+    note_id = client.post('/api/notes', json={'title': 'Big', 'content_md': big},
+                          headers=auth_headers).get_json()['id']
+    client.put(f'/api/notes/{note_id}', json={'content_md': big + 'more\n'}, headers=auth_headers)
+
+    with client.application.app_context():
+        assert [b.size for b in NoteBody.query] == [len(big) + len('more\n')]
+
+def test_search_covers_only_the_inline_head_of_large_bodies(client, auth_headers):
+    """Test the documented limit: words past INLINE_BODY_BYTES are not indexed."""
+    from server.models.note_model import INLINE_BODY_BYTES
+    body = 'headword\n' + 'x' * INLINE_BODY_BYTES + '\ntailword\n'
+    client.post('/api/notes', json={'title': 'Long', 'content_md': body}, headers=auth_headers)
+
+    found = lambda q: client.get(f'/api/notes/search?q={q}', headers=auth_headers).get_json()
+    assert [n['title'] for n in found('headword')] == ['Long']
+    assert found('tailword') == []
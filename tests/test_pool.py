@@ -0,0 +1,83 @@
+# tests/test_pool.py
+
+import pytest
+from sqlalchemy import create_engine, exc
+from server.app import create_app
+from server.pool import InstrumentedQueuePool, engine_options, pool_stats
+
+POOL_CONFIG = {
+    'DB_POOL_SIZE': 5,
+    'DB_MAX_OVERFLOW': 10,
+    'DB_POOL_TIMEOUT': 30,
+    'DB_POOL_RECYCLE': 1800,
+    'DB_POOL_PRE_PING': True,
+    'DB_TRANSACTION_POOLER': False
+}
+
+def test_internal_stats_reports_pool(client, auth_headers):
+    """Test that the stats endpoint reports checkouts and current usage."""
+    client.get('/api/notes', headers=auth_headers)
+
+    response = client.get('/api/internal/stats')
+
+    assert response.status_code == 200
+    pool = response.get_json()['pools']['default']
+    if pool['pool'] == 'InstrumentedQueuePool':
+        assert pool['checkouts'] > 0
+        assert pool['timeouts'] == 0
+        assert 0 <= pool['in_use'] <= pool['size'] + pool['max_overflow']
+
+def test_internal_stats_requires_token_when_configured(client, app):
+    """Test that a configured token must be presented."""
+    app.config['INTERNAL_STATS_TOKEN'] = 'ops-secret'
+    try:
+        assert client.get('/api/internal/stats').status_code == 403
+        response = client.get('/api/internal/stats', headers={'X-Internal-Token': 'ops-secret'})
+        assert response.status_code == 200
+    finally:
+        app.config['INTERNAL_STATS_TOKEN'] = None
+
+def test_internal_stats_rejects_remote_callers(client):
+    """Test that without a token only loopback callers are served."""
+    response = client.get('/api/internal/stats', environ_base={'REMOTE_ADDR': '203.0.113.9'})
+
+    assert response.status_code == 403
+
+def test_internal_stats_closed_without_token_by_default(client, app):
+    """Test that loopback callers are refused unless loopback access is switched on."""
+    app.config['INTERNAL_STATS_ALLOW_LOOPBACK'] = False
+    try:
+        assert client.get('/api/internal/stats').status_code == 403
+        assert client.get('/metrics').status_code == 403
+    finally:
+        app.config['INTERNAL_STATS_ALLOW_LOOPBACK'] = True
+    assert create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite://'}).config['INTERNAL_STATS_ALLOW_LOOPBACK'] is False
+
+def test_pool_records_timeouts(tmp_path):
+    """Test that exhausted checkouts are counted as timeouts."""
+    engine = create_engine(f'sqlite:///{tmp_path / "pool.db"}', poolclass=InstrumentedQueuePool,
+                           pool_size=1, max_overflow=0, pool_timeout=0.05)
+    held = engine.connect()
+    try:
+        with pytest.raises(exc.TimeoutError):
+            engine.connect()
+        stats = pool_stats(engine)
+    finally:
+        held.close()
+
+    assert stats['in_use'] == 1
+    assert stats['checkouts'] == 1
+    assert stats['timeouts'] == 1
+    assert stats['wait_ms_max'] >= 50
+
+def test_engine_options_for_transaction_pooler():
+    """Test that pooler mode turns off psycopg's server-side prepares."""
+    options = engine_options({**POOL_CONFIG, 'DB_TRANSACTION_POOLER': True,
+                              'SQLALCHEMY_DATABASE_URI': 'postgresql+psycopg://db/devpad'})
+
+    assert options['connect_args'] == {'prepare_threshold': None}
+    assert options['poolclass'] is InstrumentedQueuePool
+    assert options['pool_pre_ping'] is True
+
+    memory = engine_options({**POOL_CONFIG, 'SQLALCHEMY_DATABASE_URI': 'sqlite://'})
+    assert memory == {}
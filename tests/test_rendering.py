@@ -0,0 +1,128 @@
+# tests/test_rendering.py
+
+import time
+import pytest
+from server.extensions import renderer
+from server.rendering import INLINE_MAX_CHARS, MAX_NESTING, NoteRenderer, render_markdown, render_note
+from tests.conftest import count_queries
+
+pytestmark = pytest.mark.query_budget
+
+def _note(client, headers, content, language='markdown'):
+    response = client.post('/api/notes', json={'title': 'Rendered', 'content_md': content,
+                                               'language': language}, headers=headers)
+    return response.get_json()['id']
+
+def test_markdown_renders_common_syntax():
+    """Test that headings, emphasis, lists, links and code come out as HTML."""
+    html = render_markdown('# Title\n\nSome **bold** and *em* with `x < y`.\n\n'
+                           '- one\n- two\n  - nested\n\n1. first\n2. second\n\n'
+                           '> quoted\n\n[site](https://example.com)\n\n---')
+
+    assert '<h1>Title</h1>' in html
+    assert '<strong>bold</strong>' in html and '<em>em</em>' in html
+    assert '<code>x &lt; y</code>' in html
+    assert '<ul>\n<li>one</li>' in html and '<li>nested</li>' in html
+    assert '<ol>\n<li>first</li>' in html
+    assert '<blockquote>\n<p>quoted</p>\n</blockquote>' in html
+    assert '<a href="https://example.com" rel="nofollow noopener noreferrer">site</a>' in html
+    assert '<hr>' in html
+
+def test_markdown_output_is_sanitized():
+    """Test that raw HTML is escaped and unsafe link schemes are dropped."""
+    html = render_markdown('<script>alert(1)</script>\n\n<img src=x onerror=alert(1)>\n\n'
+                           '[click](javascript:alert(1)) [tab](java\tscript:alert(1)) '
+                           '![pic](data:image/svg+xml;base64,PHN2Zz4=) [q](https://x.com/" onmouseover="a)')
+
+    assert '<script' not in html and '<img src=x' not in html
+    assert '&lt;script&gt;' in html
+    assert 'javascript' not in html.replace('&lt;', '')
+    assert 'href="java' not in html and 'data:image/svg' not in html
+    assert 'onmouseover="' not in html
+
+def test_code_is_highlighted_by_language():
+    """Test that fences and non-Markdown notes are highlighted, and plain text is escaped."""
+    fenced = render_markdown('```python\ndef f():\n    return 1\n```')
+    assert '<div class="highlight">' in fenced
+    assert '<span class="k">def</span>' in fenced
+
+    assert '<span class="k">def</span>' in render_note('def f(): pass', 'python')
+    assert render_note('<b>', 'plaintext') == '<pre>&lt;b&gt;</pre>'
+    assert '<div class="highlight">' in render_note('x', 'no-such-language')
+
+def test_unclosed_delimiters_render_in_linear_time():
+    """Test that long runs of unmatched markup render quickly instead of backtracking."""
+    size = INLINE_MAX_CHARS - 1024
+    for unit in ('*a ', '**a ', '_a ', '~~a ', '`a ', '[a](b ', '*a _b **c '):
+        text = unit * (size // len(unit))
+        started = time.perf_counter()
+        html = render_markdown(text)
+        assert time.perf_counter() - started < 2, unit
+        assert html.startswith('<p>')
+
+    # Past the limit a paragraph is escaped but not parsed
+    assert render_markdown('*a* ' * INLINE_MAX_CHARS).count('<em>') == 0
+
+def test_deep_nesting_is_bounded():
+    """Test that deeply nested quotes and lists render without recursing past MAX_NESTING."""
+    html = render_markdown('> ' * 5000 + 'deep')
+    assert html.count('<blockquote>') == MAX_NESTING
+    assert 'deep' in html
+    assert render_markdown('- ' * 5000 + 'x').count('<ul>') == MAX_NESTING
+
+def test_note_html_endpoint_caches_by_content(client, auth_headers):
+    """Test that a second render is served from cache without reading the body."""
+    note_id = _note(client, auth_headers, '# Hello\n\n' + 'word ' * 20000)
+
+    first = client.get(f'/api/notes/{note_id}/html', headers=auth_headers)
+    assert first.status_code == 200
+    assert first.headers['X-Render-Cache'] == 'miss'
+    assert first.get_json()['html'].startswith('<h1>Hello</h1>')
+    assert set(first.get_json()) == {'id', 'content_hash', 'html'}
+
+    with count_queries() as statements:
+        second = client.get(f'/api/notes/{note_id}/html', headers=auth_headers)
+    assert second.headers['X-Render-Cache'] == 'hit'
+    assert second.get_json()['html'] == first.get_json()['html']
+    assert len(statements) == 1
+    assert not any('content_md' in s or 'note_bodies' in s for s in statements)
+
+    not_modified = client.get(f'/api/notes/{note_id}/html',
+                              headers={**auth_headers, 'If-None-Match': first.headers['ETag']})
+    assert not_modified.status_code == 304
+
+    # A rename bumps the revision but not the HTML, so the ETag still holds
+    client.put(f'/api/notes/{note_id}', json={'title': 'Renamed'}, headers=auth_headers)
+    renamed = client.get(f'/api/notes/{note_id}/html',
+                         headers={**auth_headers, 'If-None-Match': first.headers['ETag']})
+    assert renamed.status_code == 304
+
+    client.put(f'/api/notes/{note_id}', json={'content_md': 'changed'}, headers=auth_headers)
+    third = client.get(f'/api/notes/{note_id}/html',
+                       headers={**auth_headers, 'If-None-Match': first.headers['ETag']})
+    assert third.status_code == 200
+    assert third.get_json()['html'] == '<p>changed</p>'
+
+def test_note_html_requires_owner(client, auth_headers):
+    """Test that another user cannot render someone else's note."""
+    note_id = _note(client, auth_headers, 'secret')
+    client.post('/api/auth/register', json={'email': 'other@example.com', 'password': 'password123'})
+    login = client.post('/api/auth/login', json={'email': 'other@example.com', 'password': 'password123'})
+    other = {'Authorization': f"Bearer {login.get_json()['access_token']}"}
+
+    assert client.get(f'/api/notes/{note_id}/html', headers=other).status_code == 403
+    assert client.get('/api/notes/999999/html', headers=auth_headers).status_code == 404
+
+def test_render_cache_is_bounded_and_uses_disk_tier(app, tmp_path):
+    """Test that the memory tier evicts least recently used entries and the disk tier refills it."""
+    cache = NoteRenderer()
+    cache.max_bytes, cache.directory = 10, str(tmp_path)
+    cache.set('a', 'aaaaa')
+    cache.set('b', 'bbbbb')
+    cache.get('a')
+    cache.set('c', 'ccccc')
+
+    assert cache.stats()['entries'] == 2 and cache.stats()['bytes'] == 10
+    assert cache.get('b') == 'bbbbb'
+    assert cache.stats()['disk_hits'] == 1
+    assert renderer.stats()['max_bytes'] > 0
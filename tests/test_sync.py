@@ -0,0 +1,86 @@
+# tests/test_sync.py
+
+def _changes(client, headers, since=None, limit=None):
+    params = []
+    if since is not None:
+        params.append(f'since={since}')
+    if limit is not None:
+        params.append(f'limit={limit}')
+    response = client.get('/api/notes/changes?' + '&'.join(params), headers=headers)
+    assert response.status_code == 200
+    return response.get_json()
+
+def test_changes_initial_snapshot(client, auth_headers, sample_note_data):
+    """Test that a first sync returns every note and a cursor."""
+    for i in range(3):
+        client.post('/api/notes', json={**sample_note_data, 'title': f'Note {i}'},
+                    headers=auth_headers)
+
+    data = _changes(client, auth_headers)
+
+    assert [n['title'] for n in data['notes']] == ['Note 0', 'Note 1', 'Note 2']
+    assert data['deleted'] == []
+    assert data['cursor'] == data['notes'][-1]['change_seq']
+    assert data['has_more'] is False
+
+def test_changes_since_cursor_returns_only_delta(client, auth_headers):
+    """Test that later syncs only return notes changed or deleted since the cursor."""
+    keep = client.post('/api/notes', json={'title': 'Keep'}, headers=auth_headers).get_json()['id']
+    edit = client.post('/api/notes', json={'title': 'Edit'}, headers=auth_headers).get_json()['id']
+    drop = client.post('/api/notes', json={'title': 'Drop'}, headers=auth_headers).get_json()['id']
+    cursor = _changes(client, auth_headers)['cursor']
+
+    assert _changes(client, auth_headers, since=cursor)['notes'] == []
+
+    client.put(f'/api/notes/{edit}', json={'title': 'Edited'}, headers=auth_headers)
+    client.delete(f'/api/notes/{drop}', headers=auth_headers)
+    added = client.post('/api/notes', json={'title': 'Added'}, headers=auth_headers).get_json()['id']
+
+    data = _changes(client, auth_headers, since=cursor)
+    assert [n['id'] for n in data['notes']] == [edit, added]
+    assert data['notes'][0]['title'] == 'Edited'
+    assert data['deleted'] == [drop]
+    assert keep not in [n['id'] for n in data['notes']]
+    assert data['cursor'] > cursor
+
+def test_changes_pagination(client, auth_headers):
+    """Test that a large delta is returned in pages."""
+    ids = [client.post('/api/notes', json={'title': f'N{i}'}, headers=auth_headers).get_json()['id']
+           for i in range(5)]
+    client.delete(f'/api/notes/{ids[0]}', headers=auth_headers)
+
+    seen, deleted, since = [], [], None
+    while True:
+        data = _changes(client, auth_headers, since=since, limit=2)
+        seen.extend(n['id'] for n in data['notes'])
+        deleted.extend(data['deleted'])
+        since = data['cursor']
+        if not data['has_more']:
+            break
+
+    assert seen == ids[1:]
+    assert deleted == [ids[0]]
+
+def test_changes_batch_and_per_user(client, auth_headers):
+    """Test that batch writes get sequence numbers and users have separate feeds."""
+    response = client.post('/api/notes/batch', json={'ops': [
+        {'op': 'create', 'data': {'title': 'A'}},
+        {'op': 'create', 'data': {'title': 'B'}}
+    ]}, headers=auth_headers)
+    assert response.status_code == 200
+    other = client.post('/api/auth/register', json={
+        'email': 'syncer@example.com',
+        'password': 'Password123'
+    }).get_json()['access_token']
+
+    mine = _changes(client, auth_headers)
+    theirs = _changes(client, {'Authorization': f'Bearer {other}'})
+
+    assert [n['change_seq'] for n in mine['notes']] == [1, 2]
+    assert theirs['notes'] == [] and theirs['cursor'] == 0
+
+def test_changes_invalid_since(client, auth_headers):
+    """Test that a non-numeric cursor is rejected."""
+    response = client.get('/api/notes/changes?since=abc', headers=auth_headers)
+
+    assert response.status_code == 400
@@ -0,0 +1,92 @@
+# tests/test_tags.py
+
+import pytest
+
+pytestmark = pytest.mark.query_budget
+
+def _create(client, headers, title, tags, **fields):
+    response = client.post('/api/notes', json={'title': title, 'tags': tags, **fields}, headers=headers)
+    assert response.status_code == 201
+    return response.get_json()['id']
+
+def _titles(response):
+    assert response.status_code == 200
+    return sorted(n['title'] for n in response.get_json())
+
+def test_list_tags_with_counts(client, auth_headers):
+    """Test that tags come back with per-user note counts, most used first."""
+    _create(client, auth_headers, 'One', ['python', 'flask'])
+    _create(client, auth_headers, 'Two', ['python'])
+    _create(client, auth_headers, 'Three', [])
+    other = client.post('/api/auth/register', json={'email': 'other@example.com', 'password': 'OtherPass123'})
+    other_headers = {'Authorization': f"Bearer {other.get_json()['access_token']}"}
+    _create(client, other_headers, 'Theirs', ['python', 'rust'])
+
+    response = client.get('/api/tags', headers=auth_headers)
+
+    assert response.status_code == 200
+    assert response.get_json() == [{'name': 'python', 'count': 2}, {'name': 'flask', 'count': 1}]
+
+def test_list_tags_follows_note_changes(client, auth_headers):
+    """Test that counts reflect retagged and deleted notes."""
+    note_id = _create(client, auth_headers, 'One', ['draft'])
+    assert client.get('/api/tags', headers=auth_headers).get_json() == [{'name': 'draft', 'count': 1}]
+
+    client.put(f'/api/notes/{note_id}', json={'tags': ['final']}, headers=auth_headers)
+    assert client.get('/api/tags', headers=auth_headers).get_json() == [{'name': 'final', 'count': 1}]
+
+    client.delete(f'/api/notes/{note_id}', headers=auth_headers)
+    assert client.get('/api/tags', headers=auth_headers).get_json() == []
+
+def test_list_tags_unauthorized(client):
+    """Test that listing tags requires a token."""
+    assert client.get('/api/tags').status_code == 401
+
+def test_list_notes_filters_by_tags(client, auth_headers):
+    """Test any/all tag matching on the note listing."""
+    _create(client, auth_headers, 'Both', ['python', 'flask'])
+    _create(client, auth_headers, 'Python', ['python'])
+    _create(client, auth_headers, 'Flask', ['flask'])
+    _create(client, auth_headers, 'None', [])
+
+    any_match = client.get('/api/notes?tag=python&tag=flask', headers=auth_headers)
+    all_match = client.get('/api/notes?tag=python&tag=flask&match=all', headers=auth_headers)
+    one = client.get('/api/notes?tag=python&fields=summary', headers=auth_headers)
+    unknown = client.get('/api/notes?tag=missing', headers=auth_headers)
+
+    assert _titles(any_match) == ['Both', 'Flask', 'Python']
+    assert _titles(all_match) == ['Both']
+    assert _titles(one) == ['Both', 'Python']
+    assert _titles(unknown) == []
+
+def test_list_notes_filters_by_language_and_favorite(client, auth_headers):
+    """Test the language and favorite filters, alone and combined with tags."""
+    _create(client, auth_headers, 'Py fav', ['code'], language='python', favorite=True)
+    _create(client, auth_headers, 'Py', ['code'], language='python')
+    _create(client, auth_headers, 'Md fav', [], language='markdown', favorite=True)
+
+    assert _titles(client.get('/api/notes?language=python', headers=auth_headers)) == ['Py', 'Py fav']
+    assert _titles(client.get('/api/notes?favorite=true', headers=auth_headers)) == ['Md fav', 'Py fav']
+    assert _titles(client.get('/api/notes?favorite=false', headers=auth_headers)) == ['Py']
+    assert _titles(client.get('/api/notes?tag=code&favorite=1&language=python',
+                              headers=auth_headers)) == ['Py fav']
+
+def test_list_notes_filter_pagination(client, auth_headers):
+    """Test that the cursor pages through filtered results only."""
+    for i in range(5):
+        _create(client, auth_headers, f'Tagged {i}', ['keep'])
+        _create(client, auth_headers, f'Other {i}', ['skip'])
+
+    titles, path = [], '/api/notes?tag=keep&limit=2'
+    while path:
+        response = client.get(path, headers=auth_headers)
+        titles.extend(_titles(response))
+        cursor = response.headers.get('X-Next-Cursor')
+        path = cursor and f'/api/notes?tag=keep&limit=2&cursor={cursor}'
+
+    assert sorted(titles) == [f'Tagged {i}' for i in range(5)]
+
+def test_list_notes_rejects_bad_filters(client, auth_headers):
+    """Test that malformed filter values are rejected."""
+    assert client.get('/api/notes?tag=a&match=some', headers=auth_headers).status_code == 400
+    assert client.get('/api/notes?favorite=maybe', headers=auth_headers).status_code == 400
@@ -0,0 +1,84 @@
+# tests/test_thumbnails.py
+
+import pytest
+from server.extensions import db
+from server.models.note_model import NoteThumbnail
+
+pytestmark = pytest.mark.query_budget
+
+PNG = b'\x89PNG\r\n\x1a\n' + b'thumbnail' * 50
+
+def _note(client, headers, content='# Card'):
+    data = client.post('/api/notes', json={'title': 'Card', 'content_md': content}, headers=headers).get_json()
+    return data['id'], client.get(f"/api/notes/{data['id']}", headers=headers).get_json()['content_hash']
+
+def _put(client, headers, note_id, content_hash, data=PNG):
+    return client.put(f'/api/notes/{note_id}/thumbnail/{content_hash}', data=data,
+                      headers={'Authorization': headers['Authorization'], 'Content-Type': 'image/png'})
+
+def test_thumbnail_upload_and_immutable_download(client, auth_headers):
+    """Test that a thumbnail is stored for the note's content and served with cache headers."""
+    note_id, content_hash = _note(client, auth_headers)
+
+    response = _put(client, auth_headers, note_id, content_hash)
+
+    assert response.status_code == 201
+    url = response.get_json()['url']
+    assert url == f'/api/notes/{note_id}/thumbnail/{content_hash}'
+    download = client.get(url, headers=auth_headers)
+    assert download.status_code == 200
+    assert download.data == PNG
+    assert download.headers['Content-Type'] == 'image/png'
+    assert 'immutable' in download.headers['Cache-Control']
+    revalidated = client.get(url, headers={**auth_headers, 'If-None-Match': download.headers['ETag']})
+    assert revalidated.status_code == 304
+
+    # Uploading again replaces the note's thumbnail rather than adding one
+    assert _put(client, auth_headers, note_id, content_hash, PNG + b'v2').status_code == 201
+    with client.application.app_context():
+        assert db.session.query(NoteThumbnail).count() == 1
+
+def test_thumbnail_rejects_stale_hash_and_non_images(client, auth_headers):
+    """Test that only images drawn from the current content are accepted."""
+    note_id, content_hash = _note(client, auth_headers)
+
+    stale = _put(client, auth_headers, note_id, 'f' * 64)
+    assert stale.status_code == 409
+    assert stale.get_json()['content_hash'] == content_hash
+    assert _put(client, auth_headers, note_id, content_hash, b'<svg onload="x()"/>').status_code == 415
+    big = b'\x89PNG\r\n\x1a\n' + b'x' * (client.application.config['THUMBNAIL_MAX_BYTES'])
+    assert _put(client, auth_headers, note_id, content_hash, big).status_code == 413
+
+def test_thumbnail_lookup_reports_current_thumbnails(client, auth_headers):
+    """Test that the batch lookup returns URLs only for thumbnails matching current content."""
+    fresh, fresh_hash = _note(client, auth_headers, 'one')
+    edited, edited_hash = _note(client, auth_headers, 'two')
+    missing, _ = _note(client, auth_headers, 'three')
+    _put(client, auth_headers, fresh, fresh_hash)
+    _put(client, auth_headers, edited, edited_hash)
+    client.put(f'/api/notes/{edited}', json={'content_md': 'two, edited'}, headers=auth_headers)
+
+    response = client.post('/api/notes/thumbnails', json={'ids': [fresh, edited, missing, 999999]},
+                           headers=auth_headers)
+
+    assert response.status_code == 200
+    entries = {e['id']: e for e in response.get_json()['thumbnails']}
+    assert set(entries) == {fresh, edited, missing}
+    assert entries[fresh]['url'] == f'/api/notes/{fresh}/thumbnail/{fresh_hash}'
+    assert entries[edited]['url'] is None and entries[edited]['content_hash'] != edited_hash
+    assert entries[missing]['url'] is None
+    assert client.get(f'/api/notes/{edited}/thumbnail/{edited_hash}', headers=auth_headers).status_code == 200
+    assert client.post('/api/notes/thumbnails', json={'ids': 'x'}, headers=auth_headers).status_code == 400
+
+def test_thumbnails_are_private(client, auth_headers):
+    """Test that another user can neither upload, fetch nor look up a note's thumbnail."""
+    note_id, content_hash = _note(client, auth_headers)
+    _put(client, auth_headers, note_id, content_hash)
+    token = client.post('/api/auth/register', json={'email': 'other@example.com', 'password': 'OtherPassword123'}
+                        ).get_json()['access_token']
+    other = {'Authorization': f'Bearer {token}'}
+
+    assert _put(client, other, note_id, content_hash).status_code == 403
+    assert client.get(f'/api/notes/{note_id}/thumbnail/{content_hash}', headers=other).status_code == 403
+    lookup = client.post('/api/notes/thumbnails', json={'ids': [note_id]}, headers=other)
+    assert lookup.get_json()['thumbnails'] == []
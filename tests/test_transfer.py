@@ -0,0 +1,124 @@
+# tests/test_transfer.py
+
+import gzip
+import json
+from server.models.note_model import Note, NoteVersion, Tag
+
+def _ndjson(records):
+    return ''.join(json.dumps(r) + '\n' for r in records).encode('utf-8')
+
+def test_export_notes_ndjson(client, auth_headers, sample_note_data):
+    """Test that export streams one JSON object per note."""
+    for i in range(3):
+        client.post('/api/notes', json={**sample_note_data, 'title': f'Note {i}'},
+                    headers=auth_headers)
+
+    response = client.get('/api/notes/export', headers=auth_headers)
+
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+    assert response.is_streamed
+    lines = response.data.decode('utf-8').splitlines()
+    records = [json.loads(line) for line in lines]
+    assert [r['title'] for r in records] == ['Note 0', 'Note 1', 'Note 2']
+    assert records[0]['content_md'] == sample_note_data['content_md']
+    assert set(records[0]['tags']) == set(sample_note_data['tags'])
+
+def test_export_notes_gzip(client, auth_headers, sample_note_data):
+    """Test that export can be gzip-compressed."""
+    client.post('/api/notes', json=sample_note_data, headers=auth_headers)
+
+    response = client.get('/api/notes/export?gzip=1', headers=auth_headers)
+
+    assert response.status_code == 200
+    assert response.mimetype == 'application/gzip'
+    record = json.loads(gzip.decompress(response.data).decode('utf-8'))
+    assert record['title'] == sample_note_data['title']
+
+def test_export_notes_only_own(client, auth_headers):
+    """Test that export only includes the caller's notes."""
+    client.post('/api/notes', json={'title': 'Mine'}, headers=auth_headers)
+    other = client.post('/api/auth/register', json={
+        'email': 'exporter@example.com',
+        'password': 'Password123'
+    }).get_json()['access_token']
+    client.post('/api/notes', json={'title': 'Theirs'},
+                headers={'Authorization': f'Bearer {other}'})
+
+    response = client.get('/api/notes/export', headers=auth_headers)
+
+    titles = [json.loads(line)['title'] for line in response.data.decode('utf-8').splitlines()]
+    assert titles == ['Mine']
+
+def test_import_notes_in_batches(client, auth_headers, monkeypatch):
+    """Test that import inserts every record across several batches."""
+    import server.routes.transfer as transfer
+    monkeypatch.setattr(transfer, 'IMPORT_BATCH_SIZE', 4)
+    records = [{
+        'title': f'Imported {i}',
+        'content_md': f'body {i}',
+        'tags': ['imported', f'group-{i % 3}'],
+        'created_at': '2024-01-02T03:04:05'
+    } for i in range(10)]
+
+    response = client.post('/api/notes/import', data=_ndjson(records),
+                           headers={**auth_headers, 'Content-Type': 'application/x-ndjson'})
+
+    assert response.status_code == 200
+    assert response.get_json() == {'imported': 10, 'errors': []}
+    notes = client.get('/api/notes', headers=auth_headers).get_json()
+    assert len(notes) == 10
+    assert all('imported' in n['tags'] for n in notes)
+    assert all(n['created_at'].startswith('2024-01-02T03:04:05') for n in notes)
+    assert Tag.query.filter(Tag.name.like('group-%')).count() == 3
+    assert NoteVersion.query.count() == 10
+
+def test_import_notes_gzip_and_errors(client, auth_headers):
+    """Test gzip uploads and that bad lines are reported and skipped."""
+    body = _ndjson([{'title': 'Good'}]) + b'not json\n' + _ndjson([{'tags': 'oops'}, {'title': 'Also good'}])
+
+    response = client.post('/api/notes/import', data=gzip.compress(body),
+                           headers={**auth_headers, 'Content-Type': 'application/gzip'})
+
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data['imported'] == 2
+    assert [e['line'] for e in data['errors']] == [2, 3]
+
+def test_import_notes_rejects_non_string_fields(client, auth_headers):
+    """Test that wrongly typed text fields are reported per line instead of failing the import."""
+    body = _ndjson([{'title': 'Good'}, {'content_md': 5}, {'title': None}, {'language': ['md']},
+                    {'language': 'x' * 31}, {'favorite': 'false'}, {'favorite': 0},
+                    {'title': 'Also good', 'favorite': True}])
+
+    response = client.post('/api/notes/import', data=body, headers=auth_headers)
+
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data['imported'] == 2
+    assert [e['line'] for e in data['errors']] == [2, 3, 4, 5, 6, 7]
+    assert data['errors'][0]['msg'] == 'content_md must be a string'
+    assert data['errors'][4]['msg'] == 'favorite must be true or false'
+    notes = {n['title']: n for n in client.get('/api/notes', headers=auth_headers).get_json()}
+    assert sorted(notes) == ['Also good', 'Good']
+    assert notes['Also good']['favorite'] is True and notes['Good']['favorite'] is False
+
+def test_export_import_round_trip(client, auth_headers, sample_note_data):
+    """Test that an export can be imported back unchanged."""
+    client.post('/api/notes', json=sample_note_data, headers=auth_headers)
+    exported = client.get('/api/notes/export', headers=auth_headers).data
+
+    other = client.post('/api/auth/register', json={
+        'email': 'importer@example.com',
+        'password': 'Password123'
+    }).get_json()['access_token']
+    other_headers = {'Authorization': f'Bearer {other}'}
+    response = client.post('/api/notes/import', data=exported,
+                           headers={**other_headers, 'Content-Type': 'application/x-ndjson'})
+
+    assert response.get_json()['imported'] == 1
+    note = client.get('/api/notes', headers=other_headers).get_json()[0]
+    assert note['title'] == sample_note_data['title']
+    assert note['content_md'] == sample_note_data['content_md']
+    assert set(note['tags']) == set(sample_note_data['tags'])
+    assert Note.query.count() == 2
@@ -0,0 +1,164 @@
+# tests/test_versions.py
+
+from datetime import datetime, timedelta
+from server.extensions import db
+from server.models.note_model import NoteVersion
+from server.versioning import compact_versions
+
+def _create_with_history(client, headers, bodies):
+    """Create a note and save each body in turn, returning the note id."""
+    note_id = client.post('/api/notes', json={
+        'title': 'History',
+        'content_md': bodies[0]
+    }, headers=headers).get_json()['id']
+    for body in bodies[1:]:
+        response = client.put(f'/api/notes/{note_id}', json={'content_md': body}, headers=headers)
+        assert response.status_code == 200
+    return note_id
+
+def _body(i):
+    return ''.join(f'line {n}\n' for n in range(40)) + f'edit {i}\n'
+
+def test_versions_recorded_on_save(client, auth_headers):
+    """Test that creating and updating a note records each revision."""
+    bodies = [_body(i) for i in range(4)]
+    note_id = _create_with_history(client, auth_headers, bodies)
+
+    response = client.get(f'/api/notes/{note_id}/versions', headers=auth_headers)
+
+    assert response.status_code == 200
+    versions = response.get_json()
+    assert [v['version_no'] for v in versions] == [4, 3, 2, 1]
+    assert 'content_md' not in versions[0]
+
+    for version_no, body in enumerate(bodies, start=1):
+        data = client.get(f'/api/notes/{note_id}/versions/{version_no}',
+                          headers=auth_headers).get_json()
+        assert data['content_md'] == body
+
+def test_versions_use_reverse_diffs_with_keyframes(client, auth_headers):
+    """Test that older versions are stored as diffs with periodic keyframes."""
+    client.application.config['NOTE_VERSION_KEYFRAME_INTERVAL'] = 3
+    try:
+        bodies = [_body(i) for i in range(8)]
+        note_id = _create_with_history(client, auth_headers, bodies)
+
+        rows = NoteVersion.query.filter_by(note_id=note_id).order_by(NoteVersion.version_no).all()
+        # Newest is full text, and no run of diffs is longer than interval - 1
+        assert rows[-1].is_keyframe
+        run = 0
+        for row in rows:
+            run = 0 if row.is_keyframe else run + 1
+            assert run <= 2
+        assert sum(not r.is_keyframe for r in rows) >= 4
+        assert max(len(r.payload) for r in rows if not r.is_keyframe) < len(bodies[0]) // 4
+
+        for version_no, body in enumerate(bodies, start=1):
+            data = client.get(f'/api/notes/{note_id}/versions/{version_no}',
+                              headers=auth_headers).get_json()
+            assert data['content_md'] == body
+    finally:
+        client.application.config['NOTE_VERSION_KEYFRAME_INTERVAL'] = 20
+
+def test_restore_version(client, auth_headers):
+    """Test that restoring a version writes it back as a new revision."""
+    note_id = _create_with_history(client, auth_headers, ['first', 'second', 'third'])
+
+    response = client.post(f'/api/notes/{note_id}/versions/1/restore', headers=auth_headers)
+
+    assert response.status_code == 200
+    assert response.get_json()['revision'] == 4
+    data = client.get(f'/api/notes/{note_id}', headers=auth_headers).get_json()
+    assert data['content_md'] == 'first'
+    versions = client.get(f'/api/notes/{note_id}/versions', headers=auth_headers).get_json()
+    assert [v['version_no'] for v in versions] == [4, 3, 2, 1]
+    third = client.get(f'/api/notes/{note_id}/versions/3', headers=auth_headers).get_json()
+    assert third['content_md'] == 'third'
+
+def test_version_retention_prunes_oldest(client, auth_headers):
+    """Test that only the configured number of versions is kept."""
+    client.application.config['NOTE_VERSION_RETENTION'] = 3
+    try:
+        note_id = _create_with_history(client, auth_headers, [_body(i) for i in range(6)])
+    finally:
+        client.application.config['NOTE_VERSION_RETENTION'] = 500
+
+    versions = client.get(f'/api/notes/{note_id}/versions', headers=auth_headers).get_json()
+    assert [v['version_no'] for v in versions] == [6, 5, 4]
+    data = client.get(f'/api/notes/{note_id}/versions/4', headers=auth_headers).get_json()
+    assert data['content_md'] == _body(3)
+
+def test_versions_coalesce_rapid_saves(client, auth_headers):
+    """Test that saves inside the coalescing window replace the newest version."""
+    client.application.config['NOTE_VERSION_COALESCE_SECONDS'] = 60
+    try:
+        note_id = _create_with_history(client, auth_headers, ['a', 'ab', 'abc'])
+    finally:
+        client.application.config['NOTE_VERSION_COALESCE_SECONDS'] = 0
+
+    versions = client.get(f'/api/notes/{note_id}/versions', headers=auth_headers).get_json()
+    assert [v['version_no'] for v in versions] == [3]
+    data = client.get(f'/api/notes/{note_id}/versions/3', headers=auth_headers).get_json()
+    assert data['content_md'] == 'abc'
+
+def test_coalescing_keeps_older_diffs_valid(client, auth_headers):
+    """Test that folding a save into the head still rebuilds the version diffed against it."""
+    note_id = _create_with_history(client, auth_headers, ['AAA\nBBB\nCCC\n', 'AAA\nBBB\nCCC\nDDD\n'])
+    client.application.config['NOTE_VERSION_COALESCE_SECONDS'] = 60
+    try:
+        response = client.put(f'/api/notes/{note_id}', json={'content_md': 'ZZZ\n'}, headers=auth_headers)
+        assert response.status_code == 200
+    finally:
+        client.application.config['NOTE_VERSION_COALESCE_SECONDS'] = 0
+
+    versions = client.get(f'/api/notes/{note_id}/versions', headers=auth_headers).get_json()
+    assert [v['version_no'] for v in versions] == [3, 1]
+    first = client.get(f'/api/notes/{note_id}/versions/1', headers=auth_headers).get_json()
+    assert first['content_md'] == 'AAA\nBBB\nCCC\n'
+    head = client.get(f'/api/notes/{note_id}/versions/3', headers=auth_headers).get_json()
+    assert head['content_md'] == 'ZZZ\n'
+
+def test_compact_versions_thins_old_history(client, auth_headers):
+    """Test that compaction keeps recent versions and spaces out older ones."""
+    bodies = [_body(i) for i in range(6)]
+    note_id = _create_with_history(client, auth_headers, bodies)
+
+    # Backdate the history so versions 1-4 are a minute apart, oldest first
+    now = datetime.utcnow()
+    for row in NoteVersion.query.filter_by(note_id=note_id):
+        row.created_at = now - timedelta(minutes=6 - row.version_no)
+    db.session.commit()
+
+    removed = compact_versions(note_id, keep_recent=2, spacing=120)
+    db.session.commit()
+
+    assert removed == 2
+    versions = client.get(f'/api/notes/{note_id}/versions', headers=auth_headers).get_json()
+    kept = [v['version_no'] for v in versions]
+    assert kept == [6, 5, 3, 1]
+    for version_no in kept:
+        data = client.get(f'/api/notes/{note_id}/versions/{version_no}',
+                          headers=auth_headers).get_json()
+        assert data['content_md'] == bodies[version_no - 1]
+
+def test_versions_removed_with_note(client, auth_headers):
+    """Test that deleting a note deletes its versions."""
+    note_id = _create_with_history(client, auth_headers, ['one', 'two'])
+
+    client.delete(f'/api/notes/{note_id}', headers=auth_headers)
+
+    assert NoteVersion.query.filter_by(note_id=note_id).count() == 0
+
+def test_versions_different_user(client, auth_headers):
+    """Test that another user cannot read or restore versions."""
+    note_id = _create_with_history(client, auth_headers, ['one', 'two'])
+    other = client.post('/api/auth/register', json={
+        'email': 'historian@example.com',
+        'password': 'Password123'
+    }).get_json()['access_token']
+    other_headers = {'Authorization': f'Bearer {other}'}
+
+    assert client.get(f'/api/notes/{note_id}/versions', headers=other_headers).status_code == 403
+    assert client.get(f'/api/notes/{note_id}/versions/1', headers=other_headers).status_code == 403
+    assert client.post(f'/api/notes/{note_id}/versions/1/restore',
+                       headers=other_headers).status_code == 403